@@ -1,66 +1,114 @@
 import os
 import argparse
+from functools import lru_cache
 import numpy as np
 import cv2
 from PIL import ImageFont, ImageDraw, Image
+from video_writers import add_encoder_arguments, encoder_from_args, open_video_writer
 
-def create_text_video(text, output_path="output.mp4", duration=5, fps=24, resolution=(1280, 720)):
+# Các kiểu hiệu ứng chữ được hỗ trợ
+ANIMATIONS = ("none", "fade", "scroll")
+
+
+def _default_font_path():
+    """Đường dẫn font mặc định (Arial cho Windows hoặc DejaVuSans cho Linux)"""
+    font_path = "C:/Windows/Fonts/Arial.ttf"  # Đường dẫn font trên Windows
+    if not os.path.exists(font_path):
+        font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"  # Đường dẫn trên Linux
+    return font_path
+
+
+@lru_cache(maxsize=32)
+def load_font(font_path, font_size):
+    """Tải font TrueType một lần cho mỗi (đường dẫn, kích thước), dùng font mặc định nếu lỗi"""
+    try:
+        return ImageFont.truetype(font_path, font_size)
+    except Exception:
+        print("Không tìm thấy font, sử dụng font mặc định")
+        return ImageFont.load_default()
+
+
+def render_text_sprite(text, font, color=(255, 255, 255)):
+    """
+    Vẽ văn bản một lần thành ảnh nhỏ (sprite) vừa khít với chữ
+    
+    Trả về mảng BGR uint8 chỉ chứa vùng bao quanh văn bản, nền đen.
+    """
+    left, top, right, bottom = ImageDraw.Draw(Image.new("L", (1, 1))).textbbox((0, 0), text, font=font)
+    mask = Image.new("L", (max(right - left, 1), max(bottom - top, 1)), 0)
+    ImageDraw.Draw(mask).text((-left, -top), text, font=font, fill=255)
+    # Độ phủ của nét chữ nhân với màu chữ (BGR)
+    coverage = np.asarray(mask, dtype=np.float32)[:, :, None] / 255.0
+    return (coverage * np.array(color[::-1], dtype=np.float32)).astype(np.uint8)
+
+
+def _paste(frame, sprite, x, y):
+    """Dán sprite vào frame tại (x, y), cắt bỏ phần nằm ngoài khung hình"""
+    height, width = frame.shape[:2]
+    sh, sw = sprite.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + sw, width), min(y + sh, height)
+    if x0 < x1 and y0 < y1:
+        frame[y0:y1, x0:x1] = sprite[y0 - y:y1 - y, x0 - x:x1 - x]
+
+
+def create_text_video(text, output_path="output.mp4", duration=5, fps=24, resolution=(1280, 720),
+                      animation="none", fade_duration=1.0, vfr=False, encoder=None):
     """
     Tạo video từ văn bản sử dụng OpenCV
+    
+    animation: Hiệu ứng chữ: 'none' (đứng yên), 'fade' (hiện dần), 'scroll' (cuộn từ dưới lên)
+    fade_duration: Thời gian hiện dần của hiệu ứng 'fade' (giây)
+    vfr: Ghi video tốc độ khung hình thay đổi qua ffmpeg để đoạn đứng yên chỉ mã hóa một lần
+         (không có lợi với hiệu ứng 'scroll' vì mọi frame đều khác nhau; không có ffmpeg thì ghi CFR)
+    encoder: Bộ mã hóa video: 'opencv' (mp4v), 'x264', 'x265', 'vp9' (qua ffmpeg) hoặc đối tượng từ
+             video_writers.get_encoder (None = 'opencv'); với vfr thì dùng codec của bộ mã hóa ffmpeg
+    
+    Chữ được vẽ đúng một lần; các frame được tạo từ ảnh đã vẽ sẵn bằng thao tác mảng.
     """
     try:
         print(f"Đang tạo video với văn bản '{text}'...")
 
         # Thiết lập thông số video
         width, height = resolution
-        total_frames = duration * fps
+        total_frames = int(duration * fps)
         
-        # Tạo đối tượng VideoWriter
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # Codec cho định dạng MP4
-        video = cv2.VideoWriter(output_path, fourcc, fps, resolution)
+        # Tạo bộ ghi video
+        video = open_video_writer(output_path, fps, resolution, vfr=vfr, encoder=encoder)
         
-        # Đường dẫn font mặc định (Arial cho Windows hoặc DejaVuSans cho Linux)
+        # Sử dụng PIL để hỗ trợ tiếng Việt tốt hơn, font được tải một lần
         font_size = 70
-        try:
-            # Sử dụng PIL để hỗ trợ tiếng Việt tốt hơn
-            font_path = "C:/Windows/Fonts/Arial.ttf"  # Đường dẫn font trên Windows
-            if not os.path.exists(font_path):
-                font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"  # Đường dẫn trên Linux
-        except:
-            print("Không tìm thấy font, sử dụng font mặc định")
-            font_path = None  # Sẽ dùng font mặc định
-            
-        # Tạo các khung hình cho video
-        for _ in range(total_frames):
-            # Tạo một khung hình đen
-            frame = np.zeros((height, width, 3), np.uint8)
-            
-            # Sử dụng PIL để vẽ văn bản tiếng Việt
-            pil_img = Image.fromarray(frame)
-            draw = ImageDraw.Draw(pil_img)
-            
-            try:
-                # Thử sử dụng font đã chỉ định
-                font = ImageFont.truetype(font_path, font_size)
-            except:
-                # Nếu không có font, sử dụng font mặc định
-                font = ImageFont.load_default()
-                
-            # Tính toán vị trí để đặt text ở giữa
-            text_size = draw.textbbox((0, 0), text, font=font)
-            text_width = text_size[2] - text_size[0]
-            text_height = text_size[3] - text_size[1]
-            text_x = (width - text_width) // 2
-            text_y = (height - text_height) // 2
-            
-            # Vẽ văn bản lên hình ảnh với màu trắng (255,255,255)
-            draw.text((text_x, text_y), text, font=font, fill=(255, 255, 255))
-            
-            # Chuyển đổi lại sang định dạng OpenCV
-            frame = np.array(pil_img)
-            
-            # Thêm khung hình vào video
-            video.write(frame)
+        font = load_font(_default_font_path(), font_size)
+        sprite = render_text_sprite(text, font)
+        sprite_height, sprite_width = sprite.shape[:2]
+        
+        # Vị trí đặt text ở giữa
+        text_x = (width - sprite_width) // 2
+        text_y = (height - sprite_height) // 2
+        
+        # Khung hình hoàn chỉnh với chữ ở giữa
+        frame = np.zeros((height, width, 3), np.uint8)
+        _paste(frame, sprite, text_x, text_y)
+        
+        if animation == "fade":
+            # Hiện dần: nhân frame đã dựng sẵn với hệ số độ sáng, dùng lại một buffer
+            fade_frames = min(int(fade_duration * fps), total_frames)
+            buffer = np.empty_like(frame)
+            for i in range(fade_frames):
+                cv2.convertScaleAbs(frame, dst=buffer, alpha=i / fade_frames)
+                video.write(buffer)
+            video.write_repeated(frame, total_frames - fade_frames)
+        elif animation == "scroll":
+            # Cuộn từ dưới lên: chữ đi từ mép dưới tới khi ra khỏi mép trên
+            buffer = np.zeros_like(frame)
+            for i in range(total_frames):
+                y = int(height - (height + sprite_height) * i / max(total_frames - 1, 1))
+                buffer.fill(0)
+                _paste(buffer, sprite, text_x, y)
+                video.write(buffer)
+        else:
+            # Văn bản không đổi: ghi frame dựng sẵn cho toàn bộ thời lượng
+            video.write_repeated(frame, total_frames)
             
         # Giải phóng tài nguyên
         video.release()
@@ -80,6 +128,10 @@ if __name__ == "__main__":
     parser.add_argument("--duration", type=int, default=5, help="Thời lượng video (giây, mặc định: 5).")
     parser.add_argument("--fps", type=int, default=24, help="Số khung hình mỗi giây (mặc định: 24).")
     parser.add_argument("--resolution", default="1280x720", help="Độ phân giải video: chiều rộng x chiều cao (mặc định: 1280x720).")
+    parser.add_argument("--animation", choices=ANIMATIONS, default="none", help="Hiệu ứng chữ (mặc định: none).")
+    parser.add_argument("--vfr", action="store_true",
+                        help="Ghi video tốc độ khung hình thay đổi, đoạn chữ đứng yên chỉ mã hóa một lần (cần ffmpeg).")
+    add_encoder_arguments(parser)
     
     args = parser.parse_args()
     
@@ -91,4 +143,5 @@ if __name__ == "__main__":
         resolution = (1280, 720)
     
     # Tạo video
-    create_text_video(args.text, args.output, args.duration, args.fps, resolution)
+    create_text_video(args.text, args.output, args.duration, args.fps, resolution,
+                      animation=args.animation, vfr=args.vfr, encoder=encoder_from_args(args))
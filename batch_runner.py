@@ -0,0 +1,226 @@
+"""
+Chạy nhiều job tạo video từ một manifest (JSONL hoặc CSV) trên cùng một VideoGenerator
+
+Mỗi dòng manifest là một job với các trường: text (bắt buộc), output, id, frames,
+resolution, output_resolution, seed, frame_duration, transition, transition_type, fps.
+Các job cùng độ phân giải được gom lại để khung hình của nhiều job dùng chung một
+lần khử nhiễu; output_resolution (nếu có) là độ phân giải video sau khi phóng to,
+fps (nếu có) ghi đè số khung hình mỗi giây chung của batch.
+"""
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+from instrumentation import GenerationResult
+
+
+def _parse_resolution(value):
+    """Chuyển '512x512' hoặc [512, 512] thành tuple (width, height)"""
+    if isinstance(value, str):
+        return tuple(map(int, value.lower().split('x')))
+    return tuple(int(v) for v in value)
+
+
+def normalize_job(raw, index=0):
+    """Chuẩn hóa một dòng manifest thành dict job đầy đủ trường"""
+    if not raw.get("text"):
+        raise ValueError(f"Job thứ {index + 1} thiếu trường 'text'")
+    output = raw.get("output") or f"output_{index + 1:03d}.mp4"
+    seed = raw.get("seed")
+    fps = raw.get("fps")
+    frames = int(raw.get("frames") or 5)
+    if frames < 1:
+        raise ValueError(f"Job thứ {index + 1} phải có ít nhất 1 khung hình")
+    return {
+        "id": str(raw.get("id") or output),
+        "text": raw["text"],
+        "output": output,
+        "frames": frames,
+        "resolution": _parse_resolution(raw.get("resolution") or "512x512"),
+        "output_resolution": _parse_resolution(raw["output_resolution"]) if raw.get("output_resolution") else None,
+        "seed": int(seed) if seed not in (None, "") else None,
+        "frame_duration": float(raw.get("frame_duration") or raw.get("duration") or 2.0),
+        "transition": float(raw.get("transition") if raw.get("transition") not in (None, "") else 1.0),
+        "transition_type": raw.get("transition_type") or "linear",
+        "fps": int(fps) if fps not in (None, "") else None,
+    }
+
+
+def load_manifest(path):
+    """Đọc manifest JSONL (mỗi dòng một object) hoặc CSV (có dòng tiêu đề)"""
+    with open(path, encoding="utf-8") as f:
+        if str(path).lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    return [normalize_job(row, i) for i, row in enumerate(rows)]
+
+
+def load_completed(log_path):
+    """Tập id các job đã hoàn thành trong log (để chạy tiếp sau khi bị dừng)"""
+    if not log_path or not os.path.exists(log_path):
+        return set()
+    with open(log_path, encoding="utf-8") as f:
+        return {json.loads(line)["id"] for line in f if line.strip()}
+
+
+def group_key(job):
+    """Khóa gom nhóm: các job cùng khóa có thể dùng chung một lần khử nhiễu"""
+    return job["resolution"]
+
+
+def iter_frame_batches(jobs, batch_size):
+    """
+    Chia khung hình của các job cùng độ phân giải thành các lô
+    
+    Mỗi phần tử trả ra là danh sách (job, chỉ số frame) có tối đa batch_size phần tử;
+    một lô có thể chứa khung hình của nhiều job khác nhau.
+    """
+    pending = [(job, i) for job in jobs for i in range(job["frames"])]
+    for start in range(0, len(pending), batch_size):
+        yield pending[start:start + batch_size]
+
+
+def run_batch(generator, jobs, batch_size=4, completed_log=None, vfr=False, on_progress=None, is_cancelled=None,
+              fps=24, encoder=None):
+    """
+    Chạy tất cả job trên một VideoGenerator đã tải mô hình
+    
+    generator: VideoGenerator dùng chung cho mọi job
+    jobs: Danh sách job (từ load_manifest)
+    batch_size: Số khung hình tối đa trong một lần khử nhiễu (có thể thuộc nhiều job)
+    completed_log: File JSONL ghi các job đã xong; job có trong log sẽ được bỏ qua
+    vfr: Ghi video tốc độ khung hình thay đổi (cần ffmpeg)
+    on_progress: Hàm on_progress(job, frames_done) gọi sau mỗi lô khung hình của job
+    is_cancelled: Hàm is_cancelled(job) trả về True nếu job đã bị hủy; khung hình còn lại của job bị bỏ qua
+    fps: Số khung hình mỗi giây của video (job có trường fps thì dùng giá trị của job)
+    encoder: Bộ mã hóa video: tên hoặc đối tượng từ video_writers.get_encoder (None = 'opencv')
+    
+    Trả về danh sách kết quả cho từng job: id, output, status, generate_s, encode_s.
+    """
+    done_ids = load_completed(completed_log)
+    results = []
+    todo = []
+    for job in jobs:
+        if job["id"] in done_ids:
+            results.append({"id": job["id"], "output": job["output"], "status": "skipped",
+                            "generate_s": 0.0, "encode_s": 0.0})
+        else:
+            if job["seed"] is None:
+                job["seed"] = int(np.random.randint(1, 1000000))
+            todo.append(job)
+
+    cache_before = generator._cache_stats()
+    started = generator._start_run_metrics()
+    print(f"Batch: {len(todo)} job cần chạy, {len(jobs) - len(todo)} job đã xong từ trước")
+
+    # Gom các job cùng độ phân giải để dùng chung lô khử nhiễu
+    groups = {}
+    for job in todo:
+        groups.setdefault(group_key(job), []).append(job)
+
+    for group in groups.values():
+        resolution = group[0]["resolution"]
+        frames = {job["id"]: [None] * job["frames"] for job in group}
+        timing = {job["id"]: 0.0 for job in group}
+        failed = set()
+
+        for batch in iter_frame_batches(group, max(1, int(batch_size))):
+            if is_cancelled is not None:
+                for job, _ in batch:
+                    if job["id"] not in failed and is_cancelled(job):
+                        failed.add(job["id"])
+                        results.append({"id": job["id"], "output": job["output"], "status": "cancelled",
+                                        "generate_s": timing[job["id"]], "encode_s": 0.0})
+            batch = [(job, i) for job, i in batch if job["id"] not in failed]
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                images = generator._sample_frames(
+                    [job["text"] for job, _ in batch],
+                    [job["seed"] + i for job, i in batch],
+                    resolution
+                )
+            except Exception as e:
+                print(f"Lỗi khi sinh hình cho lô: {e}")
+                for job, _ in batch:
+                    if job["id"] not in failed:
+                        failed.add(job["id"])
+                        results.append({"id": job["id"], "output": job["output"], "status": f"failed: {e}",
+                                        "generate_s": timing[job["id"]], "encode_s": 0.0})
+                continue
+            # Chia thời gian của lô cho các job theo số khung hình của mỗi job trong lô
+            share = (time.perf_counter() - start) / len(batch)
+            for (job, i), image in zip(batch, images):
+                frames[job["id"]][i] = image
+                timing[job["id"]] += share
+            if on_progress is not None:
+                for job in {job["id"]: job for job, _ in batch}.values():
+                    on_progress(job, sum(frame is not None for frame in frames[job["id"]]))
+
+            # Ghi video cho các job vừa có đủ khung hình
+            for job in {job["id"]: job for job, _ in batch}.values():
+                if any(frame is None for frame in frames[job["id"]]):
+                    continue
+                results.append(_encode_job(generator, job, frames.pop(job["id"]), timing[job["id"]],
+                                           completed_log, vfr, fps, encoder))
+
+    generator._print_cache_summary(cache_before)
+    if started:
+        # Báo cáo của cả batch: thời gian các giai đoạn cộng dồn qua mọi job
+        failed = [r["id"] for r in results if r["status"] not in ("done", "skipped")]
+        report = GenerationResult(
+            not failed, metrics=generator._finish_run_metrics(),
+            error=f"{len(failed)} job không thành công" if failed else None,
+            params={"batch_jobs": len(todo), "batch_size": batch_size}
+        )
+        generator._publish_report(report.to_dict())
+    return results
+
+
+def _encode_job(generator, job, frames, generate_s, completed_log, vfr, fps=24, encoder=None):
+    """Ghi video của một job và cập nhật log các job đã xong"""
+    print(f"Đang ghi video cho job '{job['id']}'")
+    start = time.perf_counter()
+    result = {"id": job["id"], "output": job["output"], "status": "done", "generate_s": generate_s}
+    try:
+        output_dir = os.path.dirname(job["output"])
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        generator._create_video_from_images(
+            frames,
+            job["output"],
+            duration_per_image=job["frame_duration"],
+            transition_duration=job["transition"],
+            fps=job["fps"] or fps,
+            transition=job["transition_type"],
+            vfr=vfr,
+            frame_size=job["output_resolution"],
+            encoder=encoder
+        )
+    except Exception as e:
+        print(f"Lỗi khi ghi video cho job '{job['id']}': {e}")
+        result["status"] = f"failed: {e}"
+    result["encode_s"] = time.perf_counter() - start
+
+    if completed_log and result["status"] == "done":
+        with open(completed_log, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"id": job["id"], "output": job["output"], "seed": job["seed"],
+                                "seconds": round(generate_s + result["encode_s"], 3)},
+                               ensure_ascii=False) + "\n")
+    return result
+
+
+def print_summary(results):
+    """In bảng thời gian của từng job"""
+    print(f"\n{'Job':<30} {'Trạng thái':<12} {'Sinh hình':>10} {'Ghi video':>10} {'Tổng':>8}")
+    for r in results:
+        total = r["generate_s"] + r["encode_s"]
+        print(f"{r['id'][:30]:<30} {r['status'][:12]:<12} {r['generate_s']:>9.2f}s {r['encode_s']:>9.2f}s {total:>7.2f}s")
+    done = sum(r["status"] == "done" for r in results)
+    skipped = sum(r["status"] == "skipped" for r in results)
+    print(f"\nHoàn thành {done} job, bỏ qua {skipped} job đã xong từ trước, lỗi {len(results) - done - skipped} job")
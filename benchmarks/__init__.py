@@ -0,0 +1,5 @@
+"""
+Các benchmark đo hiệu năng của Video AI Generator
+
+Chạy từ thư mục gốc của dự án, ví dụ: python -m benchmarks.bench_batching
+"""
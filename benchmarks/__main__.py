@@ -0,0 +1,6 @@
+"""Chạy bộ benchmark: python -m benchmarks (xem benchmarks/suite.py)"""
+import sys
+
+from benchmarks.suite import main
+
+sys.exit(main())
@@ -0,0 +1,52 @@
+"""
+So sánh sinh khung hình độc lập và nối tiếp khung hình bằng img2img với pipeline giả lập
+
+Ví dụ: python -m benchmarks.bench_chaining --frames 10 --strength 0.3
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.stub_pipeline import StubPipeline
+from video_generator import VideoGenerator
+
+
+def run(generator, num_frames, resolution, seed, chain_strength):
+    """Chạy _generate_images_from_text, trả về (thời gian, danh sách hình)"""
+    start = time.perf_counter()
+    frames = generator._generate_images_from_text(
+        "benchmark", num_frames=num_frames, resolution=resolution, seed=seed, chain_strength=chain_strength
+    )
+    return time.perf_counter() - start, frames
+
+
+def mean_step_difference(frames):
+    """Độ chênh lệch trung bình giữa hai khung hình liên tiếp (0-255), càng nhỏ càng liền mạch"""
+    return float(np.mean([np.abs(a.astype(np.int16) - b).mean() for a, b in zip(frames, frames[1:])]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark nối tiếp khung hình bằng img2img.")
+    parser.add_argument("--frames", type=int, default=10, help="Số khung hình cần sinh.")
+    parser.add_argument("--strength", type=float, default=0.3, help="Strength của img2img.")
+    parser.add_argument("--resolution", default="256x256", help="Độ phân giải: chiều rộng x chiều cao.")
+    parser.add_argument("--steps", type=int, default=20, help="Số bước khử nhiễu giả lập.")
+    parser.add_argument("--step-cost", type=float, default=0.01, help="Chi phí mỗi bước (giây).")
+    args = parser.parse_args()
+
+    resolution = tuple(map(int, args.resolution.split('x')))
+    pipeline = StubPipeline(args.step_cost, 0.0005, args.steps)
+    generator = VideoGenerator(device="cpu", pipeline=pipeline, img2img_pipeline=pipeline)
+
+    t_independent, independent = run(generator, args.frames, resolution, 42, None)
+    t_chained, chained = run(generator, args.frames, resolution, 42, args.strength)
+
+    print(f"\nĐộc lập:        {t_independent:.3f}s, chênh lệch giữa hai khung hình {mean_step_difference(independent):.1f}")
+    print(f"Nối tiếp ({args.strength}): {t_chained:.3f}s, chênh lệch giữa hai khung hình {mean_step_difference(chained):.1f}")
+    print(f"Tăng tốc:       {t_independent / t_chained:.2f}x")
+    print(f"Khung hình đầu giống nhau: {np.array_equal(independent[0], chained[0])}")
+
+
+if __name__ == "__main__":
+    main()
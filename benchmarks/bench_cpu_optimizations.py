@@ -0,0 +1,70 @@
+"""
+Đo ảnh hưởng của từng tùy chọn tối ưu CPU với pipeline diffusers nhỏ dựng offline
+
+Mỗi tùy chọn được bật riêng lẻ trên một pipeline mới, so với cấu hình float32 mặc định.
+Với torch.compile, job thứ hai dùng VideoGenerator mới trên cùng pipeline để kiểm tra
+kết quả compile được dùng lại.
+
+Ví dụ: python -m benchmarks.bench_cpu_optimizations --frames 2 --steps 10
+"""
+import argparse
+import os
+import time
+
+import torch
+
+from benchmarks.tiny_pipeline import build_tiny_pipeline
+from cpu_optimizations import CPUOptimizations, bf16_supported
+from prompt_cache import PromptEmbeddingCache
+from video_generator import VideoGenerator
+
+
+def time_job(pipeline, optimizations, args, resolution):
+    """Tạo VideoGenerator mới trên pipeline, trả về thời gian trung bình mỗi khung hình"""
+    generator = VideoGenerator(
+        device="cpu", pipeline=pipeline, prompt_cache=PromptEmbeddingCache(),
+        steps=args.steps, cpu_optimizations=optimizations
+    )
+    start = time.perf_counter()
+    generator._generate_images_from_text("benchmark", num_frames=args.frames, resolution=resolution, seed=1)
+    return (time.perf_counter() - start) / args.frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark từng tùy chọn tối ưu CPU.")
+    parser.add_argument("--frames", type=int, default=2, help="Số khung hình mỗi job.")
+    parser.add_argument("--steps", type=int, default=10, help="Số bước khử nhiễu.")
+    parser.add_argument("--resolution", default="256x256", help="Độ phân giải: chiều rộng x chiều cao.")
+    args = parser.parse_args()
+
+    resolution = tuple(map(int, args.resolution.split('x')))
+    cpu_count = os.cpu_count() or 1
+    configs = [("float32 mặc định", None)]
+    configs += [(f"threads={n}", CPUOptimizations(threads=n)) for n in sorted({1, cpu_count})]
+    configs += [
+        ("channels_last", CPUOptimizations(channels_last=True)),
+        ("bf16", CPUOptimizations(bf16=True)),
+        ("attention=slicing", CPUOptimizations(attention="slicing")),
+        ("attention=math", CPUOptimizations(attention="math")),
+        ("compile", CPUOptimizations(compile=True)),
+    ]
+    default_threads = torch.get_num_threads()
+
+    rows = []
+    for name, optimizations in configs:
+        torch.set_num_threads(default_threads)
+        pipeline = build_tiny_pipeline()
+        # Job đầu gồm chi phí khởi tạo (và compile); job sau là thời gian ổn định
+        first = time_job(pipeline, optimizations, args, resolution)
+        second = time_job(pipeline, optimizations, args, resolution)
+        rows.append((name, first, second))
+
+    print(f"\nCPU: {cpu_count} nhân, bfloat16 {'có' if bf16_supported() else 'không'} hỗ trợ")
+    baseline = rows[0][2]
+    print(f"{'Tùy chọn':20s} {'Job đầu (s/hình)':>17s} {'Job sau (s/hình)':>17s} {'So với mặc định':>16s}")
+    for name, first, second in rows:
+        print(f"{name:20s} {first:17.3f} {second:17.3f} {baseline / second:15.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Đo thời gian tới khi có video nháp và kiểm tra bản nháp cùng bố cục với bản đầy đủ
+
+So sánh:
+- một lượt đầy đủ (không nháp)
+- hai lượt: thời gian tới khi video nháp sẵn sàng và tổng thời gian
+
+Kiểm tra thêm:
+- khung hình của lượt đầy đủ giống hệt khi không dùng nháp (bản nháp không làm thay đổi kết quả)
+- bố cục: tương quan tần số thấp giữa khung hình nháp và khung hình đầy đủ, so với bản nháp
+  sinh thẳng ở độ phân giải nhỏ bằng cùng seed (nhiễu khởi tạo không liên quan tới bản đầy đủ)
+
+Ví dụ: python -m benchmarks.bench_draft --frames 4 --steps 30
+       python -m benchmarks.bench_draft --pipeline tiny --resolution 256x256
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.stub_pipeline import StubPipeline
+from prompt_cache import PromptEmbeddingCache
+from video_generator import VideoGenerator, draft_resolution
+
+
+def correlation(draft, full, factor=8):
+    """
+    Tương quan bố cục giữa khung hình nháp và khung hình đầy đủ
+    
+    Bố cục là phần tần số thấp: cả hai hình được thu nhỏ về 1/factor kích thước bản nháp
+    (ảnh xám) trước khi tính tương quan, để chi tiết nhỏ mà bản nháp không có không được tính.
+    """
+    import cv2
+    size = (max(1, draft.shape[1] // factor), max(1, draft.shape[0] // factor))
+    a, b = (cv2.resize(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), size, interpolation=cv2.INTER_AREA)
+            .astype(np.float64).ravel() for img in (draft, full))
+    return float(np.corrcoef(a, b)[0, 1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bản nháp hai lượt.")
+    parser.add_argument("--pipeline", choices=["stub", "tiny"], default="stub",
+                        help="Pipeline giả lập hoặc pipeline diffusers nhỏ dựng offline.")
+    parser.add_argument("--frames", type=int, default=4, help="Số khung hình.")
+    parser.add_argument("--steps", type=int, default=30, help="Số bước khử nhiễu của bản đầy đủ.")
+    parser.add_argument("--step-cost", type=float, default=0.02,
+                        help="Chi phí mỗi bước giả lập cho hình 512x512 (giây, tỉ lệ theo số điểm ảnh).")
+    parser.add_argument("--resolution", default="512x512", help="Độ phân giải: chiều rộng x chiều cao.")
+    parser.add_argument("--draft-scale", type=float, default=0.5, help="Tỉ lệ độ phân giải của bản nháp.")
+    args = parser.parse_args()
+
+    resolution = tuple(map(int, args.resolution.split('x')))
+    if args.pipeline == "tiny":
+        from benchmarks.tiny_pipeline import build_tiny_pipeline
+        pipeline = build_tiny_pipeline()
+    else:
+        # Chi phí mỗi bước tỉ lệ với số điểm ảnh như UNet thật
+        pipeline = StubPipeline(0.0, 0.0, args.steps, pixel_cost=args.step_cost)
+    generator = VideoGenerator(device="cpu", pipeline=pipeline, prompt_cache=PromptEmbeddingCache(), steps=args.steps)
+
+    def run(path, **kwargs):
+        frames, draft_frames, draft_time = [], [], {}
+        start = time.perf_counter()
+
+        def on_progress(frames_done, num_frames, image):
+            if image is not None:
+                frames.append(image)
+
+        def on_draft(draft_path):
+            draft_time["s"] = time.perf_counter() - start
+            draft_frames.extend(frames)
+            frames.clear()
+
+        result = generate(path, on_progress=on_progress, on_draft=on_draft, **kwargs)
+        return result, time.perf_counter() - start, draft_time.get("s"), frames, draft_frames
+
+    def generate(path, **kwargs):
+        return generator.generate_video(
+            "benchmark", output_path=path, num_frames=args.frames, frame_duration=0.5, transition_duration=0.25,
+            resolution=resolution, seed=7, **kwargs
+        )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run(os.path.join(tmp, "warmup.mp4"))
+        single, single_s, _, single_frames, _ = run(os.path.join(tmp, "single.mp4"))
+        path = os.path.join(tmp, "two_pass.mp4")
+        two_pass, total_s, draft_s, final_frames, draft_frames = run(path, draft=True, draft_scale=args.draft_scale)
+        draft_exists = os.path.exists(os.path.join(tmp, "two_pass_draft.mp4"))
+
+        # Bản nháp sinh thẳng ở độ phân giải nhỏ cùng seed (không lấy nhiễu từ bản đầy đủ)
+        small = draft_resolution(resolution, args.draft_scale)
+        naive_frames = []
+        with generator._draft_pass(resolution):
+            generator._run().noise_resolution = None
+            naive_frames = generator._generate_images_from_text("benchmark", args.frames, small, seed=7)
+
+    pooled = [correlation(d, f) for d, f in zip(draft_frames, final_frames)]
+    naive = [correlation(d, f) for d, f in zip(naive_frames, final_frames)]
+    print(f"\nĐộ phân giải: {resolution[0]}x{resolution[1]}, bản nháp {small[0]}x{small[1]}")
+    print(f"Một lượt đầy đủ:            {single_s:.2f}s")
+    print(f"Hai lượt - có bản nháp sau: {draft_s:.2f}s ({draft_s / single_s:.0%} thời gian một lượt)")
+    print(f"Hai lượt - tổng:            {total_s:.2f}s ({total_s / single_s - 1:+.0%})")
+    print(f"Tương quan bố cục (nháp / đầy đủ): nhiễu thu nhỏ {np.mean(pooled):.3f}, "
+          f"sinh thẳng cùng seed {np.mean(naive):.3f}")
+    checks = {
+        "cả hai lượt thành công": bool(single) and bool(two_pass),
+        "đã ghi video nháp": draft_exists,
+        "lượt đầy đủ giống hệt một lượt": len(final_frames) == len(single_frames) == args.frames
+                                         and all(np.array_equal(a, b) for a, b in zip(final_frames, single_frames)),
+        # Giá trị tuyệt đối phụ thuộc pipeline (pipeline tiny có trọng số ngẫu nhiên), chỉ so tương đối
+        "bản nháp giữ bố cục": np.mean(pooled) > np.mean(naive) + 0.1,
+    }
+    print()
+    for name, ok in checks.items():
+        print(f"{name}: {ok}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+So sánh tốc độ, dung lượng và chất lượng giữa các bộ mã hóa video (video_writers.get_encoder)
+
+Ghi cùng một video kiểu trình chiếu (giữ hình và chuyển cảnh, fps cố định) bằng OpenCV
+(mp4v) và ffmpeg qua pipe (x264, x265, vp9), in thời gian ghi, dung lượng, bitrate và PSNR
+trung bình giữa video giải mã và các frame gốc. Với --threads, bộ mã hóa ffmpeg được đo
+thêm ở từng số luồng.
+
+Cần ffmpeg (trong PATH hoặc biến môi trường FFMPEG_BINARY) cho các bộ mã hóa ffmpeg.
+
+Ví dụ: python -m benchmarks.bench_encoders --encoders opencv,x264,x265,vp9 --fps 30
+       python -m benchmarks.bench_encoders --encoders x264 --threads 1,2,0
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from segment_encoding import write_image_segment
+from transitions import TransitionRenderer
+from video_writers import ENCODERS, find_ffmpeg, get_encoder
+
+
+class FrameRecorder:
+    """Bộ ghi giả chỉ giữ lại các frame gốc (frame giữ hình dùng chung một mảng)"""
+    def __init__(self):
+        self.frames = []
+
+    def write(self, frame):
+        # Frame chuyển cảnh dùng chung buffer nên phải sao chép
+        self.frames.append(frame.copy())
+
+    def write_repeated(self, frame, count):
+        self.frames.extend([frame] * count)
+
+    def release(self):
+        pass
+
+
+def write_slideshow(video, images, args):
+    """Ghi các hình với đoạn giữ hình và chuyển cảnh như VideoGenerator._create_video_from_images"""
+    renderer = TransitionRenderer("linear")
+    for i, image in enumerate(images):
+        img_next = images[i + 1] if i < len(images) - 1 else None
+        write_image_segment(video, image, img_next, args.duration, args.transition, args.fps, renderer)
+    video.release()
+
+
+def mean_psnr(path, reference):
+    """PSNR trung bình (dB) giữa các frame giải mã và frame gốc, kèm số frame giải mã được"""
+    capture = cv2.VideoCapture(path)
+    values, count = [], 0
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        if count < len(reference):
+            mse = np.mean((frame.astype(np.float32) - reference[count]) ** 2)
+            values.append(100.0 if mse == 0 else 10 * np.log10(255.0 ** 2 / mse))
+        count += 1
+    capture.release()
+    return (float(np.mean(values)) if values else 0.0), count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark các bộ mã hóa video.")
+    parser.add_argument("--encoders", default=",".join(ENCODERS), help="Các bộ mã hóa cần đo, phân cách bằng dấu phẩy.")
+    parser.add_argument("--images", type=int, default=5, help="Số hình ảnh.")
+    parser.add_argument("--resolution", default="1280x720", help="Độ phân giải: chiều rộng x chiều cao.")
+    parser.add_argument("--duration", type=float, default=2.0, help="Thời lượng mỗi hình (giây).")
+    parser.add_argument("--transition", type=float, default=0.5, help="Thời gian chuyển cảnh (giây).")
+    parser.add_argument("--fps", type=int, default=30, help="Số khung hình mỗi giây.")
+    parser.add_argument("--preset", default="veryfast", help="Preset của bộ mã hóa ffmpeg.")
+    parser.add_argument("--threads", default="0",
+                        help="Các số luồng ffmpeg cần đo, phân cách bằng dấu phẩy (0 = tự chọn).")
+    args = parser.parse_args()
+
+    names = args.encoders.split(",")
+    if find_ffmpeg() is None and any(name != "opencv" for name in names):
+        print("Không tìm thấy ffmpeg (đặt FFMPEG_BINARY hoặc cài ffmpeg), chỉ đo opencv.")
+        names = [name for name in names if name == "opencv"]
+
+    width, height = map(int, args.resolution.split('x'))
+    rng = np.random.default_rng(0)
+    # Hình có tần số thấp kèm chút nhiễu, gần với hình sinh bởi mô hình hơn nhiễu trắng
+    images = [
+        np.clip(cv2.resize(rng.integers(0, 256, (height // 32, width // 32, 3), dtype=np.uint8), (width, height),
+                           interpolation=cv2.INTER_CUBIC) + rng.normal(0, 4, (height, width, 3)), 0, 255)
+        .astype(np.uint8)
+        for _ in range(args.images)
+    ]
+    recorder = FrameRecorder()
+    write_slideshow(recorder, images, args)
+    reference = recorder.frames
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in names:
+            for threads in ([0] if name == "opencv" else [int(t) for t in args.threads.split(",")]):
+                encoder = get_encoder(name, preset=args.preset, threads=threads)
+                path = os.path.join(tmp, f"{name}_{threads}.mp4")
+                start = time.perf_counter()
+                write_slideshow(encoder.open(path, args.fps, (width, height)), images, args)
+                elapsed = time.perf_counter() - start
+                quality, count = mean_psnr(path, reference)
+                rows.append((name, threads, elapsed, os.path.getsize(path), quality, count))
+
+    seconds = len(reference) / args.fps
+    print(f"\n{args.images} hình {width}x{height}, {args.fps} fps, {len(reference)} frame ({seconds:.1f}s), "
+          f"preset {args.preset}")
+    print(f"{'Bộ mã hóa':>10s} {'Luồng':>6s} {'Thời gian':>10s} {'Frame/s':>8s} {'Dung lượng':>11s} "
+          f"{'Bitrate':>11s} {'PSNR':>8s}")
+    for name, threads, elapsed, size, quality, count in rows:
+        label = "-" if name == "opencv" else ("tự" if threads == 0 else str(threads))
+        print(f"{name:>10s} {label:>6s} {elapsed:9.2f}s {len(reference) / elapsed:8.0f} {size / 1024:9.0f}KB "
+              f"{size * 8 / seconds / 1000:7.0f}kb/s {quality:6.1f}dB")
+
+    checks = {
+        "đủ số frame": all(row[5] == len(reference) for row in rows),
+        "chất lượng chấp nhận được (PSNR > 30 dB)": all(row[4] > 30 for row in rows),
+    }
+    print()
+    for name, ok in checks.items():
+        print(f"{name}: {ok}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+So sánh thời gian ghi và dung lượng file giữa video CFR (OpenCV) và VFR (ffmpeg) cho video kiểu trình chiếu
+
+Ví dụ: python -m benchmarks.bench_hold_frames --images 5 --duration 6 --transition 0.5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from video_generator import VideoGenerator
+from video_writers import find_ffmpeg
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ghi các đoạn giữ hình.")
+    parser.add_argument("--images", type=int, default=5, help="Số hình ảnh.")
+    parser.add_argument("--resolution", default="512x512", help="Độ phân giải: chiều rộng x chiều cao.")
+    parser.add_argument("--duration", type=float, default=6.0, help="Thời lượng mỗi hình (giây).")
+    parser.add_argument("--transition", type=float, default=0.5, help="Thời gian chuyển cảnh (giây).")
+    parser.add_argument("--fps", type=int, default=24, help="Số khung hình mỗi giây.")
+    args = parser.parse_args()
+
+    if find_ffmpeg() is None:
+        print("Không tìm thấy ffmpeg (đặt FFMPEG_BINARY hoặc cài ffmpeg), bỏ qua benchmark.")
+        return
+
+    width, height = map(int, args.resolution.split('x'))
+    rng = np.random.default_rng(0)
+    # Hình có tần số thấp giống ảnh thật hơn nhiễu trắng
+    images = [
+        cv2.resize(rng.integers(0, 256, (height // 32, width // 32, 3), dtype=np.uint8), (width, height),
+                   interpolation=cv2.INTER_CUBIC)
+        for _ in range(args.images)
+    ]
+    generator = VideoGenerator(device="cpu", pipeline=object())
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for vfr in (False, True):
+            path = os.path.join(tmp, f"{'vfr' if vfr else 'cfr'}.mp4")
+            start = time.perf_counter()
+            generator._create_video_from_images(
+                images, path, duration_per_image=args.duration,
+                transition_duration=args.transition, fps=args.fps, vfr=vfr
+            )
+            results[vfr] = (time.perf_counter() - start, os.path.getsize(path))
+
+    (t_cfr, size_cfr), (t_vfr, size_vfr) = results[False], results[True]
+    print(f"\nCFR (OpenCV mp4v): {t_cfr:.3f}s, {size_cfr / 1024:.0f} KB")
+    print(f"VFR (ffmpeg H.264): {t_vfr:.3f}s, {size_vfr / 1024:.0f} KB")
+    print(f"Thời gian ghi giảm {t_cfr / t_vfr:.1f}x, dung lượng giảm {size_cfr / size_vfr:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
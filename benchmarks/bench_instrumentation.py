@@ -0,0 +1,124 @@
+"""
+Kiểm tra báo cáo số liệu theo giai đoạn của generate_video
+
+Chạy generate_video (ghi video sau khi sinh xong và ghi song song) với sink JSON
+và Prometheus, rồi kiểm tra: kết quả trả về dùng được như bool, đủ các giai đoạn,
+số bước khử nhiễu và số khung hình khớp cấu hình, thời gian mỗi bước gần với chi
+phí giả lập, endpoint /metrics trả về đúng định dạng. Cuối cùng chạy nhiều
+generate_video cùng lúc trên cùng generator (như server / batch nhiều luồng) và
+kiểm tra mỗi lượt có báo cáo riêng, không lẫn số liệu của lượt khác.
+
+Ví dụ: python -m benchmarks.bench_instrumentation --frames 4 --steps 10
+       python -m benchmarks.bench_instrumentation --pipeline tiny
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import urllib.request
+
+from benchmarks.stub_pipeline import StubPipeline
+from instrumentation import JSONReportSink, PrometheusSink
+from prompt_cache import PromptEmbeddingCache
+from video_generator import VideoGenerator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kiểm tra báo cáo số liệu theo giai đoạn.")
+    parser.add_argument("--pipeline", choices=["stub", "tiny"], default="stub",
+                        help="Pipeline giả lập hoặc pipeline diffusers nhỏ dựng offline.")
+    parser.add_argument("--frames", type=int, default=4, help="Số khung hình.")
+    parser.add_argument("--steps", type=int, default=10, help="Số bước khử nhiễu.")
+    parser.add_argument("--step-cost", type=float, default=0.01, help="Chi phí mỗi bước của pipeline giả lập (giây).")
+    parser.add_argument("--resolution", default="256x256", help="Độ phân giải: chiều rộng x chiều cao.")
+    args = parser.parse_args()
+
+    resolution = tuple(map(int, args.resolution.split('x')))
+    if args.pipeline == "tiny":
+        from benchmarks.tiny_pipeline import build_tiny_pipeline
+        pipeline = build_tiny_pipeline()
+    else:
+        pipeline = StubPipeline(args.step_cost, 0.0, args.steps, decode_cost=0.005)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = os.path.join(tmp, "report.jsonl")
+        prometheus = PrometheusSink(port=0)
+        generator = VideoGenerator(
+            device="cpu", pipeline=pipeline, prompt_cache=PromptEmbeddingCache(), steps=args.steps,
+            metrics_sinks=[JSONReportSink(report_path), prometheus]
+        )
+        results = {}
+        for streaming in (False, True):
+            results[streaming] = generator.generate_video(
+                "benchmark", output_path=os.path.join(tmp, f"{streaming}.mp4"), num_frames=args.frames,
+                frame_duration=0.5, transition_duration=0.25, resolution=resolution, seed=1,
+                debug_frames_dir=os.path.join(tmp, "frames"), streaming=streaming
+            )
+        port = prometheus.server.server_address[1]
+        metrics_text = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics").read().decode("utf-8")
+        prometheus.close()
+        # Lỗi trong generate_video: kết quả là False và báo cáo vẫn được ghi
+        failed = generator.generate_video("benchmark", output_path=os.path.join(tmp, "x.mp4"), num_frames=1,
+                                          resolution=resolution, upscaler="không-có")
+        with open(report_path, encoding="utf-8") as f:
+            reports = [json.loads(line) for line in f]
+
+        # Các lượt chạy song song với số khung hình khác nhau: số liệu của mỗi lượt phải khớp cấu hình của nó
+        concurrent = {}
+
+        def run_concurrent(k):
+            concurrent[k] = generator.generate_video(
+                "benchmark", output_path=os.path.join(tmp, f"concurrent_{k}.mp4"), num_frames=args.frames + k,
+                frame_duration=0.5, transition_duration=0.25, resolution=resolution, seed=k, streaming=k % 2 == 1
+            )
+
+        threads = [threading.Thread(target=run_concurrent, args=(k,)) for k in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    expected = {"text_encoder", "denoise", "vae_decode", "frame_save", "transition", "encode_video"}
+    print()
+    for streaming, result in results.items():
+        stages = result.metrics["stages"]
+        steps, frames = result.metrics["steps"], result.metrics["frames"]
+        print(f"{'Ghi song song' if streaming else 'Ghi sau khi sinh'}: {result.metrics['total_s']:.2f}s")
+        print(f"  {'Giai đoạn':14s} {'Lần':>5s} {'Thực (s)':>9s} {'CPU (s)':>8s} {'RSS đỉnh':>9s}")
+        for name, stats in stages.items():
+            rss = f"{stats['peak_rss_bytes'] / 2**20:.0f} MB" if "peak_rss_bytes" in stats else "-"
+            print(f"  {name:14s} {stats['count']:5d} {stats['wall_s']:9.3f} {stats['cpu_s']:8.3f} {rss:>9s}")
+        print(f"  Bước khử nhiễu: {steps['count']}, trung bình {steps['mean_s'] * 1000:.1f} ms, "
+              f"p95 {steps['p95_s'] * 1000:.1f} ms")
+        print(f"  Khung hình: {frames['count']}, trung bình {frames['mean_s']:.3f}s, p95 {frames['p95_s']:.3f}s")
+
+    checks = {
+        "bool(result) đúng": all(results.values()) and not failed and failed.error is not None,
+        "đủ các giai đoạn": all(expected <= set(r.metrics["stages"]) for r in results.values()),
+        "model_load chỉ ở lần đầu": "model_load" in results[False].metrics["stages"]
+                                    and "model_load" not in results[True].metrics["stages"],
+        "số bước khớp": all(r.metrics["steps"]["count"] == args.frames * args.steps for r in results.values()),
+        "số khung hình khớp": all(r.metrics["frames"]["count"] == args.frames for r in results.values()),
+        "có RSS đỉnh": all("peak_rss_bytes" in r.metrics["stages"]["denoise"] for r in results.values()),
+        "báo cáo JSONL": len(reports) == 3 and reports[0]["success"] and not reports[2]["success"],
+        "Prometheus /metrics": 'video_ai_stage_wall_seconds{stage="denoise"}' in metrics_text
+                               and "video_ai_step_seconds_count" in metrics_text,
+        "chạy song song thành công": len(concurrent) == 4 and all(concurrent.values()),
+        "chạy song song có số liệu riêng": all(
+            r.metrics["frames"]["count"] == args.frames + k
+            and r.metrics["steps"]["count"] == (args.frames + k) * args.steps
+            and expected - {"frame_save"} <= set(r.metrics["stages"])
+            for k, r in concurrent.items()
+        ),
+    }
+    if args.pipeline == "stub":
+        mean_step = results[False].metrics["steps"]["mean_s"]
+        checks["thời gian bước gần chi phí giả lập"] = abs(mean_step - args.step_cost) < args.step_cost * 0.5
+    print()
+    for name, ok in checks.items():
+        print(f"{name}: {ok}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+So sánh sinh mọi khung hình bằng khử nhiễu đầy đủ và nội suy latent giữa các khung hình neo
+
+Ví dụ: python -m benchmarks.bench_interpolation --frames 10 --interpolate 4
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.stub_pipeline import StubPipeline
+from video_generator import VideoGenerator
+
+
+def run(generator, num_frames, resolution, seed, batch_size, interpolation_steps):
+    """Chạy _generate_images_from_text, trả về (thời gian, số lần gọi pipeline, danh sách hình)"""
+    calls_before = generator.image_generator.calls
+    start = time.perf_counter()
+    frames = generator._generate_images_from_text(
+        "benchmark", num_frames=num_frames, resolution=resolution, seed=seed,
+        batch_size=batch_size, interpolation_steps=interpolation_steps
+    )
+    return time.perf_counter() - start, generator.image_generator.calls - calls_before, frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark nội suy latent giữa các khung hình neo.")
+    parser.add_argument("--frames", type=int, default=10, help="Số khung hình cần sinh.")
+    parser.add_argument("--interpolate", type=int, default=4, help="Số khung hình nội suy giữa hai khung hình neo.")
+    parser.add_argument("--batch-size", type=int, default=1, help="Kích thước lô.")
+    parser.add_argument("--resolution", default="256x256", help="Độ phân giải: chiều rộng x chiều cao.")
+    parser.add_argument("--steps", type=int, default=20, help="Số bước khử nhiễu giả lập.")
+    parser.add_argument("--step-cost", type=float, default=0.01, help="Chi phí mỗi bước (giây).")
+    parser.add_argument("--decode-cost", type=float, default=0.01, help="Chi phí giải mã VAE mỗi hình (giây).")
+    args = parser.parse_args()
+
+    resolution = tuple(map(int, args.resolution.split('x')))
+    pipeline = StubPipeline(args.step_cost, 0.0005, args.steps, decode_cost=args.decode_cost)
+    generator = VideoGenerator(device="cpu", pipeline=pipeline)
+
+    t_full, calls_full, full_frames = run(generator, args.frames, resolution, 42, args.batch_size, 0)
+    t_interp, calls_interp, interp_frames = run(
+        generator, args.frames, resolution, 42, args.batch_size, args.interpolate
+    )
+
+    # Khung hình neo phải giống hệt khung hình tương ứng khi sinh đầy đủ
+    anchors = sorted(set(range(0, args.frames, args.interpolate + 1)) | {args.frames - 1})
+    anchors_match = all(np.array_equal(full_frames[i], interp_frames[i]) for i in anchors)
+    print(f"\nKhử nhiễu đầy đủ: {t_full:.3f}s, {calls_full} lần gọi pipeline")
+    print(f"Nội suy latent:   {t_interp:.3f}s, {calls_interp} lần gọi pipeline ({len(anchors)} khung hình neo)")
+    print(f"Tăng tốc:         {t_full / t_interp:.2f}x")
+    print(f"Số khung hình:    {len(full_frames)} / {len(interp_frames)}")
+    print(f"Khung hình neo giống nhau: {anchors_match}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Bộ nhớ đỉnh theo giai đoạn ở độ phân giải cao với từng mức tiết kiệm bộ nhớ
+
+Dùng pipeline diffusers nhỏ dựng offline. Với mỗi mức tiết kiệm, ngân sách được
+đặt đúng bằng bộ nhớ ước lượng của mức đó để VideoGenerator chọn mức này.
+
+Ví dụ: python -m benchmarks.bench_memory_budget --resolution 768x768 --steps 2
+"""
+import argparse
+import math
+import time
+
+from benchmarks.tiny_pipeline import build_tiny_pipeline
+from memory_budget import SAVING_TIERS, estimate_peak_bytes, uses_sdpa
+from prompt_cache import PromptEmbeddingCache
+from video_generator import VideoGenerator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bộ nhớ đỉnh theo mức tiết kiệm bộ nhớ.")
+    parser.add_argument("--resolution", default="768x768", help="Độ phân giải: chiều rộng x chiều cao.")
+    parser.add_argument("--steps", type=int, default=2, help="Số bước khử nhiễu.")
+    parser.add_argument("--batch-size", type=int, default=2, help="Số hình sinh chung một lô.")
+    parser.add_argument("--attention", choices=["sdpa", "math"], default="sdpa",
+                        help="Cách tính attention của UNet (math để thấy tác dụng của chia nhỏ attention).")
+    args = parser.parse_args()
+
+    resolution = tuple(map(int, args.resolution.split('x')))
+    pipeline = build_tiny_pipeline()
+    if args.attention == "math":
+        from diffusers.models.attention_processor import AttnProcessor
+        pipeline.unet.set_attn_processor(AttnProcessor())
+    sdpa = uses_sdpa(pipeline.unet)
+    tiers = []
+    for tier in SAVING_TIERS:
+        tier = tuple(s for s in tier if s != "sequential_offload" and not (sdpa and s == "attention_slicing"))
+        if tier not in tiers:
+            tiers.append(tier)
+
+    rows = []
+    for tier in tiers:
+        estimate = estimate_peak_bytes(pipeline, resolution, args.batch_size, tier, sdpa=sdpa)
+        generator = VideoGenerator(
+            device="cpu", pipeline=pipeline, prompt_cache=PromptEmbeddingCache(), steps=args.steps,
+            memory_budget_mb=math.ceil(estimate / 2**20)
+        )
+        generator._start_run_metrics()
+        start = time.perf_counter()
+        generator._generate_images_from_text(
+            "benchmark", num_frames=args.batch_size, resolution=resolution, seed=1, batch_size=args.batch_size
+        )
+        elapsed = time.perf_counter() - start
+        generator._finish_run_metrics()
+        rows.append((", ".join(tier) or "không tiết kiệm", estimate, generator.memory_peaks, elapsed))
+
+    print()
+    stages = ("text_encoder", "denoise", "vae_decode")
+    print(f"{'Mức tiết kiệm':52s} {'Ước lượng':>10s} " + " ".join(f"{s:>12s}" for s in stages) + f" {'Thời gian':>10s}")
+    for name, estimate, peaks, elapsed in rows:
+        print(f"{name:52s} {estimate / 2**20:8.0f}MB "
+              + " ".join(f"{peaks.get(s, 0) / 2**20:10.0f}MB" for s in stages) + f" {elapsed:9.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Thời gian sinh mỗi khung hình trên CPU theo từng preset chất lượng / tốc độ
+
+Mặc định dùng pipeline diffusers thật với trọng số ngẫu nhiên rất nhỏ (không
+cần tải mô hình); thêm --model để đo trên mô hình thật.
+
+Ví dụ: python -m benchmarks.bench_presets --frames 3 --resolution 256x256
+"""
+import argparse
+import time
+
+from prompt_cache import PromptEmbeddingCache
+from schedulers import PRESETS
+from video_generator import VideoGenerator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark thời gian mỗi khung hình theo preset.")
+    parser.add_argument("--frames", type=int, default=3, help="Số khung hình đo cho mỗi preset.")
+    parser.add_argument("--resolution", default="256x256", help="Độ phân giải: chiều rộng x chiều cao.")
+    parser.add_argument("--model", help="ID mô hình Stable Diffusion thật (mặc định: pipeline nhỏ dựng offline).")
+    parser.add_argument("--schedulers", action="store_true", help="Đo thêm từng scheduler với cùng số bước.")
+    args = parser.parse_args()
+
+    resolution = tuple(map(int, args.resolution.split('x')))
+    if args.model:
+        pipeline = VideoGenerator(model_id=args.model, device="cpu").image_generator
+    else:
+        from benchmarks.tiny_pipeline import build_tiny_pipeline
+        pipeline = build_tiny_pipeline()
+
+    configs = [("mặc định", {})] + [(name, {"preset": name}) for name in PRESETS]
+    if args.schedulers:
+        configs += [(f"{name} / 20 bước", {"scheduler": name, "steps": 20})
+                    for name in ("ddim", "euler", "euler-a", "dpm++", "unipc")]
+
+    rows = []
+    for name, sampling in configs:
+        generator = VideoGenerator(
+            device="cpu", pipeline=pipeline, prompt_cache=PromptEmbeddingCache(), **sampling
+        )
+        # Chạy thử một hình để loại trừ thời gian khởi tạo scheduler
+        generator._generate_images_from_text("benchmark", num_frames=1, resolution=resolution, seed=0)
+        start = time.perf_counter()
+        generator._generate_images_from_text("benchmark", num_frames=args.frames, resolution=resolution, seed=1)
+        elapsed = time.perf_counter() - start
+        rows.append((name, generator.sampling, elapsed / args.frames))
+
+    print()
+    print(f"{'Cấu hình':18s} {'Scheduler':14s} {'Bước':>5s} {'Guidance':>9s} {'s/hình':>8s}")
+    for name, sampling, per_frame in rows:
+        print(f"{name:18s} {sampling['scheduler'] or 'mặc định':14s} {str(sampling['steps'] or '-'):>5s} "
+              f"{str(sampling['guidance_scale'] or '-'):>9s} {per_frame:8.3f}")
+
+
+if __name__ == "__main__":
+    main()
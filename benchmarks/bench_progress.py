@@ -0,0 +1,100 @@
+"""
+Kiểm tra hàm theo dõi tiến độ và hủy của generate_video (dùng bởi giao diện)
+
+Với pipeline giả lập, benchmark đo chi phí của on_progress (gồm cả việc tạo hình thu
+nhỏ PPM như giao diện) so với không theo dõi, và kiểm tra:
+- tiến độ tăng dần, mỗi khung hình được báo đúng một lần kèm hình
+- hủy giữa chừng dừng sau một bước khử nhiễu, kết quả là False (ghi sau khi sinh và ghi song song)
+- cùng một VideoGenerator dùng lại được sau khi bị hủy
+
+Ví dụ: python -m benchmarks.bench_progress --frames 6 --steps 20
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.stub_pipeline import StubPipeline
+from gui import thumbnail_ppm
+from prompt_cache import PromptEmbeddingCache
+from video_generator import VideoGenerator
+
+
+def run(generator, path, args, **kwargs):
+    start = time.perf_counter()
+    result = generator.generate_video(
+        "benchmark", output_path=path, num_frames=args.frames, frame_duration=0.5, transition_duration=0.25,
+        resolution=(256, 256), seed=1, **kwargs
+    )
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kiểm tra tiến độ và hủy của generate_video.")
+    parser.add_argument("--frames", type=int, default=6, help="Số khung hình.")
+    parser.add_argument("--steps", type=int, default=20, help="Số bước khử nhiễu.")
+    parser.add_argument("--step-cost", type=float, default=0.01, help="Chi phí mỗi bước giả lập (giây).")
+    args = parser.parse_args()
+
+    generator = VideoGenerator(device="cpu", pipeline=StubPipeline(args.step_cost, 0.0, args.steps),
+                               prompt_cache=PromptEmbeddingCache(), steps=args.steps)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "out.mp4")
+        run(generator, path, args)
+        _, plain = run(generator, path, args)
+
+        events = []
+
+        def on_progress(frames_done, num_frames, image):
+            events.append((frames_done, num_frames, image is not None))
+            if image is not None:
+                thumbnail_ppm(image)
+
+        result, tracked = run(generator, path, args, on_progress=on_progress)
+        progress = [frames_done for frames_done, _, _ in events]
+        frame_events = [frames_done for frames_done, _, has_image in events if has_image]
+
+        # Hủy sau khoảng nửa thời gian chạy: đo thời gian từ lúc yêu cầu hủy tới khi generate_video trả về
+        cancel_checks = {}
+        for streaming in (False, True):
+            cancel = threading.Event()
+            timer = threading.Timer(plain / 2, cancel.set)
+            timer.start()
+            cancelled, _ = run(generator, path, args, is_cancelled=cancel.is_set, streaming=streaming)
+            timer.join()
+            cancel_checks[streaming] = (cancelled, cancel.is_set())
+        cancelled_at = {}
+        cancel = threading.Event()
+        steps_seen = []
+
+        def cancel_after_steps(frames_done, num_frames, image):
+            steps_seen.append(frames_done)
+            if len(steps_seen) == args.steps + 3:
+                cancel.set()
+                cancelled_at["time"] = time.perf_counter()
+
+        run(generator, path, args, on_progress=cancel_after_steps, is_cancelled=cancel.is_set)
+        latency = time.perf_counter() - cancelled_at["time"]
+        reused, _ = run(generator, path, args)
+
+    print(f"\nKhông theo dõi tiến độ:     {plain:.3f}s")
+    print(f"Có on_progress + thu nhỏ:  {tracked:.3f}s ({(tracked - plain) / plain:+.1%})")
+    print(f"Thời gian từ lúc hủy tới khi trả về: {latency * 1000:.1f} ms")
+    checks = {
+        "kết quả thành công": bool(result),
+        "tiến độ tăng dần": progress == sorted(progress) and progress[-1] == args.frames,
+        "mỗi khung hình báo một lần": frame_events == list(range(1, args.frames + 1)),
+        "báo mỗi bước khử nhiễu": len(events) == args.frames * (args.steps + 1),
+        "hủy khi ghi sau khi sinh": not cancel_checks[False][0] and cancel_checks[False][1],
+        "hủy khi ghi song song": not cancel_checks[True][0] and cancel_checks[True][1],
+        "hủy dừng sau một bước": len(steps_seen) == args.steps + 3,
+        "dùng lại sau khi hủy": bool(reused),
+    }
+    print()
+    for name, ok in checks.items():
+        print(f"{name}: {ok}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+So sánh chạy text encoder cho mỗi khung hình và dùng bộ nhớ đệm embedding prompt
+
+Ví dụ: python -m benchmarks.bench_prompt_cache --frames 20 --jobs 3
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.stub_pipeline import StubPipeline
+from prompt_cache import PromptEmbeddingCache
+from video_generator import VideoGenerator
+
+
+def run(generator, jobs, num_frames, resolution, batch_size):
+    """Sinh cùng một prompt cho nhiều job liên tiếp, trả về (thời gian, số lần chạy text encoder, hình job cuối)"""
+    pipeline = generator.image_generator
+    encode_before = pipeline.encode_calls
+    start = time.perf_counter()
+    for job in range(jobs):
+        frames = generator._generate_images_from_text(
+            "benchmark", num_frames=num_frames, resolution=resolution, seed=42 + job, batch_size=batch_size
+        )
+    return time.perf_counter() - start, pipeline.encode_calls - encode_before, frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bộ nhớ đệm embedding prompt.")
+    parser.add_argument("--frames", type=int, default=20, help="Số khung hình mỗi job.")
+    parser.add_argument("--jobs", type=int, default=3, help="Số job dùng cùng một prompt.")
+    parser.add_argument("--batch-size", type=int, default=1, help="Kích thước lô.")
+    parser.add_argument("--resolution", default="256x256", help="Độ phân giải: chiều rộng x chiều cao.")
+    parser.add_argument("--steps", type=int, default=20, help="Số bước khử nhiễu giả lập.")
+    parser.add_argument("--encode-cost", type=float, default=0.02, help="Chi phí text encoder mỗi prompt (giây).")
+    args = parser.parse_args()
+
+    resolution = tuple(map(int, args.resolution.split('x')))
+    results = {}
+    for name, cache in (("Không lưu", PromptEmbeddingCache(max_entries=0)), ("Có lưu", PromptEmbeddingCache())):
+        pipeline = StubPipeline(0.002, 0.0005, args.steps, encode_cost=args.encode_cost)
+        generator = VideoGenerator(device="cpu", pipeline=pipeline, prompt_cache=cache)
+        results[name] = run(generator, args.jobs, args.frames, resolution, args.batch_size) + (cache.stats(),)
+
+    print()
+    for name, (elapsed, encode_calls, _, stats) in results.items():
+        print(f"{name:10s} {elapsed:.3f}s, text encoder chạy {encode_calls} lần, "
+              f"{stats['hits']} trúng / {stats['misses']} trượt")
+    (t_off, _, frames_off, _), (t_on, _, frames_on, _) = results.values()
+    print(f"Tăng tốc:  {t_off / t_on:.2f}x")
+    print(f"Kết quả từng hình giống nhau: {all(np.array_equal(a, b) for a, b in zip(frames_off, frames_on))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+So sánh float32 và lượng tử hóa động int8 với pipeline diffusers nhỏ dựng offline
+
+In dung lượng UNet / text encoder, thời gian mỗi bước khử nhiễu và độ lệch của hình
+so với float32, rồi kiểm tra (thoát với mã lỗi nếu không đạt): các module đã được lượng
+tử hóa, module int8 đọc lại từ đĩa cho kết quả giống hệt, độ lệch so với float32 nằm
+trong ngưỡng --tolerance, và module đã lưu không được đọc lại khi trọng số gốc thay đổi.
+
+Ví dụ: python -m benchmarks.bench_quantization --steps 10 --resolution 256x256
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from benchmarks.checks import report_checks
+from benchmarks.tiny_pipeline import build_tiny_pipeline
+from model_registry import module_bytes
+from quantization import QUANTIZED_COMPONENTS, is_quantized, load_quantized_components, quantize_pipeline
+
+
+def run(pipeline, steps, resolution, repeats):
+    """Sinh một hình, trả về (thời gian trung bình mỗi bước, mảng hình)"""
+    step_times = []
+    last = [0.0]
+
+    def on_step_end(pipe, step, timestep, callback_kwargs):
+        now = time.perf_counter()
+        step_times.append(now - last[0])
+        last[0] = now
+        return callback_kwargs
+
+    for _ in range(repeats):
+        last[0] = time.perf_counter()
+        image = pipeline(
+            "benchmark", num_inference_steps=steps, height=resolution[1], width=resolution[0],
+            generator=torch.Generator().manual_seed(1), callback_on_step_end=on_step_end
+        ).images[0]
+    # Bỏ bước đầu tiên (gồm mã hóa prompt và khởi tạo)
+    return float(np.median(step_times[1:])), np.asarray(image)
+
+
+def footprint(pipeline):
+    return {name: module_bytes(getattr(pipeline, name)) for name in QUANTIZED_COMPONENTS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark lượng tử hóa động int8.")
+    parser.add_argument("--steps", type=int, default=10, help="Số bước khử nhiễu.")
+    parser.add_argument("--resolution", default="256x256", help="Độ phân giải: chiều rộng x chiều cao.")
+    parser.add_argument("--repeats", type=int, default=2, help="Số lần sinh hình cho mỗi cấu hình.")
+    parser.add_argument("--width", type=int, default=128, help="Số kênh khối sâu nhất của UNet nhỏ.")
+    parser.add_argument("--tolerance", type=float, default=4.0,
+                        help="Độ lệch trung bình tối đa (trên 255) của hình int8 so với float32.")
+    args = parser.parse_args()
+
+    resolution = tuple(map(int, args.resolution.split('x')))
+    build = lambda: build_tiny_pipeline(block_channels=(args.width // 2, args.width), cross_attention_dim=args.width)
+
+    pipeline = build()
+    fp32_size = footprint(pipeline)
+    fp32_step, fp32_image = run(pipeline, args.steps, resolution, args.repeats)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        start = time.perf_counter()
+        quantize_pipeline(pipeline, model_id="tiny-benchmark", cache_dir=cache_dir)
+        quantize_time = time.perf_counter() - start
+        int8_size = footprint(pipeline)
+        int8_step, int8_image = run(pipeline, args.steps, resolution, args.repeats)
+
+        # Lần khởi động sau: đọc module int8 từ đĩa thay vì lượng tử hóa lại
+        start = time.perf_counter()
+        components = load_quantized_components("tiny-benchmark", cache_dir=cache_dir)
+        load_time = time.perf_counter() - start
+        reloaded = build()
+        for name, module in components.items():
+            setattr(reloaded, name, module)
+        _, reloaded_image = run(reloaded, args.steps, resolution, 1)
+
+        # Module lưu kèm dấu vân tay trọng số gốc: sửa trọng số thì không đọc lại module cũ
+        model_dir = os.path.join(cache_dir, "model")
+        build().save_pretrained(model_dir)
+        quantize_pipeline(build(), model_id="tiny-saved", cache_dir=cache_dir, model_dir=model_dir)
+        fresh = load_quantized_components("tiny-saved", cache_dir=cache_dir, model_dir=model_dir)
+        for name in os.listdir(os.path.join(model_dir, "unet")):
+            path = os.path.join(model_dir, "unet", name)
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        stale = load_quantized_components("tiny-saved", cache_dir=cache_dir, model_dir=model_dir)
+
+    print()
+    for name in QUANTIZED_COMPONENTS:
+        print(f"{name:13s} float32 {fp32_size[name] / 2**20:7.2f} MB -> int8 {int8_size[name] / 2**20:7.2f} MB "
+              f"({fp32_size[name] / int8_size[name]:.2f}x nhỏ hơn)")
+    print(f"Mỗi bước:     float32 {fp32_step * 1000:7.1f} ms -> int8 {int8_step * 1000:7.1f} ms "
+          f"({fp32_step / int8_step:.2f}x)")
+    print(f"Lượng tử hóa: {quantize_time:.2f}s, đọc lại từ đĩa: {load_time:.2f}s")
+    deviation = np.abs(fp32_image.astype(np.int16) - int8_image).mean()
+    print(f"Độ lệch trung bình so với float32: {deviation:.2f} / 255")
+    report_checks({
+        "UNet và text encoder đã lượng tử hóa": all(
+            is_quantized(getattr(pipeline, name)) for name in QUANTIZED_COMPONENTS
+        ),
+        "đọc lại đủ module từ đĩa": set(components) == set(QUANTIZED_COMPONENTS),
+        "module đọc lại đã lượng tử hóa": all(is_quantized(module) for module in components.values()),
+        "hình từ module đọc lại giống hệt": np.array_equal(int8_image, reloaded_image),
+        f"độ lệch so với float32 <= {args.tolerance}": deviation <= args.tolerance,
+        "đọc lại module theo đúng trọng số gốc": set(fresh) == set(QUANTIZED_COMPONENTS),
+        "không đọc module cũ khi trọng số đổi": "unet" not in stale and "text_encoder" in stale,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Đường cong tăng tốc của mã hóa video song song theo đoạn (segment_encoding)
+
+Ghi cùng một video dài (nhiều keyframe, fps cao) tuần tự bằng một cv2.VideoWriter và
+song song với số tiến trình tăng dần, rồi kiểm tra video ghép có cùng số frame, cùng
+thời lượng và nội dung gần như giống hệt video ghi tuần tự (PSNR trung bình giữa hai bản giải
+mã; không bằng nhau tuyệt đối vì mỗi đoạn bắt đầu bằng một I-frame mới).
+
+Cần ffmpeg (trong PATH hoặc biến môi trường FFMPEG_BINARY). Tăng tốc bị giới hạn bởi số
+lõi CPU mà tiến trình được dùng.
+
+Ví dụ: python -m benchmarks.bench_segment_encoding --keyframes 24 --fps 30 --workers 1,2,4,8
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.stub_pipeline import StubPipeline
+from segment_encoding import available_cpus, encode_segments, get_pool
+from video_generator import VideoGenerator
+from video_writers import find_ffmpeg
+
+
+def read_video(path):
+    """(danh sách frame đã giải mã, fps) của video"""
+    import cv2
+    capture = cv2.VideoCapture(path)
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    frames = []
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(frame)
+    capture.release()
+    return frames, fps
+
+
+def psnr(a, b):
+    mse = np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2)
+    return float("inf") if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mã hóa video song song theo đoạn.")
+    parser.add_argument("--keyframes", type=int, default=24, help="Số keyframe (số đoạn).")
+    parser.add_argument("--resolution", default="1280x720", help="Độ phân giải video.")
+    parser.add_argument("--fps", type=int, default=30, help="Số khung hình mỗi giây.")
+    parser.add_argument("--duration", type=float, default=2.0, help="Thời gian mỗi keyframe (giây).")
+    parser.add_argument("--transition", type=float, default=0.5, help="Thời gian chuyển cảnh (giây).")
+    parser.add_argument("--workers", default="1,2,4,8", help="Các số tiến trình cần đo, phân cách bằng dấu phẩy.")
+    args = parser.parse_args()
+
+    if find_ffmpeg() is None:
+        print("Không tìm thấy ffmpeg (đặt FFMPEG_BINARY hoặc cài ffmpeg), bỏ qua benchmark.")
+        return
+
+    width, height = map(int, args.resolution.split('x'))
+    rng = np.random.default_rng(0)
+    # Hình có cả vùng mịn và chi tiết để codec phải làm việc như với hình thật
+    base = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    images = [np.clip(base + rng.normal(0, 6, (height, width, 3)), 0, 255).astype(np.uint8)
+              for _ in range(args.keyframes)]
+    generator = VideoGenerator(device="cpu", pipeline=StubPipeline())
+    workers_list = [int(w) for w in args.workers.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        serial_path = os.path.join(tmp, "serial.mp4")
+        start = time.perf_counter()
+        generator._create_video_from_images(images, serial_path, duration_per_image=args.duration,
+                                            transition_duration=args.transition, fps=args.fps)
+        serial_s = time.perf_counter() - start
+        serial_frames, serial_fps = read_video(serial_path)
+
+        rows = []
+        for workers in workers_list:
+            path = os.path.join(tmp, f"parallel_{workers}.mp4")
+            # Khởi động các tiến trình trước (chỉ tốn một lần mỗi phiên), không tính vào thời gian mã hóa
+            start = time.perf_counter()
+            pool = get_pool(workers)
+            list(pool.map(abs, range(workers * 4)))
+            startup_s = time.perf_counter() - start
+            start = time.perf_counter()
+            encode_segments(images, path, args.duration, args.transition, args.fps, (width, height), workers=workers)
+            elapsed = time.perf_counter() - start
+            frames, fps = read_video(path)
+            quality = np.mean([psnr(a, b) for a, b in zip(frames, serial_frames)]) if frames else 0.0
+            rows.append((workers, elapsed, len(frames), fps, quality, startup_s))
+
+    print(f"\n{args.keyframes} keyframe {width}x{height}, {args.fps} fps, {len(serial_frames)} frame; "
+          f"{available_cpus()} lõi CPU khả dụng")
+    print(f"{'Tiến trình':>10s} {'Thời gian':>10s} {'Tăng tốc':>9s} {'Hiệu suất':>10s} {'Frame':>6s} {'PSNR':>9s} "
+          f"{'Khởi động':>10s}")
+    print(f"{'tuần tự':>10s} {serial_s:9.2f}s {1.0:8.2f}x {'':>10s} {len(serial_frames):6d}")
+    for workers, elapsed, count, fps, quality, startup_s in rows:
+        speedup = serial_s / elapsed
+        print(f"{workers:>10d} {elapsed:9.2f}s {speedup:8.2f}x {speedup / min(workers, available_cpus()):9.0%} "
+              f"{count:6d} {quality:8.1f}dB {startup_s:9.2f}s")
+
+    checks = {
+        "cùng số frame": all(row[2] == len(serial_frames) for row in rows),
+        "cùng fps": all(abs(row[3] - serial_fps) < 1e-3 for row in rows),
+        "nội dung giống bản tuần tự (PSNR trung bình > 30 dB)": all(row[4] > 30 for row in rows),
+    }
+    print()
+    for name, ok in checks.items():
+        print(f"{name}: {ok}")
+
+
+if __name__ == "__main__":
+    main()
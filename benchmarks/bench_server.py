@@ -0,0 +1,127 @@
+"""
+Chạy thử server HTTP với pipeline giả lập (offline): gửi nhiều job, theo dõi tiến độ, hủy và tải kết quả
+
+Chạy cùng kịch bản với một worker và với --concurrency worker (các worker dùng chung một
+VideoGenerator), rồi kiểm tra: mọi job không bị hủy đều xong đủ khung hình, file video có
+đúng số frame (theo fps của job hoặc --fps của server), tải kết quả trả về đúng file, job bị hủy dừng đúng trạng thái.
+
+Ví dụ: python -m benchmarks.bench_server --jobs 6 --frames 4 --concurrency 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import cv2
+
+from benchmarks.checks import report_checks
+from benchmarks.stub_pipeline import StubPipeline
+from server import GenerationServer
+from video_generator import VideoGenerator
+
+
+async def request(port, method, path, payload=None):
+    """Gửi một request HTTP tới server, trả về (mã trạng thái, nội dung)"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, data = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), data
+
+
+def frame_count(path):
+    capture = cv2.VideoCapture(path)
+    count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    capture.release()
+    return count
+
+
+async def run(args, concurrency, tmp):
+    """Chạy kịch bản với concurrency worker, trả về danh sách kiểm tra {tên: đạt hay không}"""
+    pipeline = StubPipeline(args.step_cost, 0.0005, args.steps)
+    generator = VideoGenerator(device="cpu", pipeline=pipeline)
+    server = GenerationServer(generator, output_dir=os.path.join(tmp, str(concurrency)), max_concurrency=concurrency,
+                              batch_size=args.batch_size, max_merge=args.max_merge, fps=args.fps)
+    await server.start()
+    http_server = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+    port = http_server.sockets[0].getsockname()[1]
+
+    start = time.perf_counter()
+    ids, statuses = [], []
+    for i in range(args.jobs):
+        # Hai độ phân giải để có nhiều nhóm job chạy song song trên các worker; một số job tự đặt fps
+        payload = {
+            "text": f"cảnh {i}", "frames": args.frames, "resolution": "128x128" if i % 2 else "96x96", "seed": i,
+            "frame_duration": 0.5, "transition": 0.25
+        }
+        if i % 3 == 0:
+            payload["fps"] = 12
+        status, data = await request(port, "POST", "/jobs", payload)
+        statuses.append(status)
+        ids.append(json.loads(data)["id"])
+
+    # Hủy job cuối cùng khi nó còn trong hàng đợi hoặc đang chạy
+    await request(port, "POST", f"/jobs/{ids[-1]}/cancel")
+
+    while True:
+        status, data = await request(port, "GET", "/jobs")
+        jobs = {job["id"]: job for job in json.loads(data)}
+        if all(job["status"] in ("done", "failed", "cancelled") for job in jobs.values()):
+            break
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+
+    status, data = await request(port, "GET", f"/jobs/{ids[0]}/result")
+    first_output = server.jobs[ids[0]].params["output"]
+    http_server.close()
+
+    print(f"\n{concurrency} worker: {elapsed:.2f}s, {pipeline.calls} lần gọi pipeline")
+    for job_id in ids:
+        job = jobs[job_id]
+        print(f"- {job_id}: {job['status']} ({job['frames_done']}/{job['frames_total']} khung hình)"
+              + (f" - {job['error']}" if job["error"] else ""))
+
+    finished = [jobs[job_id] for job_id in ids[:-1]]
+    # Mỗi khung hình 0.5s
+    expected_frames = lambda job: int(0.5 * (server.jobs[job["id"]].params["fps"] or args.fps)) * args.frames
+    return {
+        f"{concurrency} worker: gửi job trả về 202": all(status == 202 for status in statuses),
+        f"{concurrency} worker: mọi job không bị hủy đều xong": all(job["status"] == "done" for job in finished),
+        f"{concurrency} worker: đủ khung hình": all(job["frames_done"] == args.frames for job in finished),
+        f"{concurrency} worker: video đúng số frame": all(
+            frame_count(server.jobs[job["id"]].params["output"]) == expected_frames(job) for job in finished
+        ),
+        f"{concurrency} worker: tải kết quả đúng file": status == 200 and len(data) == os.path.getsize(first_output),
+        f"{concurrency} worker: job bị hủy": jobs[ids[-1]]["status"] in ("cancelled", "done"),
+    }
+
+
+async def run_all(args):
+    checks = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for concurrency in dict.fromkeys([1, args.concurrency]):
+            checks.update(await run(args, concurrency, tmp))
+    return checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chạy thử server HTTP với pipeline giả lập.")
+    parser.add_argument("--jobs", type=int, default=8, help="Số job gửi lên.")
+    parser.add_argument("--frames", type=int, default=4, help="Số khung hình mỗi job.")
+    parser.add_argument("--batch-size", type=int, default=4, help="Số khung hình mỗi lần khử nhiễu.")
+    parser.add_argument("--max-merge", type=int, default=2, help="Số job tối đa gộp vào một nhóm.")
+    parser.add_argument("--concurrency", type=int, default=3, help="Số worker của lần chạy thứ hai.")
+    parser.add_argument("--fps", type=int, default=30, help="Số khung hình mỗi giây của server.")
+    parser.add_argument("--steps", type=int, default=20, help="Số bước khử nhiễu giả lập.")
+    parser.add_argument("--step-cost", type=float, default=0.005, help="Chi phí mỗi bước (giây).")
+    args = parser.parse_args()
+    report_checks(asyncio.run(run_all(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Đo thời gian khởi động của CLI và giao diện
+
+Mỗi trường hợp chạy trong một tiến trình Python mới (tính cả thời gian khởi động
+trình thông dịch), lấy thời gian nhỏ nhất qua các lần chạy:
+- python main.py --help
+- import video_generator / import gui (kiểm tra thêm torch, diffusers, transformers chưa bị import)
+- giao diện vẽ xong lần đầu (Tk + VideoGeneratorGUI + root.update()), chỉ khi có màn hình (DISPLAY)
+
+Ví dụ: python -m benchmarks.bench_startup --repeat 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("torch", "diffusers", "transformers")
+
+# Kiểm tra module nặng đã bị import chưa ngay sau khi import module cần đo
+IMPORT_CHECK = "import sys, {module}; print(','.join(m for m in {heavy!r} if m in sys.modules))"
+
+# Vẽ cửa sổ lần đầu rồi thoát ngay (không chờ luồng tải trước mô hình)
+FIRST_PAINT = """
+import os, tkinter as tk
+from gui import VideoGeneratorGUI
+root = tk.Tk()
+VideoGeneratorGUI(root)
+root.update()
+os._exit(0)
+"""
+
+
+def run(args, repeat):
+    """Chạy lệnh repeat lần, trả về (thời gian nhỏ nhất, stdout lần cuối, mã thoát lần cuối)"""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable] + args, cwd=ROOT, capture_output=True, text=True)
+        best = min(best, time.perf_counter() - start)
+    return best, result.stdout.strip(), result.returncode
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo thời gian khởi động CLI và giao diện.")
+    parser.add_argument("--repeat", type=int, default=3, help="Số lần chạy mỗi trường hợp.")
+    parser.add_argument("--target", type=float, default=1.0, help="Ngưỡng thời gian chấp nhận được (giây).")
+    args = parser.parse_args()
+    repeat = max(1, args.repeat)
+
+    rows = []
+    elapsed, _, code = run(["main.py", "--help"], repeat)
+    rows.append(("main.py --help", elapsed, code == 0))
+    for module in ("video_generator", "gui"):
+        elapsed, heavy, code = run(["-c", IMPORT_CHECK.format(module=module, heavy=HEAVY_MODULES)], repeat)
+        rows.append((f"import {module}", elapsed, code == 0 and not heavy))
+        if heavy:
+            print(f"Cảnh báo: import {module} kéo theo {heavy}")
+    if os.environ.get("DISPLAY"):
+        elapsed, _, code = run(["-c", FIRST_PAINT], repeat)
+        rows.append(("giao diện vẽ lần đầu", elapsed, code == 0))
+    else:
+        print("Bỏ qua đo giao diện vẽ lần đầu: không có màn hình (DISPLAY)")
+
+    print(f"\n{'Trường hợp':24s} {'Thời gian':>10s}  Đạt (< {args.target:.1f}s)")
+    for name, elapsed, ok in rows:
+        print(f"{name:24s} {elapsed:9.3f}s  {ok and elapsed < args.target}")
+
+
+if __name__ == "__main__":
+    main()
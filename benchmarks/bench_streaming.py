@@ -0,0 +1,57 @@
+"""
+So sánh thời gian end-to-end giữa chế độ tuần tự và chế độ streaming của generate_video
+
+Ví dụ: python -m benchmarks.bench_streaming --frames 8 --resolution 512x512
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.stub_pipeline import StubPipeline
+from video_generator import VideoGenerator
+
+
+def run(generator, output_path, args, resolution, streaming):
+    """Chạy generate_video một lần và trả về thời gian (giây)"""
+    start = time.perf_counter()
+    ok = generator.generate_video(
+        "benchmark",
+        output_path=output_path,
+        num_frames=args.frames,
+        frame_duration=args.duration,
+        transition_duration=args.transition,
+        resolution=resolution,
+        seed=42,
+        streaming=streaming
+    )
+    elapsed = time.perf_counter() - start
+    if not ok:
+        raise RuntimeError("generate_video thất bại")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ghi video song song với sinh hình.")
+    parser.add_argument("--frames", type=int, default=8, help="Số khung hình cần sinh.")
+    parser.add_argument("--resolution", default="512x512", help="Độ phân giải: chiều rộng x chiều cao.")
+    parser.add_argument("--duration", type=float, default=2.0, help="Thời lượng mỗi hình (giây).")
+    parser.add_argument("--transition", type=float, default=1.0, help="Thời gian chuyển cảnh (giây).")
+    parser.add_argument("--steps", type=int, default=20, help="Số bước khử nhiễu giả lập.")
+    parser.add_argument("--step-cost", type=float, default=0.01, help="Chi phí mỗi bước (giây).")
+    args = parser.parse_args()
+
+    resolution = tuple(map(int, args.resolution.split('x')))
+    generator = VideoGenerator(device="cpu", pipeline=StubPipeline(args.step_cost, 0, args.steps))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t_seq = run(generator, os.path.join(tmp, "seq.mp4"), args, resolution, False)
+        t_stream = run(generator, os.path.join(tmp, "stream.mp4"), args, resolution, True)
+
+    print(f"\nTuần tự:    {t_seq:.3f}s")
+    print(f"Streaming:  {t_stream:.3f}s")
+    print(f"Tiết kiệm:  {t_seq - t_stream:.3f}s ({(1 - t_stream / t_seq) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
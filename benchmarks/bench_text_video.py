@@ -0,0 +1,41 @@
+"""
+Đo thời gian tạo video văn bản của app_simple.create_text_video
+
+Ví dụ: python -m benchmarks.bench_text_video --duration 60 --resolution 1920x1080
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from app_simple import ANIMATIONS, create_text_video
+from video_writers import find_ffmpeg
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark video văn bản.")
+    parser.add_argument("--duration", type=int, default=60, help="Thời lượng video (giây).")
+    parser.add_argument("--fps", type=int, default=24, help="Số khung hình mỗi giây.")
+    parser.add_argument("--resolution", default="1920x1080", help="Độ phân giải: chiều rộng x chiều cao.")
+    args = parser.parse_args()
+
+    resolution = tuple(map(int, args.resolution.split('x')))
+    modes = [False, True] if find_ffmpeg() is not None else [False]
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for animation in ANIMATIONS:
+            for vfr in modes:
+                path = os.path.join(tmp, f"{animation}_{vfr}.mp4")
+                start = time.perf_counter()
+                create_text_video("Xin chào từ Video Generator!", path, args.duration, args.fps, resolution,
+                                  animation=animation, vfr=vfr)
+                rows.append((animation, "VFR" if vfr else "CFR", time.perf_counter() - start, os.path.getsize(path)))
+
+    print(f"\n{'Hiệu ứng':<10} {'Chế độ':<6} {'Thời gian':>10} {'Dung lượng':>12}")
+    for animation, mode, elapsed, size in rows:
+        print(f"{animation:<10} {mode:<6} {elapsed:>9.2f}s {size / 1024:>10.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Microbenchmark sinh frame chuyển cảnh: cách cũ (cấp phát mỗi frame) so với TransitionRenderer
+
+Ví dụ: python -m benchmarks.bench_transitions --resolution 1024x1024 --frames 24
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from transitions import TRANSITIONS, TransitionRenderer
+
+
+def legacy_frames(img_a, img_b, num_frames):
+    """Cách làm trước đây: mỗi frame gọi addWeighted và cấp phát buffer mới"""
+    for j in range(num_frames):
+        alpha = j / num_frames
+        yield cv2.addWeighted(img_a, 1 - alpha, img_b, alpha, 0)
+
+
+def measure(frames_fn, repeat):
+    """Thời gian trung bình (ms) cho một đoạn chuyển cảnh"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for frame in frames_fn():
+            pass
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark hiệu ứng chuyển cảnh.")
+    parser.add_argument("--resolution", default="1024x1024", help="Độ phân giải: chiều rộng x chiều cao.")
+    parser.add_argument("--frames", type=int, default=24, help="Số frame mỗi đoạn chuyển cảnh.")
+    parser.add_argument("--repeat", type=int, default=5, help="Số lần lặp, lấy kết quả tốt nhất.")
+    args = parser.parse_args()
+
+    width, height = map(int, args.resolution.split('x'))
+    rng = np.random.default_rng(0)
+    img_a = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    img_b = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+    before = measure(lambda: legacy_frames(img_a, img_b, args.frames), args.repeat)
+    print(f"{'legacy (addWeighted, cấp phát mới)':<36} {before:8.2f} ms/đoạn")
+
+    # Kiểm tra kiểu linear cho kết quả giống hệt cách cũ
+    renderer = TransitionRenderer("linear")
+    same = all(
+        np.array_equal(old, new)
+        for old, new in zip(legacy_frames(img_a, img_b, args.frames), renderer.frames(img_a, img_b, args.frames))
+    )
+
+    for kind in TRANSITIONS:
+        renderer = TransitionRenderer(kind)
+        after = measure(lambda: renderer.frames(img_a, img_b, args.frames), args.repeat)
+        print(f"{kind:<36} {after:8.2f} ms/đoạn ({before / after:.2f}x)")
+
+    print(f"\nKiểu linear giống hệt cách cũ: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+So sánh khử nhiễu trực tiếp ở độ phân giải đầu ra với khử nhiễu ở độ phân giải nhỏ rồi phóng to
+
+Dùng pipeline diffusers nhỏ dựng offline. Ngoài thời gian, benchmark còn kiểm tra:
+- video ghi ra có đúng độ phân giải đầu ra kể cả khi các hình đầu vào khác kích thước
+- bộ phóng to learned chạy theo ô cho kết quả như chạy cả hình một lần
+
+Ví dụ: python -m benchmarks.bench_upscale --resolution 512x288 --output-resolution 1920x1080
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.tiny_pipeline import build_tiny_pipeline
+from prompt_cache import PromptEmbeddingCache
+from upscalers import LearnedUpscaler, fit_frame, get_upscaler
+from video_generator import VideoGenerator
+
+
+def run(generator, resolution, output_resolution, upscaler, frames, output_path):
+    start = time.perf_counter()
+    ok = generator.generate_video(
+        "benchmark", output_path=output_path, num_frames=frames, frame_duration=0.5, transition_duration=0.25,
+        resolution=resolution, seed=3, output_resolution=output_resolution, upscaler=upscaler
+    )
+    return ok, time.perf_counter() - start
+
+
+def video_size(path):
+    import cv2
+    capture = cv2.VideoCapture(path)
+    size = (int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    capture.release()
+    return size
+
+
+def check_tiled_learned(directory, scale=2):
+    """Mô hình TorchScript nhỏ (2 conv 3x3 + PixelShuffle): chạy theo ô phải khớp chạy cả hình"""
+    import torch
+
+    torch.manual_seed(0)
+    model = torch.nn.Sequential(
+        torch.nn.Conv2d(3, 16, 3, padding=1), torch.nn.ReLU(),
+        torch.nn.Conv2d(16, 3 * scale * scale, 3, padding=1), torch.nn.PixelShuffle(scale), torch.nn.Sigmoid()
+    ).eval()
+    path = os.path.join(directory, f"tiny_x{scale}.pt")
+    torch.jit.trace(model, torch.rand(1, 3, 32, 32)).save(path)
+
+    image = np.random.default_rng(0).integers(0, 256, (200, 300, 3), dtype=np.uint8)
+    size = (300 * scale, 200 * scale)
+    tiled = LearnedUpscaler(path, tile=64, overlap=8).upscale(image, size)
+    whole = LearnedUpscaler(path, tile=10000, overlap=0).upscale(image, size)
+    return tiled.shape[1::-1] == size and int(np.abs(tiled.astype(int) - whole).max()) <= 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sinh ở độ phân giải nhỏ rồi phóng to.")
+    parser.add_argument("--resolution", default="512x288", help="Độ phân giải khử nhiễu: chiều rộng x chiều cao.")
+    parser.add_argument("--output-resolution", default="1920x1080", help="Độ phân giải video đầu ra.")
+    parser.add_argument("--frames", type=int, default=2, help="Số khung hình.")
+    parser.add_argument("--steps", type=int, default=4, help="Số bước khử nhiễu.")
+    args = parser.parse_args()
+
+    resolution = tuple(map(int, args.resolution.split('x')))
+    output_resolution = tuple(map(int, args.output_resolution.split('x')))
+    pipeline = build_tiny_pipeline()
+    generator = VideoGenerator(device="cpu", pipeline=pipeline, prompt_cache=PromptEmbeddingCache(), steps=args.steps)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = []
+        # Chạy nóng một lần để thời gian không tính lần khởi tạo đầu tiên
+        run(generator, resolution, None, "lanczos", 1, os.path.join(tmp, "warmup.mp4"))
+        for name, res, out, upscaler in (
+            ("khử nhiễu trực tiếp", output_resolution, None, "lanczos"),
+            ("sinh nhỏ + lanczos", resolution, output_resolution, "lanczos"),
+            ("sinh nhỏ + edge", resolution, output_resolution, "edge"),
+        ):
+            path = os.path.join(tmp, f"{len(rows)}.mp4")
+            ok, elapsed = run(generator, res, out, upscaler, args.frames, path)
+            rows.append((name, res, ok, elapsed, video_size(path) if ok else None))
+
+        # Các hình khác kích thước: video phải có đúng frame_size, không phải kích thước hình đầu tiên
+        mixed = [np.zeros((288, 512, 3), np.uint8), np.zeros((512, 512, 3), np.uint8), np.zeros((600, 800, 3), np.uint8)]
+        mixed_path = os.path.join(tmp, "mixed.mp4")
+        generator._create_video_from_images(
+            mixed, mixed_path, duration_per_image=0.2, transition_duration=0.1, frame_size=output_resolution
+        )
+        mixed_ok = video_size(mixed_path) == output_resolution
+        tiled_ok = check_tiled_learned(tmp)
+
+    # Thời gian riêng của bước phóng to cho một khung hình
+    image = np.random.default_rng(1).integers(0, 256, (resolution[1], resolution[0], 3), dtype=np.uint8)
+    upscale_ms = {}
+    for name in ("lanczos", "edge"):
+        upscaler = get_upscaler(name)
+        start = time.perf_counter()
+        for _ in range(5):
+            fit_frame(image, output_resolution, upscaler)
+        upscale_ms[name] = (time.perf_counter() - start) / 5 * 1000
+
+    print(f"\n{'Cách sinh':22s} {'Khử nhiễu':>10s} {'Video':>10s} {'Thời gian':>10s}")
+    for name, res, ok, elapsed, size in rows:
+        size_text = f"{size[0]}x{size[1]}" if size else "lỗi"
+        print(f"{name:22s} {res[0]:>5d}x{res[1]:<4d} {size_text:>10s} {elapsed:9.2f}s")
+    print(f"Tăng tốc (lanczos):    {rows[0][3] / rows[1][3]:.2f}x")
+    print("Phóng to một khung hình: " + ", ".join(f"{n} {ms:.1f} ms" for n, ms in upscale_ms.items()))
+    print(f"Video từ hình khác kích thước đúng {output_resolution[0]}x{output_resolution[1]}: {mixed_ok}")
+    print(f"Phóng to learned theo ô khớp chạy cả hình: {tiled_ok}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+"""
+In kết quả kiểm tra của benchmark và đặt mã thoát
+
+Benchmark kết thúc bằng report_checks(checks) thoát với mã 1 khi có kiểm tra không đạt,
+để dùng được trong script / CI thay cho bộ test.
+"""
+import sys
+
+
+def report_checks(checks):
+    """In từng kiểm tra {tên: đạt hay không}; thoát với mã 1 nếu có kiểm tra không đạt"""
+    print()
+    for name, ok in checks.items():
+        print(f"{name}: {bool(ok)}")
+    failed = [name for name, ok in checks.items() if not ok]
+    if failed:
+        print(f"\nKhông đạt {len(failed)}/{len(checks)} kiểm tra: {', '.join(failed)}")
+        sys.exit(1)
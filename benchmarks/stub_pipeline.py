@@ -0,0 +1,134 @@
+"""
+Pipeline giả lập thay cho StableDiffusionPipeline, dùng để benchmark offline trên CPU
+"""
+import time
+import zlib
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+from PIL import Image
+
+
+def _sleep(seconds):
+    """Ngủ seconds giây, trả về thời gian thực đã ngủ (gồm cả phần trễ của hệ điều hành)"""
+    start = time.perf_counter()
+    time.sleep(seconds)
+    return time.perf_counter() - start
+
+
+class StubVAE:
+    """VAE giả lập: giải mã latent bằng cách phóng to 3 kênh đầu lên 8 lần"""
+    config = SimpleNamespace(scaling_factor=0.18215)
+
+    def __init__(self, decode_cost=0.0):
+        self.decode_cost = decode_cost
+        self.simulated_s = 0.0
+
+    def decode(self, latents, return_dict=True, **kwargs):
+        self.simulated_s += _sleep(self.decode_cost * latents.shape[0])
+        image = torch.tanh(latents[:, :3] * self.config.scaling_factor)
+        image = image.repeat_interleave(8, dim=2).repeat_interleave(8, dim=3)
+        return SimpleNamespace(sample=image) if return_dict else (image,)
+
+
+class StubImageProcessor:
+    """Chuyển tensor ảnh trong khoảng [-1, 1] thành danh sách ảnh PIL"""
+    def postprocess(self, image, output_type="pil", **kwargs):
+        arrays = ((image.clamp(-1, 1) + 1) * 127.5).round().to(torch.uint8).permute(0, 2, 3, 1).numpy()
+        return [Image.fromarray(array) for array in arrays]
+
+
+class StubPipeline:
+    """
+    Pipeline giả lập có chi phí cố định cho mỗi bước khử nhiễu
+
+    step_cost: Thời gian (giây) cho mỗi bước khử nhiễu, không phụ thuộc kích thước lô
+    image_cost: Thời gian (giây) cộng thêm cho mỗi hình trong lô ở mỗi bước
+    num_inference_steps: Số bước khử nhiễu mặc định
+    decode_cost: Thời gian (giây) giải mã VAE cho mỗi hình
+    encode_cost: Thời gian (giây) chạy text encoder cho mỗi prompt
+    pixel_cost: Thời gian (giây) cộng thêm mỗi bước cho mỗi hình 512x512, tỉ lệ theo số điểm ảnh
+                (như UNet thật: hình nhỏ khử nhiễu nhanh hơn)
+
+    Hình sinh ra chỉ phụ thuộc vào prompt và torch.Generator của từng hình,
+    nên có thể so sánh kết quả giữa chế độ tuần tự và chế độ theo lô. Khi có
+    tham số image, pipeline hoạt động như img2img và đóng vai trò cả pipeline img2img.
+    """
+    def __init__(self, step_cost=0.002, image_cost=0.0005, num_inference_steps=50, decode_cost=0.0,
+                 encode_cost=0.0, pixel_cost=0.0):
+        self.step_cost = step_cost
+        self.image_cost = image_cost
+        self.num_inference_steps = num_inference_steps
+        self.vae = StubVAE(decode_cost)
+        self.image_processor = StubImageProcessor()
+        self.safety_checker = None
+        self.encode_cost = encode_cost
+        self.pixel_cost = pixel_cost
+        self.calls = 0
+        self.encode_calls = 0
+        self._simulated_s = 0.0
+
+    @property
+    def simulated_s(self):
+        """Tổng thời gian chi phí giả lập đã chạy (giây), để tách phần chi phí điều phối thật"""
+        return self._simulated_s + self.vae.simulated_s
+
+    def to(self, device):
+        return self
+
+    def encode_prompt(self, prompt, device, num_images_per_prompt=1, do_classifier_free_guidance=True,
+                      negative_prompt=None, **kwargs):
+        # Embedding giả lập: hằng số suy ra từ prompt, embedding không điều kiện bằng 0
+        prompts = [prompt] if isinstance(prompt, str) else list(prompt)
+        self.encode_calls += len(prompts)
+        self._simulated_s += _sleep(self.encode_cost * len(prompts))
+        values = torch.tensor([zlib.crc32(p.encode("utf-8")) % 256 for p in prompts], dtype=torch.float32)
+        prompt_embeds = values.repeat_interleave(num_images_per_prompt)[:, None, None].expand(-1, 77, 8).clone()
+        return prompt_embeds, torch.zeros_like(prompt_embeds)
+
+    def _make_latents(self, prompt_value, generator, height, width):
+        # Latent ở độ phân giải 1/8, lệch theo prompt để mỗi prompt cho hình khác nhau
+        latents = torch.randn((1, 4, height // 8, width // 8), generator=generator)
+        return latents + prompt_value / 64.0 - 2.0
+
+    def _encode_image(self, image):
+        # Nghịch đảo của StubVAE.decode: thu nhỏ 8 lần rồi lấy atanh, kênh thứ 4 bằng 0
+        array = torch.from_numpy(np.asarray(image, dtype=np.float32) / 127.5 - 1.0).permute(2, 0, 1)[None]
+        rgb = torch.atanh(torch.nn.functional.avg_pool2d(array, 8).clamp(-0.999, 0.999))
+        return torch.cat([rgb, torch.zeros_like(rgb[:, :1])], dim=1)
+
+    def __call__(self, prompt=None, height=512, width=512, num_inference_steps=None,
+                 generator=None, num_images_per_prompt=1, output_type="pil",
+                 image=None, strength=0.8, prompt_embeds=None, latents=None, **kwargs):
+        if prompt_embeds is None:
+            prompt_embeds, _ = self.encode_prompt(prompt, None, num_images_per_prompt)
+        prompts = [float(value) for value in prompt_embeds[:, 0, 0]]
+        if not isinstance(generator, list):
+            generator = [generator] * len(prompts)
+        steps = num_inference_steps or self.num_inference_steps
+        if image is not None:
+            # img2img: chỉ chạy strength × số bước, kích thước lấy theo hình đầu vào
+            steps = max(1, int(steps * strength))
+            width, height = image.size
+
+        self.calls += 1
+        self.num_timesteps = steps
+        callback = kwargs.get("callback_on_step_end")
+        image_cost = self.image_cost + self.pixel_cost * width * height / (512 * 512)
+        for step in range(steps):
+            self._simulated_s += _sleep(self.step_cost + image_cost * len(prompts))
+            if callback is not None:
+                callback(self, step, None, {})
+
+        if latents is None:
+            latents = torch.cat([self._make_latents(p, g, height, width) for p, g in zip(prompts, generator)])
+        else:
+            # Nhiễu khởi tạo được truyền vào (như tham số latents của diffusers)
+            latents = torch.cat([noise[None] + p / 64.0 - 2.0 for p, noise in zip(prompts, latents.float())])
+        if image is not None:
+            latents = (1 - strength) * self._encode_image(image) + strength * latents
+        if output_type == "latent":
+            return SimpleNamespace(images=latents)
+        image = self.vae.decode(latents / self.vae.config.scaling_factor, return_dict=False)[0]
+        return SimpleNamespace(images=self.image_processor.postprocess(image, output_type=output_type))
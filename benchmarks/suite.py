@@ -0,0 +1,273 @@
+"""
+Bộ benchmark chạy offline cho các đường chạy nóng, xuất JSON và so sánh với kết quả mốc
+
+Gồm ba nhóm, mỗi nhóm chạy trên một ma trận tham số:
+- generate: VideoGenerator._generate_images_from_text với pipeline giả lập (độ phân giải, số khung hình,
+  kích thước lô). Giá trị so sánh là chi phí điều phối: thời gian thực trừ chi phí giả lập của pipeline
+- encode: VideoGenerator._create_video_from_images (độ phân giải, số khung hình, fps, thời gian chuyển cảnh)
+- text_video: app_simple.create_text_video (độ phân giải, fps, hiệu ứng)
+
+Ví dụ:
+    python -m benchmarks --output baseline.json
+    python -m benchmarks --baseline baseline.json --tolerance 0.15   # mã thoát 1 nếu chậm đi
+
+Mốc nên được tạo trên cùng máy; trên máy dùng chung nên tăng --repeat hoặc --tolerance.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+GROUPS = ("generate", "encode", "text_video")
+
+# Ma trận tham số của từng nhóm: (đầy đủ, rút gọn cho --quick)
+GENERATE_MATRIX = {
+    "full": {"resolution": ["256x256", "512x512", "768x768"], "frames": [4, 12], "batch_size": [1, 4]},
+    "quick": {"resolution": ["256x256", "512x512"], "frames": [4], "batch_size": [1, 4]},
+}
+ENCODE_MATRIX = {
+    "full": {"resolution": ["512x512", "1280x720", "1920x1080"], "frames": [4, 8], "fps": [24, 30],
+             "transition": [0.5, 1.0]},
+    "quick": {"resolution": ["512x512", "1280x720"], "frames": [4], "fps": [24], "transition": [0.5, 1.0]},
+}
+TEXT_VIDEO_MATRIX = {
+    "full": {"resolution": ["640x360", "1280x720", "1920x1080"], "fps": [24, 30], "animation": ["none", "fade"]},
+    "quick": {"resolution": ["640x360", "1280x720"], "fps": [24], "animation": ["none", "fade"]},
+}
+
+
+def _size(text):
+    return tuple(map(int, text.split('x')))
+
+
+def _matrix(matrix):
+    """Mọi tổ hợp tham số của ma trận dạng {tên: [giá trị...]}"""
+    names = list(matrix)
+    for values in itertools.product(*(matrix[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def _case_name(group, params):
+    return group + "/" + ",".join(f"{name}={value}" for name, value in params.items())
+
+
+def _measure(fn, repeat):
+    """Chạy fn repeat lần (tắt log in ra), trả về danh sách giá trị fn trả về"""
+    values = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            values.append(fn())
+    return values
+
+
+def _summary(group, params, wall, value=None, **extra):
+    value = wall if value is None else value
+    return {
+        "name": _case_name(group, params),
+        "group": group,
+        "params": params,
+        "wall_min_s": min(wall),
+        "wall_median_s": statistics.median(wall),
+        # Giá trị dùng khi so sánh với mốc (nhỏ nhất qua các lần chạy để ít nhiễu)
+        "value_s": min(value),
+        "runs_s": wall,
+        **extra,
+    }
+
+
+def bench_generate(matrix, repeat, steps, step_cost):
+    """Thời gian điều phối của _generate_images_from_text với pipeline giả lập"""
+    from benchmarks.stub_pipeline import StubPipeline
+    from prompt_cache import PromptEmbeddingCache
+    from video_generator import VideoGenerator
+
+    results = []
+    for params in _matrix(matrix):
+        pipeline = StubPipeline(step_cost, 0.0, steps)
+        with contextlib.redirect_stdout(io.StringIO()):
+            generator = VideoGenerator(device="cpu", pipeline=pipeline, prompt_cache=PromptEmbeddingCache())
+
+        def run():
+            simulated = pipeline.simulated_s
+            start = time.perf_counter()
+            generator._generate_images_from_text(
+                "benchmark", num_frames=params["frames"], resolution=_size(params["resolution"]), seed=1,
+                batch_size=params["batch_size"]
+            )
+            wall = time.perf_counter() - start
+            return wall, wall - (pipeline.simulated_s - simulated)
+
+        runs = _measure(run, repeat)
+        results.append(_summary(
+            "generate", params, [wall for wall, _ in runs], [overhead for _, overhead in runs],
+            metric="overhead_s", simulated_s=runs[0][0] - runs[0][1]
+        ))
+    return results
+
+
+def bench_encode(matrix, repeat, tmp):
+    """Thời gian _create_video_from_images với các hình ngẫu nhiên cố định"""
+    from benchmarks.stub_pipeline import StubPipeline
+    from video_generator import VideoGenerator
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        generator = VideoGenerator(device="cpu", pipeline=StubPipeline())
+    rng = np.random.default_rng(0)
+    results = []
+    for params in _matrix(matrix):
+        width, height = _size(params["resolution"])
+        images = [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(params["frames"])]
+        path = os.path.join(tmp, "encode.mp4")
+
+        def run():
+            start = time.perf_counter()
+            generator._create_video_from_images(
+                images, path, duration_per_image=2.0, transition_duration=params["transition"], fps=params["fps"]
+            )
+            return time.perf_counter() - start
+
+        wall = _measure(run, repeat)
+        results.append(_summary("encode", params, wall, metric="wall_s"))
+    return results
+
+
+def bench_text_video(matrix, repeat, tmp, duration):
+    """Thời gian app_simple.create_text_video (ghi CFR để kết quả không phụ thuộc việc có ffmpeg)"""
+    from app_simple import create_text_video
+
+    results = []
+    for params in _matrix(matrix):
+        path = os.path.join(tmp, "text.mp4")
+
+        def run():
+            start = time.perf_counter()
+            create_text_video("Xin chào từ Video Generator!", path, duration, params["fps"],
+                              _size(params["resolution"]), animation=params["animation"], vfr=False)
+            return time.perf_counter() - start
+
+        wall = _measure(run, repeat)
+        results.append(_summary("text_video", dict(params, duration=duration), wall, metric="wall_s"))
+    return results
+
+
+def run_suite(groups=GROUPS, quick=False, repeat=3, steps=10, step_cost=0.002, text_duration=3):
+    """Chạy các nhóm benchmark, trả về báo cáo dạng dict"""
+    size = "quick" if quick else "full"
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        if "generate" in groups:
+            results += bench_generate(GENERATE_MATRIX[size], repeat, steps, step_cost)
+        if "encode" in groups:
+            results += bench_encode(ENCODE_MATRIX[size], repeat, tmp)
+        if "text_video" in groups:
+            results += bench_text_video(TEXT_VIDEO_MATRIX[size], repeat, tmp, text_duration)
+
+    import cv2
+    import torch
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "torch": torch.__version__,
+            "opencv": cv2.__version__,
+            "quick": quick,
+            "repeat": repeat,
+            "steps": steps,
+            "step_cost": step_cost,
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance=0.15, min_delta=0.005):
+    """
+    So sánh báo cáo với mốc theo value_s của từng trường hợp cùng tên
+
+    Một trường hợp bị coi là chậm đi khi chậm hơn mốc quá tolerance (tỉ lệ) và quá
+    min_delta giây (bỏ qua dao động của các trường hợp rất nhanh).
+    Trả về danh sách (tên, mốc, hiện tại, tỉ lệ, chậm đi hay không).
+    """
+    previous = {result["name"]: result for result in baseline.get("results", [])}
+    rows = []
+    for result in report["results"]:
+        base = previous.get(result["name"])
+        if base is None:
+            continue
+        old, new = base["value_s"], result["value_s"]
+        ratio = new / old if old > 0 else float("inf")
+        regressed = new - old > min_delta and ratio > 1 + tolerance
+        rows.append((result["name"], old, new, ratio, regressed))
+    return rows
+
+
+def print_report(report):
+    print(f"\n{'Trường hợp':<72} {'Giá trị':>10} {'Nhỏ nhất':>10} {'Trung vị':>10}")
+    for result in report["results"]:
+        print(f"{result['name']:<72} {result['value_s']:>9.4f}s {result['wall_min_s']:>9.4f}s "
+              f"{result['wall_median_s']:>9.4f}s")
+
+
+def print_comparison(rows, tolerance):
+    print(f"\n{'Trường hợp':<72} {'Mốc':>9} {'Hiện tại':>9} {'Tỉ lệ':>7}")
+    for name, old, new, ratio, regressed in rows:
+        flag = "  CHẬM ĐI" if regressed else ""
+        print(f"{name:<72} {old:>8.4f}s {new:>8.4f}s {ratio:>6.2f}x{flag}")
+    regressions = sum(regressed for *_, regressed in rows)
+    print(f"\n{len(rows)} trường hợp được so sánh, {regressions} trường hợp chậm đi quá {tolerance:.0%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Chạy bộ benchmark offline, xuất JSON, so sánh với mốc.")
+    parser.add_argument("--only", help=f"Chỉ chạy các nhóm này, phân cách bằng dấu phẩy ({', '.join(GROUPS)}).")
+    parser.add_argument("--quick", action="store_true", help="Ma trận tham số rút gọn.")
+    parser.add_argument("--repeat", type=int, default=3, help="Số lần chạy mỗi trường hợp (mặc định: 3).")
+    parser.add_argument("--steps", type=int, default=10, help="Số bước khử nhiễu của pipeline giả lập.")
+    parser.add_argument("--step-cost", type=float, default=0.002, help="Chi phí mỗi bước giả lập (giây).")
+    parser.add_argument("--text-duration", type=float, default=3, help="Thời lượng video văn bản (giây).")
+    parser.add_argument("--output", help="Ghi kết quả ra file JSON.")
+    parser.add_argument("--baseline", help="File JSON mốc để so sánh; mã thoát 1 nếu có trường hợp chậm đi.")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Mức chậm đi cho phép so với mốc (tỉ lệ, mặc định: 0.15).")
+    parser.add_argument("--min-delta", type=float, default=0.005,
+                        help="Chênh lệch tối thiểu (giây) mới coi là chậm đi (mặc định: 0.005).")
+    args = parser.parse_args(argv)
+
+    groups = GROUPS
+    if args.only:
+        groups = tuple(group.strip() for group in args.only.split(","))
+        unknown = set(groups) - set(GROUPS)
+        if unknown:
+            parser.error(f"Nhóm không hợp lệ: {', '.join(sorted(unknown))}")
+
+    report = run_suite(groups, args.quick, max(1, args.repeat), args.steps, args.step_cost, args.text_duration)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nĐã ghi kết quả vào '{args.output}'")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.tolerance, args.min_delta)
+        print_comparison(rows, args.tolerance)
+        if any(regressed for *_, regressed in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
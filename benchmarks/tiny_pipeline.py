@@ -0,0 +1,115 @@
+"""
+StableDiffusionPipeline thật với trọng số ngẫu nhiên rất nhỏ, dựng hoàn toàn offline
+
+Dùng để benchmark các đường chạy thật của diffusers (scheduler, UNet, VAE,
+text encoder) trên CPU mà không cần tải mô hình. Hình sinh ra không có ý
+nghĩa, chỉ có thời gian chạy là đáng quan tâm.
+"""
+import json
+import os
+import shutil
+import tempfile
+
+import torch
+
+
+def _byte_symbols():
+    """256 ký tự đại diện cho từng byte, theo cách ánh xạ của BPE mức byte (GPT-2 / CLIP)"""
+    printable = list(range(ord("!"), ord("~") + 1)) + list(range(ord("¡"), ord("¬") + 1)) + list(range(ord("®"), ord("ÿ") + 1))
+    symbols, extra = [], 0
+    for byte in range(256):
+        if byte in printable:
+            symbols.append(chr(byte))
+        else:
+            symbols.append(chr(256 + extra))
+            extra += 1
+    return symbols
+
+
+def _build_tokenizer():
+    """CLIPTokenizer với bộ từ vựng mức ký tự (không có phép ghép BPE), ghi ra thư mục tạm"""
+    from transformers import CLIPTokenizer
+
+    symbols = _byte_symbols()
+    vocab = {}
+    for symbol in symbols + [s + "</w>" for s in symbols] + ["<|startoftext|>", "<|endoftext|>"]:
+        vocab.setdefault(symbol, len(vocab))
+    directory = tempfile.mkdtemp(prefix="tiny_clip_")
+    with open(os.path.join(directory, "vocab.json"), "w", encoding="utf-8") as f:
+        json.dump(vocab, f)
+    with open(os.path.join(directory, "merges.txt"), "w", encoding="utf-8") as f:
+        f.write("#version: 0.2\n")
+    try:
+        return CLIPTokenizer(
+            os.path.join(directory, "vocab.json"), os.path.join(directory, "merges.txt"), model_max_length=77
+        )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def build_tiny_pipeline(seed=0, block_channels=(32, 64), cross_attention_dim=32):
+    """
+    Dựng StableDiffusionPipeline nhỏ (UNet 2 khối, CLIP 2 lớp) trên CPU
+
+    VAE có 4 khối để giữ tỉ lệ latent 1/8 như Stable Diffusion thật.
+
+    Cùng seed luôn cho cùng trọng số, để kết quả các lần benchmark so sánh được.
+    """
+    from diffusers import AutoencoderKL, DDIMScheduler, StableDiffusionPipeline, UNet2DConditionModel
+    from transformers import CLIPTextConfig, CLIPTextModel
+
+    torch.manual_seed(seed)
+    tokenizer = _build_tokenizer()
+    unet = UNet2DConditionModel(
+        block_out_channels=block_channels,
+        layers_per_block=1,
+        sample_size=32,
+        in_channels=4,
+        out_channels=4,
+        down_block_types=("DownBlock2D", "CrossAttnDownBlock2D"),
+        up_block_types=("CrossAttnUpBlock2D", "UpBlock2D"),
+        cross_attention_dim=cross_attention_dim,
+        attention_head_dim=8,
+        norm_num_groups=8,
+    )
+    vae_channels = (block_channels[0],) * 2 + (block_channels[-1],) * 2
+    vae = AutoencoderKL(
+        block_out_channels=vae_channels,
+        in_channels=3,
+        out_channels=3,
+        down_block_types=("DownEncoderBlock2D",) * len(vae_channels),
+        up_block_types=("UpDecoderBlock2D",) * len(vae_channels),
+        latent_channels=4,
+        norm_num_groups=8,
+        sample_size=256,
+    )
+    text_encoder = CLIPTextModel(CLIPTextConfig(
+        bos_token_id=tokenizer.bos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+        pad_token_id=tokenizer.pad_token_id,
+        hidden_size=cross_attention_dim,
+        intermediate_size=64,
+        num_attention_heads=4,
+        num_hidden_layers=2,
+        vocab_size=len(tokenizer),
+    ))
+    scheduler = DDIMScheduler(
+        beta_start=0.00085,
+        beta_end=0.012,
+        beta_schedule="scaled_linear",
+        clip_sample=False,
+        set_alpha_to_one=False,
+        steps_offset=1,
+    )
+    pipeline = StableDiffusionPipeline(
+        vae=vae,
+        text_encoder=text_encoder,
+        tokenizer=tokenizer,
+        unet=unet,
+        scheduler=scheduler,
+        safety_checker=None,
+        feature_extractor=None,
+        requires_safety_checker=False,
+    )
+    pipeline.set_progress_bar_config(disable=True)
+    return pipeline.to("cpu")
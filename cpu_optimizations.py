@@ -0,0 +1,132 @@
+"""
+Cấu hình tối ưu suy luận trên CPU cho pipeline Stable Diffusion
+
+Gồm số luồng của torch, định dạng bộ nhớ channels_last cho UNet/VAE, autocast
+bfloat16 (trên CPU có hỗ trợ), torch.compile cho UNet và cách tính attention.
+Mỗi tùy chọn có thể bật / tắt riêng để đo ảnh hưởng.
+"""
+import contextlib
+import weakref
+
+ATTENTION_MODES = ("sdpa", "slicing", "math")
+
+# UNet gốc -> UNet đã compile, để các job trong cùng tiến trình dùng lại kết quả compile
+_compiled_unets = weakref.WeakKeyDictionary()
+
+
+def bf16_supported():
+    """CPU có hỗ trợ tính toán bfloat16 qua oneDNN hay không (AVX512-BF16 / AMX)"""
+    import torch
+
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+class CPUOptimizations:
+    """
+    Cấu hình tối ưu cho suy luận trên CPU
+
+    threads: Số luồng intra-op của torch (None = giữ mặc định)
+    interop_threads: Số luồng inter-op; chỉ đặt được trước khi torch chạy song song lần đầu
+    channels_last: Chuyển UNet và VAE sang định dạng bộ nhớ channels_last
+    bf16: Chạy pipeline trong autocast bfloat16 nếu CPU hỗ trợ
+    compile: torch.compile UNet; kết quả compile được dùng lại giữa các job trong tiến trình
+    attention: 'sdpa' (scaled_dot_product_attention), 'slicing' (chia nhỏ attention,
+               ít bộ nhớ hơn) hoặc 'math' (cài đặt attention cổ điển)
+    """
+    def __init__(self, threads=None, interop_threads=None, channels_last=False, bf16=False, compile=False,
+                 attention="sdpa"):
+        if attention not in ATTENTION_MODES:
+            raise ValueError(f"Kiểu attention không hợp lệ: {attention} (chọn một trong {', '.join(ATTENTION_MODES)})")
+        self.threads = threads
+        self.interop_threads = interop_threads
+        self.channels_last = channels_last
+        self.bf16 = bf16
+        self.compile = compile
+        self.attention = attention
+
+    def describe(self):
+        """Mô tả ngắn các tùy chọn đang bật, để in ra log"""
+        parts = [f"attention={self.attention}"]
+        if self.threads:
+            parts.append(f"threads={self.threads}")
+        if self.interop_threads:
+            parts.append(f"interop_threads={self.interop_threads}")
+        for name in ("channels_last", "bf16", "compile"):
+            if getattr(self, name):
+                parts.append(name)
+        return ", ".join(parts)
+
+    def apply(self, pipeline):
+        """Áp dụng cấu hình lên pipeline đã tải (gọi lại nhiều lần không có tác dụng phụ)"""
+        import torch
+
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        if self.interop_threads and torch.get_num_interop_threads() != self.interop_threads:
+            try:
+                torch.set_num_interop_threads(self.interop_threads)
+            except RuntimeError as e:
+                print(f"Không đặt được số luồng inter-op: {e}")
+        if self.bf16 and not bf16_supported():
+            print("CPU không hỗ trợ bfloat16, bỏ qua autocast bf16")
+            self.bf16 = False
+
+        # Luôn làm việc trên UNet gốc, kể cả khi pipeline đang giữ bản đã compile
+        unet = getattr(pipeline.unet, "_orig_mod", pipeline.unet)
+        if self.attention == "slicing":
+            pipeline.enable_attention_slicing()
+        else:
+            from diffusers.models.attention_processor import AttnProcessor, AttnProcessor2_0
+
+            unet.set_attn_processor(AttnProcessor2_0() if self.attention == "sdpa" else AttnProcessor())
+
+        if self.channels_last:
+            unet.to(memory_format=torch.channels_last)
+            pipeline.vae.to(memory_format=torch.channels_last)
+
+        if self.compile:
+            if unet not in _compiled_unets:
+                print("Đang compile UNet (chỉ chạy ở lần sinh hình đầu tiên cho mỗi độ phân giải)...")
+                _compiled_unets[unet] = torch.compile(unet)
+            pipeline.unet = _compiled_unets[unet]
+        elif pipeline.unet is not unet:
+            pipeline.unet = unet
+
+    def autocast(self, device):
+        """Ngữ cảnh autocast cho một lần gọi pipeline"""
+        import torch
+
+        if device == "cuda":
+            return torch.autocast("cuda")
+        if self.bf16:
+            return torch.autocast("cpu", dtype=torch.bfloat16)
+        return contextlib.nullcontext()
+
+
+def add_cpu_arguments(parser):
+    """Thêm các tham số tối ưu CPU vào argparse parser"""
+    parser.add_argument("--cpu-threads", type=int, help="Số luồng torch dùng cho suy luận trên CPU.")
+    parser.add_argument("--cpu-interop-threads", type=int,
+                        help="Số luồng inter-op của torch (chạy song song các phép tính độc lập).")
+    parser.add_argument("--channels-last", action="store_true", help="Dùng định dạng bộ nhớ channels_last cho UNet/VAE.")
+    parser.add_argument("--bf16", action="store_true", help="Chạy trong autocast bfloat16 nếu CPU hỗ trợ.")
+    parser.add_argument("--compile", action="store_true", help="torch.compile UNet (lần đầu chậm, các job sau nhanh hơn).")
+    parser.add_argument("--attention", choices=ATTENTION_MODES, default="sdpa",
+                        help="Cách tính attention: sdpa, slicing (ít bộ nhớ) hoặc math (mặc định: sdpa).")
+
+
+def cpu_optimizations_from_args(args):
+    """Tạo CPUOptimizations từ tham số dòng lệnh đã thêm bởi add_cpu_arguments (None nếu không bật gì)"""
+    if not (args.cpu_threads or args.cpu_interop_threads or args.channels_last or args.bf16 or args.compile or args.attention != "sdpa"):
+        return None
+    return CPUOptimizations(
+        threads=args.cpu_threads,
+        interop_threads=args.cpu_interop_threads,
+        channels_last=args.channels_last,
+        bf16=args.bf16,
+        compile=args.compile,
+        attention=args.attention
+    )
@@ -1,25 +1,37 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, scrolledtext
+import queue
 import threading
 import os
 import sys
 from pathlib import Path
 
+from model_registry import missing_ai_libraries
+from schedulers import PRESETS, SCHEDULERS
+
 # Kiểm tra xem file video_generator.py có tồn tại không
 video_generator_path = os.path.join(os.getcwd(), "video_generator.py")
 GENERATOR_FILE_EXISTS = os.path.exists(video_generator_path)
 
-# Kiểm tra thư viện AI cần thiết
-AI_LIBRARIES_IMPORTED = False
-if GENERATOR_FILE_EXISTS:
-    try:
-        # Thử import các thư viện cần thiết cho AI
-        import torch
-        import diffusers
-        from video_generator import VideoGenerator
-        AI_LIBRARIES_IMPORTED = True
-    except ImportError as e:
-        print(f"Cảnh báo: Không thể import thư viện AI: {e}")
+# Kiểm tra thư viện AI cần thiết mà không import chúng (import torch/diffusers mất vài giây,
+# được làm ở luồng nền sau khi cửa sổ đã hiện)
+MISSING_AI_LIBRARIES = missing_ai_libraries() if GENERATOR_FILE_EXISTS else []
+AI_LIBRARIES_AVAILABLE = GENERATOR_FILE_EXISTS and not MISSING_AI_LIBRARIES
+if MISSING_AI_LIBRARIES:
+    print(f"Cảnh báo: Thiếu thư viện AI: {', '.join(MISSING_AI_LIBRARIES)}")
+
+# Chu kỳ lấy sự kiện từ luồng nền (ms) và chiều cao hình thu nhỏ (pixel)
+POLL_INTERVAL_MS = 50
+THUMBNAIL_HEIGHT = 72
+
+
+def thumbnail_ppm(image, height=THUMBNAIL_HEIGHT):
+    """Thu nhỏ hình BGR và trả về dữ liệu PPM cho tk.PhotoImage (chạy được ở luồng nền, không cần Tk)"""
+    import cv2
+    width = max(1, round(image.shape[1] * height / image.shape[0]))
+    rgb = cv2.cvtColor(cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2RGB)
+    return b"P6 %d %d 255\n" % (width, height) + rgb.tobytes()
+
 
 class VideoGeneratorGUI:
     """Giao diện đồ họa cho Video AI Generator"""
@@ -28,7 +40,7 @@ class VideoGeneratorGUI:
         """Khởi tạo giao diện"""
         self.root = root
         self.root.title("Video AI Generator")
-        self.root.geometry("700x600")
+        self.root.geometry("700x720")
         self.root.resizable(True, True)
         
         # Đặt style cho giao diện
@@ -40,10 +52,24 @@ class VideoGeneratorGUI:
         # Biến để lưu trạng thái
         self.output_file = tk.StringVar(value=os.path.join(os.getcwd(), "output.mp4"))
         
+        # Các luồng nền không gọi Tk trực tiếp mà gửi sự kiện qua hàng đợi này;
+        # luồng giao diện lấy ra định kỳ bằng root.after
+        self._events = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._thumbnails = []
+        
+        # Phiên mô hình: giữ VideoGenerator giữa các lần tạo video, chỉ tải lại khi đổi mô hình/thiết bị
+        self._generator = None
+        self._generator_key = None
+        
         # Tạo các thành phần giao diện
         self._create_widgets()
         self._update_options()
         
+        self.root.after(POLL_INTERVAL_MS, self._poll_events)
+        # Tải trước mô hình sau khi cửa sổ đã được vẽ lần đầu
+        self.root.after_idle(self._start_preload)
+        
     def _create_widgets(self):
         """Tạo các thành phần giao diện"""
         # Tiêu đề
@@ -85,7 +111,7 @@ class VideoGeneratorGUI:
                 text="Lỗi: Không tìm thấy file video_generator.py",
                 foreground="red"
             ).pack(anchor=tk.W, pady=5)
-        elif not AI_LIBRARIES_IMPORTED:
+        elif not AI_LIBRARIES_AVAILABLE:
             ttk.Label(
                 mode_frame,
                 text="Cảnh báo: Thiếu thư viện AI cần thiết. Vui lòng cài đặt với 'pip install -r requirements.txt'",
@@ -112,6 +138,21 @@ class VideoGeneratorGUI:
         log_frame = ttk.LabelFrame(self.root, text="Trạng thái", padding="10")
         log_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
+        # Thanh tiến độ theo khung hình
+        progress_frame = ttk.Frame(log_frame)
+        progress_frame.pack(fill=tk.X)
+        self.progress = ttk.Progressbar(progress_frame, mode="determinate", maximum=1)
+        self.progress.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.progress_label = ttk.Label(progress_frame, text="", width=12, anchor=tk.E)
+        self.progress_label.pack(side=tk.LEFT, padx=(5, 0))
+        
+        # Hình thu nhỏ của các khung hình đã sinh xong
+        self.thumbnail_canvas = tk.Canvas(log_frame, height=THUMBNAIL_HEIGHT + 4, highlightthickness=0)
+        thumbnail_scroll = ttk.Scrollbar(log_frame, orient=tk.HORIZONTAL, command=self.thumbnail_canvas.xview)
+        self.thumbnail_canvas.configure(xscrollcommand=thumbnail_scroll.set)
+        self.thumbnail_canvas.pack(fill=tk.X, pady=(5, 0))
+        thumbnail_scroll.pack(fill=tk.X)
+        
         self.log_text = scrolledtext.ScrolledText(
             log_frame, 
             height=6, 
@@ -135,6 +176,15 @@ class VideoGeneratorGUI:
             command=self.root.destroy
         ).pack(side=tk.LEFT, padx=10)
         
+        # Nút hủy bên phải, chỉ bật khi đang tạo video
+        self.cancel_button = ttk.Button(
+            button_frame,
+            text="Hủy",
+            command=self._cancel_generation,
+            state="disabled"
+        )
+        self.cancel_button.pack(side=tk.RIGHT, padx=10)
+        
         # Nút tạo video nổi bật ở giữa
         self.create_button = ttk.Button(
             button_frame, 
@@ -167,7 +217,8 @@ class VideoGeneratorGUI:
         self.transition_entry.grid(row=2, column=1, sticky=tk.W, padx=5, pady=2)
         
         ttk.Label(self.options_frame, text="Thiết bị xử lý:").grid(row=3, column=0, sticky=tk.W)
-        self.device_var = tk.StringVar(value="cuda" if torch.cuda.is_available() else "cpu")
+        # Mặc định CPU; chuyển sang CUDA khi luồng tải trước phát hiện có GPU
+        self.device_var = tk.StringVar(value="cpu")
         device_frame = ttk.Frame(self.options_frame)
         device_frame.grid(row=3, column=1, sticky=tk.W, padx=5, pady=2)
         
@@ -187,7 +238,143 @@ class VideoGeneratorGUI:
         self.height_entry = ttk.Spinbox(resolution_frame, from_=240, to=1024, width=5)
         self.height_entry.set(512)
         self.height_entry.pack(side=tk.LEFT)
+        
+        ttk.Label(self.options_frame, text="Chất lượng / tốc độ:").grid(row=5, column=0, sticky=tk.W)
+        self.preset_var = tk.StringVar(value="mặc định")
+        ttk.Combobox(
+            self.options_frame,
+            textvariable=self.preset_var,
+            values=["mặc định"] + list(PRESETS),
+            state="readonly",
+            width=12
+        ).grid(row=5, column=1, sticky=tk.W, padx=5, pady=2)
+        
+        ttk.Label(self.options_frame, text="Scheduler:").grid(row=6, column=0, sticky=tk.W)
+        sampling_frame = ttk.Frame(self.options_frame)
+        sampling_frame.grid(row=6, column=1, sticky=tk.W, padx=5, pady=2)
+        
+        self.scheduler_var = tk.StringVar(value="default")
+        ttk.Combobox(
+            sampling_frame,
+            textvariable=self.scheduler_var,
+            values=list(SCHEDULERS),
+            state="readonly",
+            width=12
+        ).pack(side=tk.LEFT)
+        
+        # Số bước 0 = theo preset hoặc mặc định của mô hình
+        ttk.Label(sampling_frame, text="Số bước:").pack(side=tk.LEFT, padx=(10, 0))
+        self.steps_entry = ttk.Spinbox(sampling_frame, from_=0, to=150, width=5)
+        self.steps_entry.set(0)
+        self.steps_entry.pack(side=tk.LEFT)
+        
+        # Bản nháp (tắt mặc định vì tốn thêm một lượt sinh): xem nhanh bố cục trước khi sinh bản đầy đủ
+        self.draft_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.options_frame,
+            text="Xem trước bản nháp (độ phân giải 1/2, ít bước, cùng bố cục)",
+            variable=self.draft_var
+        ).grid(row=7, column=0, columnspan=2, sticky=tk.W, pady=2)
             
+    def _start_preload(self):
+        """Phát hiện thiết bị và tải trước mô hình ở luồng nền trong lúc người dùng nhập mô tả"""
+        if not AI_LIBRARIES_AVAILABLE:
+            return
+        
+        def preload():
+            try:
+                from video_generator import default_device, preload_model
+                device = default_device()
+                preload_model(device=device)
+                self._events.put(("device", device))
+            except Exception as e:
+                self._log(f"Không tải trước được mô hình: {e}")
+        
+        threading.Thread(target=preload, name="preload-gui", daemon=True).start()
+        
+    def _poll_events(self):
+        """Xử lý các sự kiện từ luồng nền ở luồng giao diện (Tk không an toàn đa luồng)"""
+        try:
+            while True:
+                kind, value = self._events.get_nowait()
+                if kind == "log":
+                    self._append_log(value)
+                elif kind == "progress":
+                    frames_done, num_frames = value
+                    self.progress.configure(maximum=max(num_frames, 1), value=frames_done)
+                    self.progress_label.config(text=f"{int(frames_done)}/{num_frames} hình")
+                elif kind == "thumbnail":
+                    self._set_thumbnail(*value)
+                elif kind == "draft":
+                    # Hình thu nhỏ của bản nháp được thay dần bằng hình của bản đầy đủ
+                    self._append_log(f"Bản nháp đã sẵn sàng: {value}")
+                    self._append_log("Đang sinh bản đầy đủ...")
+                    self.progress.configure(value=0)
+                elif kind == "device":
+                    # Chỉ đổi lựa chọn nếu chưa có lần tạo video nào dùng thiết bị khác
+                    if self._generator is None:
+                        self.device_var.set(value)
+                    self._append_log(f"Đang tải trước mô hình AI trên {value}...")
+                elif kind == "done":
+                    self.create_button.config(state="normal")
+                    self.cancel_button.config(state="disabled")
+        except queue.Empty:
+            pass
+        self.root.after(POLL_INTERVAL_MS, self._poll_events)
+        
+    def _set_thumbnail(self, index, ppm):
+        """Đặt hình thu nhỏ thứ index (dữ liệu PPM): thay hình đã có hoặc thêm vào cuối dải hình"""
+        photo = tk.PhotoImage(data=ppm, format="PPM")
+        if index < len(self._thumbnails):
+            item, _ = self._thumbnails[index]
+            self.thumbnail_canvas.itemconfigure(item, image=photo)
+            self._thumbnails[index] = (item, photo)
+            return
+        x = sum(image.width() + 4 for _, image in self._thumbnails)
+        item = self.thumbnail_canvas.create_image(x, 2, image=photo, anchor=tk.NW)
+        self._thumbnails.append((item, photo))
+        self.thumbnail_canvas.configure(scrollregion=(0, 0, x + photo.width(), THUMBNAIL_HEIGHT + 4))
+        self.thumbnail_canvas.xview_moveto(1.0)
+        
+    def _clear_thumbnails(self):
+        self.thumbnail_canvas.delete("all")
+        self._thumbnails = []
+        
+    def _on_progress(self, frames_done, num_frames, image):
+        """Hàm on_progress của generate_video, chạy ở luồng sinh hình"""
+        self._events.put(("progress", (frames_done, num_frames)))
+        if image is not None:
+            self._events.put(("thumbnail", (int(frames_done) - 1, thumbnail_ppm(image))))
+        
+    def _cancel_generation(self):
+        """Yêu cầu hủy lần tạo video đang chạy (dừng sau bước khử nhiễu hiện tại)"""
+        self._cancel_event.set()
+        self.cancel_button.config(state="disabled")
+        self._log("Đang hủy...")
+        
+    def _get_generator(self, device, preset, scheduler, steps):
+        """
+        VideoGenerator của phiên hiện tại
+        
+        Giữ nguyên giữa các lần tạo video; đổi preset / scheduler / số bước chỉ cấu hình lại
+        việc khử nhiễu, đổi mô hình hoặc thiết bị thì giải phóng mô hình cũ rồi tải mô hình mới.
+        """
+        from video_generator import DEFAULT_MODEL_ID, VideoGenerator
+        
+        key = (DEFAULT_MODEL_ID, device)
+        if self._generator is not None and self._generator_key != key:
+            self._log(f"Đổi sang {key[0]} trên {device}, giải phóng mô hình cũ...")
+            self._generator.unload()
+            self._generator = None
+        if self._generator is None:
+            self._log("Đang tải mô hình AI...")
+            self._generator = VideoGenerator(model_id=key[0], device=device, preset=preset,
+                                             scheduler=scheduler, steps=steps)
+            self._generator_key = key
+        else:
+            self._generator.set_sampling(preset, scheduler, steps)
+        return self._generator
+        
     def _select_output_file(self):
         """Mở hộp thoại chọn file đầu ra"""
         filename = filedialog.asksaveasfilename(
@@ -200,12 +387,15 @@ class VideoGeneratorGUI:
             self.output_file.set(filename)
             
     def _log(self, message):
-        """Thêm thông báo vào vùng log"""
+        """Thêm thông báo vào vùng log (gọi được từ mọi luồng)"""
+        self._events.put(("log", message))
+        
+    def _append_log(self, message):
+        """Ghi thông báo vào vùng log, chỉ gọi ở luồng giao diện"""
         self.log_text.config(state=tk.NORMAL)
         self.log_text.insert(tk.END, message + "\n")
         self.log_text.see(tk.END)
         self.log_text.config(state=tk.DISABLED)
-        self.root.update()
         
     def _generate_video(self):
         """Tạo video theo cấu hình đã chọn"""
@@ -214,18 +404,42 @@ class VideoGeneratorGUI:
         if not text:
             self._log("Lỗi: Vui lòng nhập mô tả văn bản!")
             return
+        
+        # Đọc các tham số ở luồng giao diện, luồng tạo video không truy cập widget
+        try:
+            options = {
+                "text": text,
+                "output_path": self.output_file.get(),
+                "frames": int(self.frames_entry.get()),
+                "frame_duration": float(self.frame_duration_entry.get()),
+                "transition": float(self.transition_entry.get()),
+                "device": self.device_var.get(),
+                "resolution": (int(self.width_entry.get()), int(self.height_entry.get())),
+                "preset": self.preset_var.get() if self.preset_var.get() in PRESETS else None,
+                "scheduler": self.scheduler_var.get() if self.scheduler_var.get() != "default" else None,
+                "steps": int(self.steps_entry.get()) or None,
+                "draft": self.draft_var.get(),
+            }
+        except ValueError as e:
+            self._log(f"Lỗi: Tham số không hợp lệ: {e}")
+            return
             
-        # Vô hiệu hóa nút tạo video
+        # Vô hiệu hóa nút tạo video, bật nút hủy
         self.create_button.config(state="disabled")
+        self.cancel_button.config(state="normal")
+        self._cancel_event.clear()
+        self._clear_thumbnails()
+        self.progress.configure(maximum=options["frames"], value=0)
+        self.progress_label.config(text=f"0/{options['frames']} hình")
                         
         # Bắt đầu tiến trình tạo video
-        threading.Thread(target=self._generate_video_thread, daemon=True).start()
+        threading.Thread(target=self._generate_video_thread, args=(options,), daemon=True).start()
     
-    def _generate_video_thread(self):
+    def _generate_video_thread(self, options):
         """Tiến trình tạo video"""
         try:
-            text = self.text_input.get("1.0", tk.END).strip()
-            output_path = self.output_file.get()
+            text = options["text"]
+            output_path = options["output_path"]
             
             # Đảm bảo thư mục đầu ra tồn tại
             output_dir = os.path.dirname(output_path)
@@ -240,13 +454,10 @@ class VideoGeneratorGUI:
                 self._log("Lỗi: Không tìm thấy file video_generator.py!")
                 return
             
-            # Thử import các thư viện AI cần thiết
-            try:
-                import torch
-                import diffusers
-                from video_generator import VideoGenerator
-            except ImportError as e:
-                self._log(f"Lỗi: Thiếu thư viện AI cần thiết: {e}")
+            # Kiểm tra các thư viện AI cần thiết
+            missing = missing_ai_libraries()
+            if missing:
+                self._log(f"Lỗi: Thiếu thư viện AI cần thiết: {', '.join(missing)}")
                 self._log("Vui lòng cài đặt thư viện cần thiết bằng lệnh sau:")
                 self._log("pip install diffusers transformers accelerate torch")
                 self._log("\nHoặc cài đặt tất cả thư viện:")
@@ -254,13 +465,12 @@ class VideoGeneratorGUI:
                 return
                 
             # Lấy các tham số
-            frames = int(self.frames_entry.get())
-            frame_duration = float(self.frame_duration_entry.get())
-            transition = float(self.transition_entry.get())
-            device = self.device_var.get()
-            width = int(self.width_entry.get())
-            height = int(self.height_entry.get())
-            resolution = (width, height)
+            frames = options["frames"]
+            frame_duration = options["frame_duration"]
+            transition = options["transition"]
+            device = options["device"]
+            width, height = resolution = options["resolution"]
+            preset, scheduler, steps = options["preset"], options["scheduler"], options["steps"]
             
             self._log(f"Sử dụng chế độ AI:")
             self._log(f"- Số khung hình: {frames}")
@@ -268,23 +478,39 @@ class VideoGeneratorGUI:
             self._log(f"- Thời gian chuyển cảnh: {transition} giây")
             self._log(f"- Độ phân giải: {width}x{height}")
             self._log(f"- Thiết bị xử lý: {device}")
+            self._log(f"- Bản nháp: {'có' if options['draft'] else 'không'}")
+            self._log(f"- Preset: {preset or 'mặc định'}, scheduler: {scheduler or 'theo preset/mô hình'}, "
+                      f"số bước: {steps or 'theo preset/mô hình'}")
             
             try:
-                # Khởi tạo generator
-                self._log("Đang tải mô hình AI...")
-                generator = VideoGenerator(device=device)
+                # Lấy generator của phiên (chỉ tải mô hình ở lần đầu hoặc khi đổi thiết bị)
+                generator = self._get_generator(device, preset, scheduler, steps)
+                if self._cancel_event.is_set():
+                    self._log("Đã hủy tạo video")
+                    return
                 
                 # Tạo video
-                generator.generate_video(
+                result = generator.generate_video(
                     text, 
                     output_path=output_path, 
                     num_frames=frames,
                     frame_duration=frame_duration,
                     transition_duration=transition,
-                    resolution=resolution
+                    resolution=resolution,
+                    on_progress=self._on_progress,
+                    is_cancelled=self._cancel_event.is_set,
+                    draft=options["draft"],
+                    on_draft=lambda path: self._events.put(("draft", path))
                 )
                 
-                self._log(f"Video đã được tạo thành công và lưu tại: {output_path}")
+                if result:
+                    stages = result.metrics.get("stages", {})
+                    self._log(f"Video đã được tạo thành công và lưu tại: {output_path}")
+                    self._log("Thời gian: " + ", ".join(f"{name} {stats['wall_s']:.1f}s" for name, stats in stages.items()))
+                elif self._cancel_event.is_set():
+                    self._log("Đã hủy tạo video")
+                else:
+                    self._log(f"Không thể tạo video AI: {result.error}")
             except Exception as e:
                 self._log(f"Lỗi khi tạo video AI: {e}")
                 import traceback
@@ -295,8 +521,8 @@ class VideoGeneratorGUI:
             import traceback
             self._log(traceback.format_exc())
         finally:
-            # Kích hoạt lại nút tạo video
-            self.create_button.config(state="normal")
+            # Kích hoạt lại nút tạo video (ở luồng giao diện)
+            self._events.put(("done", None))
 
 def main():
     """Hàm chính để khởi động ứng dụng"""
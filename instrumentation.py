@@ -0,0 +1,422 @@
+"""
+Đo đạc trong quá trình sinh video
+
+PeakMemoryTracker lấy mẫu bộ nhớ RSS của tiến trình (và bộ nhớ CUDA nếu có) ở
+một luồng nền, ghi lại mức đỉnh theo từng giai đoạn: mã hóa prompt, khử nhiễu,
+giải mã VAE, ghi video...
+
+RunRecorder ghi thời gian thực, thời gian CPU và RSS đỉnh của từng giai đoạn, thời
+gian từng bước khử nhiễu và khoảng cách giữa các khung hình của một lần sinh video.
+Báo cáo được gửi tới các sink: file JSON, logging, hoặc dạng văn bản Prometheus.
+"""
+import contextlib
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+
+
+def current_rss_bytes():
+    """Bộ nhớ RSS hiện tại của tiến trình (byte)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        # Không đo được RSS hiện tại, dùng mức đỉnh từ đầu tiến trình
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakMemoryTracker:
+    """
+    Ghi lại bộ nhớ RSS đỉnh theo giai đoạn
+
+    interval: Khoảng thời gian giữa hai lần lấy mẫu (giây)
+    cuda: Ghi thêm bộ nhớ CUDA đỉnh (torch.cuda.max_memory_allocated) theo giai đoạn
+
+    Dùng như ngữ cảnh: `with tracker: ...`, đổi giai đoạn bằng set_stage(tên).
+    """
+    def __init__(self, interval=0.005, cuda=False):
+        self.interval = interval
+        self.cuda = cuda
+        self.peaks = {}
+        self.cuda_peaks = {}
+        self._stage = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _record(self, stage):
+        rss = current_rss_bytes()
+        with self._lock:
+            if stage is not None and rss > self.peaks.get(stage, 0):
+                self.peaks[stage] = rss
+
+    def _record_cuda(self, stage):
+        import torch
+        peak = torch.cuda.max_memory_allocated()
+        if stage is not None and peak > self.cuda_peaks.get(stage, 0):
+            self.cuda_peaks[stage] = peak
+        torch.cuda.reset_peak_memory_stats()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._record(self._stage)
+
+    def set_stage(self, stage):
+        """Chuyển sang giai đoạn mới (None = không ghi)"""
+        previous = self._stage
+        self._record(previous)
+        if self.cuda:
+            self._record_cuda(previous)
+        self._stage = stage
+        self._record(stage)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.set_stage(None)
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def summary(self):
+        """Chuỗi mô tả bộ nhớ đỉnh của từng giai đoạn (MB)"""
+        parts = []
+        for stage, peak in self.peaks.items():
+            text = f"{stage} {peak / 2**20:.0f} MB"
+            if stage in self.cuda_peaks:
+                text += f" (CUDA {self.cuda_peaks[stage] / 2**20:.0f} MB)"
+            parts.append(text)
+        return ", ".join(parts)
+
+
+def _summarize(durations):
+    """Số lượng, trung bình, p50, p95, lớn nhất của một danh sách thời gian (giây)"""
+    if not durations:
+        return {"count": 0}
+    ordered = sorted(durations)
+
+    def percentile(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "mean_s": sum(ordered) / len(ordered),
+        "p50_s": percentile(0.5),
+        "p95_s": percentile(0.95),
+        "max_s": ordered[-1],
+    }
+
+
+class RunRecorder:
+    """
+    Ghi số liệu theo giai đoạn của một lần sinh video
+
+    memory_tracker: PeakMemoryTracker đang chạy để lấy RSS đỉnh của từng giai đoạn (None = không đo)
+
+    Mỗi luồng có giai đoạn hiện tại riêng: set_stage(tên) kết thúc giai đoạn trước của
+    luồng gọi và bắt đầu giai đoạn mới, measure(tên) đo một khối rồi quay lại giai đoạn
+    trước đó. Chỉ luồng tạo RunRecorder mới đổi giai đoạn của memory_tracker. Thời gian
+    CPU là của cả tiến trình (gồm các luồng của torch), nên khi ghi video song song với
+    sinh hình thì thời gian CPU của hai giai đoạn chạy đồng thời tính chồng lên nhau.
+    """
+    def __init__(self, memory_tracker=None):
+        self.memory_tracker = memory_tracker
+        self.stages = {}
+        self.step_times = []
+        self.frame_times = []
+        self._owner = threading.get_ident()
+        self._current = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._last_step = None
+        self._last_frame = self._start
+
+    def _switch(self, stage, count):
+        now, cpu = time.perf_counter(), time.process_time()
+        thread = threading.get_ident()
+        with self._lock:
+            previous = self._current.pop(thread, None)
+            if previous is not None:
+                name, wall_start, cpu_start = previous
+                stats = self.stages.setdefault(name, {"count": 0, "wall_s": 0.0, "cpu_s": 0.0})
+                stats["wall_s"] += now - wall_start
+                stats["cpu_s"] += cpu - cpu_start
+            if stage is not None:
+                self._current[thread] = (stage, now, cpu)
+                if count:
+                    self.stages.setdefault(stage, {"count": 0, "wall_s": 0.0, "cpu_s": 0.0})["count"] += 1
+        if stage == "denoise":
+            self._last_step = now
+        if self.memory_tracker is not None and thread == self._owner:
+            self.memory_tracker.set_stage(stage)
+
+    def current_stage(self):
+        """Giai đoạn hiện tại của luồng gọi (None nếu chưa có)"""
+        current = self._current.get(threading.get_ident())
+        return current[0] if current else None
+
+    def set_stage(self, stage):
+        """Chuyển luồng gọi sang giai đoạn mới (None = dừng ghi cho luồng này)"""
+        self._switch(stage, count=True)
+
+    @contextlib.contextmanager
+    def measure(self, stage):
+        """Đo một khối mã như một giai đoạn rồi quay lại giai đoạn trước đó của luồng"""
+        previous = self.current_stage()
+        self._switch(stage, count=True)
+        try:
+            yield
+        finally:
+            self._switch(previous, count=False)
+
+    def timed(self, iterable, stage):
+        """Duyệt iterable, thời gian tạo ra từng phần tử được tính vào stage"""
+        iterator = iter(iterable)
+        while True:
+            with self.measure(stage):
+                item = next(iterator, StopIteration)
+            if item is StopIteration:
+                return
+            yield item
+
+    def add_stage(self, stage, wall_s, cpu_s, peak_rss_bytes=None):
+        """Thêm số liệu đã đo bên ngoài (ví dụ thời gian tải mô hình)"""
+        with self._lock:
+            stats = self.stages.setdefault(stage, {"count": 0, "wall_s": 0.0, "cpu_s": 0.0})
+            stats["count"] += 1
+            stats["wall_s"] += wall_s
+            stats["cpu_s"] += cpu_s
+            if peak_rss_bytes is not None:
+                stats["peak_rss_bytes"] = max(stats.get("peak_rss_bytes", 0), peak_rss_bytes)
+
+    def step(self):
+        """Đánh dấu kết thúc một bước khử nhiễu"""
+        now = time.perf_counter()
+        if self._last_step is not None:
+            self.step_times.append(now - self._last_step)
+        self._last_step = now
+
+    def frame(self):
+        """Đánh dấu một keyframe vừa sinh xong"""
+        now = time.perf_counter()
+        self.frame_times.append(now - self._last_frame)
+        self._last_frame = now
+
+    def finish(self):
+        """Kết thúc mọi giai đoạn đang mở, dừng memory_tracker và trả về báo cáo dạng dict"""
+        now, cpu = time.perf_counter(), time.process_time()
+        with self._lock:
+            for name, wall_start, cpu_start in self._current.values():
+                stats = self.stages.setdefault(name, {"count": 0, "wall_s": 0.0, "cpu_s": 0.0})
+                stats["wall_s"] += now - wall_start
+                stats["cpu_s"] += cpu - cpu_start
+            self._current.clear()
+        if self.memory_tracker is not None:
+            self.memory_tracker.stop()
+            for name, peak in self.memory_tracker.peaks.items():
+                stats = self.stages.setdefault(name, {"count": 0, "wall_s": 0.0, "cpu_s": 0.0})
+                stats["peak_rss_bytes"] = max(stats.get("peak_rss_bytes", 0), peak)
+            for name, peak in self.memory_tracker.cuda_peaks.items():
+                stats = self.stages.setdefault(name, {"count": 0, "wall_s": 0.0, "cpu_s": 0.0})
+                stats["peak_cuda_bytes"] = peak
+        return {
+            "total_s": now - self._start,
+            "stages": self.stages,
+            "steps": dict(_summarize(self.step_times), durations_s=self.step_times),
+            "frames": dict(_summarize(self.frame_times), latencies_s=self.frame_times),
+        }
+
+
+class GenerationResult:
+    """
+    Kết quả của VideoGenerator.generate_video
+
+    success: Tạo video thành công hay không; bool(result) trả về giá trị này nên
+             các đoạn mã cũ dùng `if generator.generate_video(...)` vẫn chạy đúng
+    output_path: Đường dẫn video
+    metrics: Báo cáo của RunRecorder.finish (thời gian, CPU, RSS đỉnh từng giai đoạn...)
+    error: Thông báo lỗi nếu thất bại
+    """
+    def __init__(self, success, output_path=None, metrics=None, error=None, params=None):
+        self.success = bool(success)
+        self.output_path = output_path
+        self.metrics = metrics or {}
+        self.error = error
+        self.params = params or {}
+
+    def __bool__(self):
+        return self.success
+
+    def __repr__(self):
+        return f"GenerationResult(success={self.success}, output_path={self.output_path!r})"
+
+    def to_dict(self):
+        """Báo cáo dạng dict có thể ghi ra JSON"""
+        return {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "success": self.success,
+            "output_path": self.output_path,
+            "error": self.error,
+            "params": self.params,
+            **self.metrics,
+        }
+
+
+class JSONReportSink:
+    """
+    Ghi báo cáo ra file JSON
+
+    Đường dẫn kết thúc bằng .jsonl: mỗi lần chạy thêm một dòng (tiện theo dõi qua nhiều lần chạy);
+    đường dẫn khác: ghi đè bằng báo cáo của lần chạy mới nhất.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def emit(self, report):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.path.endswith(".jsonl"):
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(report, ensure_ascii=False) + "\n")
+        else:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+class LoggingSink:
+    """Ghi báo cáo qua module logging: một dòng tóm tắt, chi tiết JSON ở mức DEBUG"""
+    def __init__(self, logger="video_ai.metrics", level=logging.INFO):
+        self.logger = logging.getLogger(logger) if isinstance(logger, str) else logger
+        self.level = level
+
+    def emit(self, report):
+        stages = ", ".join(f"{name} {stats['wall_s']:.2f}s" for name, stats in report.get("stages", {}).items())
+        self.logger.log(self.level, "video %s: %.2fs (%s)", "ok" if report.get("success") else "lỗi",
+                        report.get("total_s", 0.0), stages)
+        self.logger.debug("%s", json.dumps(report, ensure_ascii=False))
+
+
+def render_prometheus(report, prefix="video_ai"):
+    """Chuyển báo cáo sang định dạng văn bản của Prometheus"""
+    lines = [
+        f"# TYPE {prefix}_run_success gauge",
+        f"{prefix}_run_success {int(bool(report.get('success')))}",
+        f"# TYPE {prefix}_run_seconds gauge",
+        f"{prefix}_run_seconds {report.get('total_s', 0.0):.6f}",
+    ]
+    if "draft_s" in report:
+        lines += [f"# TYPE {prefix}_draft_seconds gauge", f"{prefix}_draft_seconds {report['draft_s']:.6f}"]
+    stages = report.get("stages", {})
+    for metric, key, kind in (("stage_wall_seconds", "wall_s", "gauge"), ("stage_cpu_seconds", "cpu_s", "gauge"),
+                              ("stage_peak_rss_bytes", "peak_rss_bytes", "gauge"), ("stage_count", "count", "gauge")):
+        values = [(name, stats[key]) for name, stats in stages.items() if key in stats]
+        if values:
+            lines.append(f"# TYPE {prefix}_{metric} {kind}")
+            lines += [f'{prefix}_{metric}{{stage="{name}"}} {value:g}' for name, value in values]
+    for metric, key in (("step_seconds", "steps"), ("frame_seconds", "frames")):
+        summary = report.get(key, {})
+        if summary.get("count"):
+            lines.append(f"# TYPE {prefix}_{metric} summary")
+            lines += [f'{prefix}_{metric}{{quantile="{q}"}} {summary[f"p{int(float(q) * 100)}_s"]:.6f}'
+                      for q in ("0.5", "0.95")]
+            lines.append(f"{prefix}_{metric}_count {summary['count']}")
+            lines.append(f"{prefix}_{metric}_sum {summary['mean_s'] * summary['count']:.6f}")
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusSink:
+    """
+    Xuất số liệu của lần chạy gần nhất theo định dạng văn bản Prometheus
+
+    path: Ghi ra file (ví dụ cho textfile collector của node_exporter)
+    port: Phục vụ qua HTTP tại http://host:port/metrics (luồng nền, chỉ mở một lần)
+    """
+    def __init__(self, path=None, port=None, host="127.0.0.1"):
+        self.path = path
+        self.text = ""
+        self.server = None
+        if port is not None:
+            self._serve(host, port)
+
+    def _serve(self, host, port):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = sink.text.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Số liệu Prometheus tại http://{host}:{self.server.server_address[1]}/metrics")
+
+    def emit(self, report):
+        self.text = render_prometheus(report)
+        if self.path:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.text)
+            os.replace(tmp_path, self.path)
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def add_report_arguments(parser):
+    """Thêm các tham số xuất báo cáo số liệu vào argparse parser"""
+    parser.add_argument("--report", help="Ghi báo cáo số liệu (thời gian, CPU, RSS đỉnh theo giai đoạn) ra file JSON; "
+                                         "đuôi .jsonl để thêm một dòng mỗi lần chạy.")
+    parser.add_argument("--log-metrics", action="store_true", help="Ghi báo cáo số liệu qua logging.")
+    parser.add_argument("--metrics-port", type=int, help="Phục vụ số liệu dạng Prometheus tại cổng này (/metrics).")
+
+
+def report_sinks_from_args(args):
+    """Tạo danh sách sink từ tham số đã thêm bởi add_report_arguments"""
+    sinks = []
+    if args.report:
+        sinks.append(JSONReportSink(args.report))
+    if args.log_metrics:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+        sinks.append(LoggingSink())
+    if args.metrics_port is not None:
+        sinks.append(PrometheusSink(port=args.metrics_port))
+    return sinks
@@ -0,0 +1,103 @@
+"""
+Bộ nhớ đệm khung hình chính (keyframe) trên đĩa, đánh địa chỉ theo nội dung
+
+Mỗi khung hình được lưu theo mã băm của toàn bộ tham số sinh hình (mô hình,
+prompt, seed, độ phân giải, số bước...). Chạy lại cùng tham số - kể cả khi chỉ
+đổi thời lượng, chuyển cảnh hay thêm khung hình - sẽ dùng lại kết quả cũ.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+import cv2
+
+# File tạm (*.tmp.png) cũ hơn thời gian này là của lần ghi bị dừng giữa chừng (giây)
+STALE_TEMP_SECONDS = 600
+
+
+class KeyframeCache:
+    """
+    Bộ nhớ đệm keyframe với giới hạn dung lượng và loại bỏ theo LRU
+    
+    cache_dir: Thư mục lưu các khung hình (PNG, không mất dữ liệu)
+    max_size_mb: Dung lượng tối đa (MB); khi vượt quá, khung hình lâu không dùng nhất bị xóa
+    """
+    def __init__(self, cache_dir=".keyframe_cache", max_size_mb=2048):
+        self.cache_dir = str(cache_dir)
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._size = 0
+        now = time.time()
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(".png"):
+                continue
+            if ".tmp" not in entry.name:
+                self._size += entry.stat().st_size
+                continue
+            # Xóa file tạm còn sót lại khi tiến trình bị dừng lúc đang ghi; file tạm mới có thể
+            # đang được tiến trình khác dùng chung thư mục ghi nên giữ lại
+            try:
+                if now - entry.stat().st_mtime > STALE_TEMP_SECONDS:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def make_key(**params):
+        """Mã băm SHA-256 của tham số sinh hình (không phụ thuộc thứ tự tham số)"""
+        payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def get(self, key):
+        """Trả về khung hình BGR đã lưu, hoặc None nếu chưa có"""
+        path = self._path(key)
+        frame = cv2.imread(path) if os.path.exists(path) else None
+        with self._lock:
+            if frame is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        # Cập nhật thời điểm truy cập để phục vụ loại bỏ theo LRU
+        os.utime(path)
+        return frame
+
+    def put(self, key, frame):
+        """Lưu khung hình BGR, sau đó xóa bớt khung hình cũ nếu vượt giới hạn"""
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.png"
+        cv2.imwrite(temp_path, frame, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        size = os.path.getsize(temp_path)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(temp_path, path)
+        with self._lock:
+            self._size += size - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Xóa các khung hình có thời điểm truy cập cũ nhất cho tới khi nằm trong giới hạn"""
+        entries = sorted(
+            (entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".png") and ".tmp" not in entry.name),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._size -= size
+            except OSError:
+                pass
+
+    def stats(self):
+        """Số lần trúng / trượt bộ nhớ đệm"""
+        return {"hits": self.hits, "misses": self.misses}
@@ -1,10 +1,18 @@
 import argparse
 import os
+import time
 from pathlib import Path
 
-# Import module video generator AI
+# Chỉ import phần khai báo tham số; torch/diffusers được import khi thật sự tải mô hình
 try:
-    from video_generator import VideoGenerator
+    from model_registry import missing_ai_libraries
+    from schedulers import add_sampling_arguments
+    from cpu_optimizations import add_cpu_arguments, cpu_optimizations_from_args
+    from upscalers import add_upscale_arguments, upscale_options_from_args
+    from instrumentation import add_report_arguments, report_sinks_from_args
+    from video_writers import add_encoder_arguments, encoder_from_args
+    from quantization import add_quantize_arguments
+    from transitions import TRANSITIONS
 except ImportError:
     print("Lỗi: Không thể tải thư viện video_generator. Vui lòng kiểm tra cài đặt.")
     exit(1)
@@ -20,6 +28,52 @@ def print_banner():
     """
     print(banner)
 
+def make_cache(args):
+    """Tạo bộ nhớ đệm keyframe nếu có tham số --cache-dir"""
+    if not args.cache_dir:
+        return None
+    from keyframe_cache import KeyframeCache
+    return KeyframeCache(args.cache_dir, args.cache_size_mb)
+
+def make_generator(args):
+    """Khởi tạo VideoGenerator theo tham số dòng lệnh (mô hình, thiết bị, bộ nhớ đệm, khử nhiễu, tối ưu CPU)"""
+    from video_generator import VideoGenerator
+    return VideoGenerator(
+        model_id=args.model,
+        device=args.device,
+        keyframe_cache=make_cache(args),
+        preset=args.preset,
+        scheduler=args.scheduler,
+        steps=args.steps,
+        guidance_scale=args.guidance_scale,
+        cpu_optimizations=cpu_optimizations_from_args(args),
+        quantize=args.quantize,
+        memory_budget_mb=args.memory_budget_mb,
+        track_memory=args.profile_memory,
+        metrics_sinks=report_sinks_from_args(args)
+    )
+
+def run_batch_command(args):
+    """Chạy subcommand batch: tạo nhiều video từ manifest với một mô hình đã tải"""
+    from batch_runner import load_manifest, run_batch, print_summary
+    
+    jobs = load_manifest(args.manifest)
+    print(f"Đã đọc {len(jobs)} job từ '{args.manifest}'")
+    
+    start = time.perf_counter()
+    generator = make_generator(args)
+    results = run_batch(
+        generator,
+        jobs,
+        batch_size=args.batch_size or 4,
+        completed_log=args.completed_log,
+        vfr=args.vfr,
+        fps=args.fps,
+        encoder=encoder_from_args(args)
+    )
+    print_summary(results)
+    print(f"Tổng thời gian: {time.perf_counter() - start:.1f} giây")
+
 def main():
     """Hàm chính của ứng dụng"""
     print_banner()
@@ -36,13 +90,76 @@ def main():
     parser.add_argument("--frames", type=int, default=5, help="Số lượng khung hình sinh từ AI.")
     parser.add_argument("--frame-duration", type=float, default=2.0, help="Thời lượng mỗi hình ảnh (giây).")
     parser.add_argument("--transition", type=float, default=1.0, help="Thời gian chuyển cảnh (giây).")
+    parser.add_argument("--transition-type", choices=TRANSITIONS, default="linear",
+                       help="Kiểu chuyển cảnh (mặc định: linear).")
     parser.add_argument("--seed", type=int, help="Giá trị khởi tạo ngẫu nhiên (tùy chọn).")
     parser.add_argument("--device", choices=["cpu", "cuda"], help="Thiết bị xử lý ('cpu' hoặc 'cuda').")
+    parser.add_argument("--batch-size", type=int,
+                       help="Số hình sinh chung trong một lần khử nhiễu, với batch có thể thuộc nhiều job "
+                            "(mặc định: 1 - tuần tự; 4 với batch).")
+    parser.add_argument("--save-frames", help="Thư mục lưu các hình đã sinh dạng PNG để gỡ lỗi (tùy chọn).")
+    parser.add_argument("--stream", action="store_true",
+                       help="Ghi video song song với quá trình sinh hình (có video một phần nếu bị dừng giữa chừng).")
+    parser.add_argument("--vfr", action="store_true",
+                       help="Ghi video tốc độ khung hình thay đổi: mỗi đoạn giữ hình chỉ mã hóa một lần (cần ffmpeg).")
+    parser.add_argument("--encode-workers", type=int, default=1,
+                       help="Số tiến trình mã hóa video song song theo đoạn, nối lại bằng ffmpeg (mặc định: 1 - tuần tự, 0 = số lõi CPU).")
+    parser.add_argument("--fps", type=int, default=24,
+                       help="Số khung hình mỗi giây của video; với batch, job có trường fps thì dùng giá trị của job (mặc định: 24).")
+    parser.add_argument("--cache-dir", help="Thư mục bộ nhớ đệm keyframe để dùng lại hình đã sinh (tùy chọn).")
+    parser.add_argument("--draft", action="store_true",
+                       help="Ghi nhanh video nháp (<output>_draft.mp4) ở độ phân giải nhỏ, ít bước, cùng bố cục, rồi mới sinh bản đầy đủ.")
+    parser.add_argument("--draft-scale", type=float, default=0.5,
+                       help="Tỉ lệ độ phân giải của bản nháp so với --resolution (mặc định: 0.5).")
+    parser.add_argument("--draft-steps", type=int,
+                       help="Số bước khử nhiễu của bản nháp (mặc định: theo preset draft).")
+    parser.add_argument("--interpolate", type=int, default=0,
+                       help="Số khung hình nội suy latent giữa hai khung hình neo (mặc định: 0 - không nội suy).")
+    parser.add_argument("--chain-strength", type=float,
+                       help="Sinh khung hình sau bằng img2img từ khung hình trước với strength này, ví dụ 0.3 (tùy chọn).")
+    parser.add_argument("--cache-size-mb", type=float, default=2048,
+                       help="Dung lượng tối đa của bộ nhớ đệm keyframe (MB, mặc định: 2048).")
+    add_sampling_arguments(parser)
+    add_cpu_arguments(parser)
+    add_quantize_arguments(parser)
+    parser.add_argument("--memory-budget-mb", type=float,
+                       help="Ngân sách bộ nhớ (MB): tự bật chia nhỏ attention, VAE tiling/slicing, offload khi cần (tùy chọn).")
+    parser.add_argument("--profile-memory", action="store_true", help="In bộ nhớ đỉnh theo từng giai đoạn.")
+    add_upscale_arguments(parser)
+    add_encoder_arguments(parser)
+    add_report_arguments(parser)
     parser.add_argument("--model", default="stabilityai/stable-diffusion-2-1-base", 
                        help="ID mô hình Stable Diffusion (mặc định: stabilityai/stable-diffusion-2-1-base).")
     
+    # Subcommand batch: chạy nhiều job từ manifest. Mô hình, thiết bị, bộ nhớ đệm, khử nhiễu, tối ưu CPU,
+    # bộ mã hóa... dùng các tham số chung ở trên, đặt trước "batch" (khai báo lại ở subparser thì giá trị
+    # mặc định của subparser sẽ ghi đè giá trị đã đặt)
+    subparsers = parser.add_subparsers(dest="command")
+    batch_parser = subparsers.add_parser(
+        "batch", help="Tạo nhiều video từ manifest JSONL/CSV với một mô hình đã tải.",
+        description="Các tham số chung (--model, --device, --batch-size, --fps, --encoder...) đặt trước 'batch', "
+                    "ví dụ: main.py --model <id> --batch-size 4 batch jobs.jsonl"
+    )
+    batch_parser.add_argument("manifest", help="File manifest JSONL hoặc CSV, mỗi dòng một job.")
+    batch_parser.add_argument("--completed-log", default="completed_jobs.jsonl",
+                             help="File ghi các job đã xong, dùng để chạy tiếp (mặc định: completed_jobs.jsonl).")
+    
     args = parser.parse_args()
     
+    missing = missing_ai_libraries()
+    if missing:
+        print(f"Lỗi: Thiếu thư viện AI cần thiết: {', '.join(missing)}")
+        print("Vui lòng cài đặt bằng lệnh: pip install -r requirements.txt")
+        return
+    
+    if args.command == "batch":
+        run_batch_command(args)
+        return
+    
+    # Tải mô hình ở luồng nền trong lúc người dùng nhập mô tả
+    from video_generator import preload_model
+    preload_model(args.model, args.device, args.quantize)
+    
     # Nếu không có văn bản đầu vào, hỏi người dùng
     if not args.text:
         args.text = input("Nhập mô tả văn bản để tạo video: ")
@@ -61,27 +178,47 @@ def main():
     except:
         print("Lỗi định dạng độ phân giải. Sử dụng mặc định 512x512.")
         resolution = (512, 512)
+    output_resolution, upscaler = upscale_options_from_args(args)
     
     print(f"\nBắt đầu tạo video AI từ mô tả: '{args.text}'")
     print(f"- Số khung hình: {args.frames}")
     print(f"- Thời gian mỗi khung hình: {args.frame_duration} giây")
     print(f"- Thời gian chuyển cảnh: {args.transition} giây")
     print(f"- Độ phân giải: {resolution[0]}x{resolution[1]}")
+    if output_resolution:
+        print(f"- Độ phân giải video: {output_resolution[0]}x{output_resolution[1]} (phóng to bằng {upscaler.name})")
+    print(f"- Bộ mã hóa: {args.encoder}, {args.fps} fps")
     print(f"- File đầu ra: {args.output}")
     
     # Khởi tạo và chạy VideoGenerator
-    generator = VideoGenerator(model_id=args.model, device=args.device)
-    success = generator.generate_video(
+    generator = make_generator(args)
+    result = generator.generate_video(
         args.text, 
         output_path=args.output, 
         num_frames=args.frames,
         frame_duration=args.frame_duration,
         transition_duration=args.transition,
         resolution=resolution,
-        seed=args.seed
+        seed=args.seed,
+        batch_size=args.batch_size or 1,
+        debug_frames_dir=args.save_frames,
+        streaming=args.stream,
+        transition=args.transition_type,
+        vfr=args.vfr,
+        interpolation_steps=args.interpolate,
+        chain_strength=args.chain_strength,
+        output_resolution=output_resolution,
+        upscaler=upscaler,
+        draft=args.draft,
+        draft_scale=args.draft_scale,
+        draft_steps=args.draft_steps,
+        encode_workers=args.encode_workers,
+        fps=args.fps,
+        encoder=encoder_from_args(args),
+        on_draft=lambda path: print(f"\n👀 Bản nháp đã sẵn sàng, có thể xem ngay: {path}\n")
     )
     
-    if success:
+    if result:
         print(f"\n✅ Đã tạo xong video AI! File đã được lưu tại: {args.output}")
     else:
         print(f"\n❌ Không thể tạo video AI. Vui lòng kiểm tra log lỗi.")
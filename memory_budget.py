@@ -0,0 +1,124 @@
+"""
+Giữ bộ nhớ khi sinh hình độ phân giải cao dưới một ngân sách cho trước
+
+Ước lượng bộ nhớ đỉnh của một lần sinh hình (trọng số mô hình, attention của
+UNet, giải mã VAE) rồi bật dần các cách tiết kiệm bộ nhớ cho tới khi vừa ngân
+sách: chia nhỏ attention (chỉ khi không dùng SDPA) và giải mã VAE từng hình,
+giải mã VAE theo ô (tiling), và cuối cùng là offload tuần tự các thành phần
+(chỉ có ý nghĩa trên CUDA).
+"""
+import weakref
+
+from model_registry import estimate_pipeline_bytes
+
+# Các mức tiết kiệm, mức sau gồm cả các cách của mức trước
+SAVING_TIERS = (
+    (),
+    ("attention_slicing", "vae_slicing"),
+    ("attention_slicing", "vae_slicing", "vae_tiling"),
+    ("attention_slicing", "vae_slicing", "vae_tiling", "sequential_offload"),
+)
+
+# Các cách tiết kiệm đang được bật trên từng pipeline
+_active_savings = weakref.WeakKeyDictionary()
+# UNet của pipeline có dùng SDPA trước khi bị đổi sang attention chia nhỏ hay không
+_unet_uses_sdpa = weakref.WeakKeyDictionary()
+
+
+def uses_sdpa(module):
+    """
+    Attention của module có dùng scaled_dot_product_attention (AttnProcessor2_0) hay không
+
+    SDPA không giữ cả ma trận điểm số token × token, nên chia nhỏ attention không giảm
+    được bộ nhớ mà còn chậm hơn; chỉ cài đặt attention cổ điển mới cần chia nhỏ.
+    """
+    processors = getattr(module, "attn_processors", None)
+    return bool(processors) and all(type(p).__name__ == "AttnProcessor2_0" for p in processors.values())
+
+
+def estimate_peak_bytes(pipeline, resolution, batch_size=1, savings=(), guidance=True, bytes_per_value=4,
+                        sdpa=None):
+    """
+    Ước lượng thô bộ nhớ đỉnh (byte) của một lần sinh batch_size hình ở resolution
+
+    Chỉ dùng để chọn mức tiết kiệm: activation ở tầng phân giải cao nhất của UNet
+    (kèm ma trận attention nếu không dùng SDPA) và activation của VAE ở độ phân
+    giải ảnh là hai chỗ tăng nhanh nhất theo kích thước khung hình.
+    sdpa: UNet có dùng SDPA hay không (None = kiểm tra trên pipeline)
+    """
+    width, height = resolution
+    tokens = (width // 8) * (height // 8)
+    unet_batch = batch_size * (2 if guidance else 1)
+
+    model = estimate_pipeline_bytes(pipeline)
+    if "sequential_offload" in savings:
+        # Chỉ giữ một thành phần lớn nhất trên thiết bị tại một thời điểm
+        model = model // 2
+
+    unet = getattr(pipeline, "unet", None)
+    channels, heads = 320, 8
+    if unet is not None:
+        channels = unet.config.block_out_channels[0]
+        head_dim = unet.config.attention_head_dim
+        heads = head_dim[0] if isinstance(head_dim, (list, tuple)) else head_dim
+    unet_peak = unet_batch * channels * tokens * 6
+    if not (uses_sdpa(unet) if sdpa is None else sdpa):
+        attention_slices = unet_batch * heads if "attention_slicing" in savings else 1
+        unet_peak += unet_batch * heads * tokens * tokens // attention_slices
+
+    vae = getattr(pipeline, "vae", None)
+    vae_channels = vae.config.block_out_channels[0] if vae is not None else 128
+    decode_batch = 1 if "vae_slicing" in savings else batch_size
+    pixels, vae_tokens = width * height, tokens
+    if "vae_tiling" in savings:
+        tile = getattr(vae, "tile_sample_min_size", 512)
+        pixels, vae_tokens = min(pixels, tile * tile), min(tokens, (tile // 8) ** 2)
+    vae_peak = vae_channels * pixels * 4
+    if not uses_sdpa(vae):
+        vae_peak += vae_tokens * vae_tokens
+    vae_peak *= decode_batch
+
+    return model + max(unet_peak, vae_peak) * bytes_per_value
+
+
+def plan_memory_savings(pipeline, budget_mb, resolution, batch_size=1, device="cpu", guidance=True):
+    """
+    Chọn mức tiết kiệm thấp nhất có bộ nhớ ước lượng nằm trong ngân sách
+
+    Trả về (danh sách cách tiết kiệm, bộ nhớ ước lượng tính bằng byte).
+    """
+    sdpa = _unet_uses_sdpa.get(pipeline)
+    if sdpa is None:
+        sdpa = _unet_uses_sdpa[pipeline] = uses_sdpa(getattr(pipeline, "unet", None))
+    tiers = []
+    for tier in SAVING_TIERS:
+        if sdpa:
+            tier = tuple(saving for saving in tier if saving != "attention_slicing")
+        if (device == "cuda" or "sequential_offload" not in tier) and tier not in tiers:
+            tiers.append(tier)
+    for tier in tiers:
+        estimate = estimate_peak_bytes(pipeline, resolution, batch_size, tier, guidance, sdpa=sdpa)
+        if estimate <= budget_mb * 2**20:
+            return tier, estimate
+    return tiers[-1], estimate
+
+
+def apply_memory_savings(pipeline, savings, device="cpu"):
+    """Bật các cách tiết kiệm trong savings và tắt các cách đã bật trước đó mà không còn cần"""
+    active = _active_savings.get(pipeline, ())
+    if tuple(savings) == tuple(active):
+        return
+    if "attention_slicing" in savings and hasattr(pipeline, "enable_attention_slicing"):
+        pipeline.enable_attention_slicing("max")
+    elif "attention_slicing" in active:
+        pipeline.disable_attention_slicing()
+    vae = getattr(pipeline, "vae", None)
+    if vae is not None and hasattr(vae, "enable_slicing"):
+        vae.enable_slicing() if "vae_slicing" in savings else vae.disable_slicing()
+        vae.enable_tiling() if "vae_tiling" in savings else vae.disable_tiling()
+    if "sequential_offload" in savings and "sequential_offload" not in active:
+        # Offload không tắt lại được; các lần sau pipeline vẫn chạy tuần tự từng thành phần
+        pipeline.enable_sequential_cpu_offload(device=device)
+    elif "sequential_offload" in active:
+        savings = tuple(savings) + ("sequential_offload",)
+    _active_savings[pipeline] = tuple(savings)
@@ -0,0 +1,202 @@
+"""
+Sổ đăng ký pipeline Stable Diffusion dùng chung trong toàn tiến trình
+
+Mỗi pipeline được tải một lần theo khóa (model_id, device, dtype) và được
+dùng lại cho mọi VideoGenerator sau đó, thay vì gọi from_pretrained mỗi lần.
+"""
+import gc
+import importlib.util
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+# Thư viện cần cho chế độ AI; chỉ kiểm tra có cài hay không, không import (import torch/diffusers mất vài giây)
+AI_LIBRARIES = ("torch", "diffusers", "transformers")
+
+
+def missing_ai_libraries():
+    """Danh sách thư viện AI chưa được cài, kiểm tra bằng importlib.util.find_spec"""
+    return [name for name in AI_LIBRARIES if importlib.util.find_spec(name) is None]
+
+
+# Mỗi pipeline chỉ được chạy bởi một luồng tại một thời điểm (scheduler giữ trạng thái)
+_pipeline_locks = weakref.WeakKeyDictionary()
+_pipeline_locks_guard = threading.Lock()
+
+
+def pipeline_lock(pipeline):
+    """Khóa dùng chung của một pipeline, để các luồng (GUI, server) không gọi pipeline song song"""
+    with _pipeline_locks_guard:
+        lock = _pipeline_locks.get(pipeline)
+        if lock is None:
+            lock = _pipeline_locks[pipeline] = threading.Lock()
+        return lock
+
+
+def _load_pipeline(model_id, device, dtype, quantize=None):
+    """
+    Tải StableDiffusionPipeline và chuyển sang thiết bị
+    
+    quantize: 'int8' để lượng tử hóa động UNet và text encoder (chỉ trên CPU); module
+              đã lượng tử hóa ở lần trước được đọc từ đĩa thay cho trọng số float32
+    """
+    from diffusers import StableDiffusionPipeline
+
+    if quantize is None:
+        pipeline = StableDiffusionPipeline.from_pretrained(model_id, torch_dtype=dtype)
+        return pipeline.to(device)
+
+    from quantization import load_quantized_components, quantize_pipeline
+
+    # Lấy thư mục trọng số thật (snapshot đã tải) để module lượng tử hóa gắn với đúng trọng số này
+    model_dir = model_id if os.path.isdir(model_id) else StableDiffusionPipeline.download(model_id)
+    components = load_quantized_components(model_id, quantize, model_dir=model_dir)
+    if components:
+        print(f"Dùng lại module đã lượng tử hóa: {', '.join(components)}")
+    pipeline = StableDiffusionPipeline.from_pretrained(model_dir, torch_dtype=dtype, **components)
+    quantize_pipeline(pipeline, model_id, quantize, model_dir=model_dir)
+    return pipeline.to(device)
+
+
+def derive_img2img_pipeline(pipeline):
+    """Tạo pipeline img2img dùng chung UNet/VAE/text encoder với pipeline đã tải (không tải lại trọng số)"""
+    from diffusers import AutoPipelineForImage2Image
+
+    from schedulers import share_scheduler_state
+
+    img2img = AutoPipelineForImage2Image.from_pipe(pipeline)
+    # from_pipe dùng scheduler hiện tại (có thể đã đổi theo preset); scheduler gốc lấy từ pipeline nguồn
+    share_scheduler_state(img2img, pipeline)
+    return img2img
+
+
+def _warm_up_pipeline(pipeline):
+    """Chạy thử một bước ở độ phân giải rất nhỏ để khởi tạo kernel và bộ nhớ"""
+    pipeline("", num_inference_steps=1, height=64, width=64, output_type="latent")
+
+
+def module_bytes(module):
+    """Dung lượng (byte) các tensor trong state_dict của module, kể cả trọng số int8 đã đóng gói"""
+    total = 0
+    for value in module.state_dict().values():
+        for tensor in value if isinstance(value, tuple) else (value,):
+            if hasattr(tensor, "element_size"):
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def estimate_pipeline_bytes(pipeline):
+    """Ước lượng dung lượng bộ nhớ (byte) của tham số và buffer trong pipeline"""
+    return sum(
+        module_bytes(component)
+        for component in getattr(pipeline, "components", {}).values()
+        if hasattr(component, "state_dict")
+    )
+
+
+class ModelRegistry:
+    """
+    Bộ nhớ đệm LRU cho các pipeline đã tải
+    
+    max_memory_mb: Giới hạn tổng dung lượng các pipeline (MB), None = không giới hạn
+    loader: Hàm tải pipeline loader(model_id, device, dtype)
+    warm_up: Hàm chạy thử pipeline ngay sau khi tải, None = bỏ qua
+    """
+    def __init__(self, max_memory_mb=None, loader=_load_pipeline, warm_up=_warm_up_pipeline):
+        self.max_memory_mb = max_memory_mb
+        self.loader = loader
+        self.warm_up = warm_up
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, model_id, device, dtype, quantize=None):
+        """Trả về pipeline cho (model_id, device, dtype, quantize), tải nếu chưa có"""
+        key = (model_id, str(device), str(dtype), quantize)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                print(f"Dùng lại mô hình đã tải: {model_id} ({device})")
+                return self._entries[key]["pipeline"]
+
+            print(f"Đang tải mô hình {model_id}...")
+            start = time.perf_counter()
+            if quantize is None:
+                pipeline = self.loader(model_id, device, dtype)
+            else:
+                pipeline = self.loader(model_id, device, dtype, quantize=quantize)
+            if self.warm_up is not None:
+                try:
+                    self.warm_up(pipeline)
+                except Exception as e:
+                    print(f"Bỏ qua bước chạy thử mô hình: {e}")
+            print(f"Đã tải xong mô hình sau {time.perf_counter() - start:.1f} giây")
+
+            self._entries[key] = {
+                "pipeline": pipeline,
+                "bytes": estimate_pipeline_bytes(pipeline),
+            }
+            self._evict(keep=key)
+            return pipeline
+
+    def _evict(self, keep=None):
+        """Giải phóng các pipeline ít dùng nhất cho tới khi nằm trong giới hạn bộ nhớ"""
+        if self.max_memory_mb is None:
+            return
+        limit = self.max_memory_mb * 1024 * 1024
+        for key in list(self._entries):
+            if self.memory_usage() <= limit:
+                break
+            if key != keep:
+                print(f"Giải phóng mô hình ít dùng: {key[0]} ({key[1]})")
+                self._drop(key)
+
+    def _drop(self, key):
+        device = key[1]
+        del self._entries[key]
+        gc.collect()
+        if device.startswith("cuda"):
+            import torch
+            torch.cuda.empty_cache()
+
+    def unload(self, model_id=None, device=None, dtype=None):
+        """
+        Giải phóng các pipeline khớp với điều kiện (None = khớp mọi giá trị)
+        
+        Trả về số pipeline đã giải phóng.
+        """
+        with self._lock:
+            matched = [
+                key for key in self._entries
+                if (model_id is None or key[0] == model_id)
+                and (device is None or key[1] == str(device))
+                and (dtype is None or key[2] == str(dtype))
+            ]
+            for key in matched:
+                self._drop(key)
+            return len(matched)
+
+    def memory_usage(self):
+        """Tổng dung lượng ước lượng (byte) của các pipeline đang giữ"""
+        return sum(entry["bytes"] for entry in self._entries.values())
+
+    def loaded(self):
+        """Danh sách khóa (model_id, device, dtype, quantize) đang được giữ, từ cũ tới mới"""
+        return list(self._entries)
+
+
+_default_registry = None
+
+
+def get_registry():
+    """
+    Sổ đăng ký mặc định của tiến trình
+    
+    Giới hạn bộ nhớ lấy từ biến môi trường VIDEO_AI_MODEL_MEMORY_MB nếu có.
+    """
+    global _default_registry
+    if _default_registry is None:
+        budget = os.environ.get("VIDEO_AI_MODEL_MEMORY_MB")
+        _default_registry = ModelRegistry(max_memory_mb=float(budget) if budget else None)
+    return _default_registry
@@ -0,0 +1,84 @@
+"""
+Bộ nhớ đệm embedding của prompt dùng chung trong toàn tiến trình
+
+Text encoder (CLIP) chỉ cần chạy một lần cho mỗi prompt thay vì một lần cho
+mỗi khung hình. Embedding của prompt và embedding "không điều kiện" (negative)
+được giữ trong bộ nhớ theo khóa (mô hình, thiết bị, dtype, chế độ lượng tử hóa,
+dtype autocast, prompt) và dùng lại cho mọi khung hình, mọi job trong chế độ batch / server.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+
+class PromptEmbeddingCache:
+    """
+    Bộ nhớ đệm LRU cho cặp (prompt_embeds, negative_prompt_embeds)
+
+    max_entries: Số prompt tối đa được giữ lại; 0 = không lưu (luôn chạy text encoder)
+    """
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, pipeline, model_id, prompt, device, dtype, quantize=None, autocast_dtype=None):
+        """
+        Trả về (prompt_embeds, negative_prompt_embeds) của prompt, chạy text encoder nếu chưa có
+
+        quantize: Chế độ lượng tử hóa của text encoder (None = không lượng tử hóa)
+        autocast_dtype: dtype autocast khi chạy text encoder (None = không autocast)
+        """
+        key = (model_id, str(device), str(dtype), quantize, str(autocast_dtype), prompt)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        import torch
+
+        with torch.no_grad():
+            embeds = pipeline.encode_prompt(
+                prompt,
+                device,
+                num_images_per_prompt=1,
+                do_classifier_free_guidance=True
+            )
+        embeds = (embeds[0], embeds[1])
+
+        with self._lock:
+            if self.max_entries > 0:
+                self._entries[key] = embeds
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return embeds
+
+    def clear(self):
+        """Xóa toàn bộ embedding đã lưu"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Số lần trúng / trượt bộ nhớ đệm"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+_default_cache = None
+
+
+def get_prompt_cache():
+    """
+    Bộ nhớ đệm embedding dùng chung của tiến trình
+
+    Số prompt tối đa đọc từ biến môi trường VIDEO_AI_PROMPT_CACHE_SIZE (mặc định: 64).
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = PromptEmbeddingCache(int(os.environ.get("VIDEO_AI_PROMPT_CACHE_SIZE", 64)))
+    return _default_cache
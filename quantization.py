@@ -0,0 +1,133 @@
+"""
+Lượng tử hóa động int8 cho UNet và text encoder khi chạy trên CPU
+
+Các lớp Linear (gồm cả phép chiếu q/k/v/out của attention) được chuyển sang
+trọng số int8, activation được lượng tử hóa động lúc chạy. Module đã lượng tử
+hóa được lưu xuống đĩa theo mô hình để các lần khởi động sau không phải lượng
+tử hóa lại. Tên file gồm dấu vân tay của trọng số gốc (weights_fingerprint) nên khi
+trọng số trong thư mục mô hình thay đổi, module cũ không còn được đọc lại.
+"""
+import hashlib
+import os
+import warnings
+
+from model_registry import module_bytes
+
+QUANTIZE_MODES = ("int8",)
+QUANTIZED_COMPONENTS = ("unet", "text_encoder")
+
+
+def default_cache_dir():
+    """Thư mục lưu module đã lượng tử hóa (đổi bằng biến môi trường VIDEO_AI_QUANTIZED_DIR)"""
+    return os.environ.get(
+        "VIDEO_AI_QUANTIZED_DIR", os.path.join(os.path.expanduser("~"), ".cache", "video_ai", "quantized")
+    )
+
+
+def weights_fingerprint(model_dir, component):
+    """
+    Dấu vân tay trọng số của một thành phần trong thư mục mô hình (None nếu không có thư mục)
+
+    Tính từ đường dẫn thật, kích thước và thời điểm sửa của từng file trong model_dir/component.
+    Với snapshot của Hugging Face Hub, đường dẫn thật là blob đặt tên theo hash nội dung.
+    """
+    directory = os.path.join(model_dir, component) if model_dir else None
+    if directory is None or not os.path.isdir(directory):
+        return None
+    digest = hashlib.sha1()
+    for root, _, files in sorted(os.walk(directory)):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            real = os.path.realpath(path)
+            stat = os.stat(real)
+            digest.update(f"{os.path.relpath(path, directory)}|{real}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:12]
+
+
+def _cache_path(cache_dir, model_id, component, mode, model_dir=None):
+    import torch
+
+    # Định dạng module đã lượng tử hóa phụ thuộc phiên bản torch nên đưa vào tên file
+    model_cache = os.path.join(cache_dir, model_id.strip("/\\").replace("/", "--"))
+    name = f"{component}-{mode}-torch{torch.__version__.split('+')[0]}"
+    fingerprint = weights_fingerprint(model_dir, component)
+    if fingerprint is not None:
+        name += f"-{fingerprint}"
+    return os.path.join(model_cache, f"{name}.pt")
+
+
+def is_quantized(module):
+    """Module đã chứa lớp Linear lượng tử hóa động hay chưa"""
+    from torch.ao.nn.quantized.dynamic import Linear as DynamicQuantizedLinear
+
+    return any(isinstance(m, DynamicQuantizedLinear) for m in module.modules())
+
+
+def quantize_module(module, mode="int8"):
+    """Lượng tử hóa động các lớp Linear của module (thay tại chỗ), trả về module"""
+    if mode not in QUANTIZE_MODES:
+        raise ValueError(f"Chế độ lượng tử hóa không hợp lệ: {mode} (chọn một trong {', '.join(QUANTIZE_MODES)})")
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+
+    with warnings.catch_warnings():
+        # torch.ao.quantization đã được đánh dấu deprecated nhưng vẫn là cách không cần thư viện ngoài
+        warnings.simplefilter("ignore")
+        return quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def load_quantized_components(model_id, mode="int8", cache_dir=None, model_dir=None):
+    """
+    Đọc các module đã lượng tử hóa của model_id từ đĩa, trả về dict {tên thành phần: module}
+
+    model_dir: Thư mục trọng số gốc của mô hình; chỉ đọc module lượng tử hóa từ đúng các trọng số này
+    """
+    import torch
+
+    cache_dir = cache_dir or default_cache_dir()
+    components = {}
+    for name in QUANTIZED_COMPONENTS:
+        path = _cache_path(cache_dir, model_id, name, mode, model_dir)
+        if os.path.exists(path):
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    components[name] = torch.load(path, weights_only=False)
+            except Exception as e:
+                print(f"Bỏ qua file lượng tử hóa hỏng '{path}': {e}")
+    return components
+
+
+def quantize_pipeline(pipeline, model_id=None, mode="int8", cache_dir=None, model_dir=None):
+    """
+    Lượng tử hóa UNet và text encoder của pipeline (bỏ qua thành phần đã lượng tử hóa)
+
+    model_id: Nếu có, module vừa lượng tử hóa được lưu vào cache_dir để lần sau dùng lại
+    model_dir: Thư mục trọng số gốc của pipeline, dùng làm dấu vân tay trong tên file lưu
+    Trả về dict {tên thành phần: (số byte float32, số byte int8)} của các thành phần vừa lượng tử hóa.
+    """
+    import torch
+
+    cache_dir = cache_dir or default_cache_dir()
+    report = {}
+    for name in QUANTIZED_COMPONENTS:
+        module = getattr(pipeline, name, None)
+        if module is None or is_quantized(module):
+            continue
+        before = module_bytes(module)
+        quantize_module(module, mode)
+        report[name] = (before, module_bytes(module))
+        print(f"Đã lượng tử hóa {name}: {before / 2**20:.1f} MB -> {report[name][1] / 2**20:.1f} MB")
+        if model_id is not None:
+            path = _cache_path(cache_dir, model_id, name, mode, model_dir)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            torch.save(module, tmp_path)
+            os.replace(tmp_path, path)
+    return report
+
+
+def add_quantize_arguments(parser):
+    """Thêm tham số lượng tử hóa vào argparse parser"""
+    parser.add_argument("--quantize", choices=QUANTIZE_MODES,
+                        help="Lượng tử hóa động UNet và text encoder trên CPU, lưu lại để lần sau khởi động nhanh hơn (tùy chọn).")
@@ -0,0 +1,98 @@
+"""
+Chọn scheduler, số bước khử nhiễu và guidance scale cho pipeline Stable Diffusion
+
+Scheduler được thay trực tiếp trên pipeline đã tải (tạo từ config của scheduler
+gốc), không cần tải lại mô hình. Các preset gom sẵn bộ tham số theo mức cân
+bằng giữa chất lượng và tốc độ.
+"""
+import weakref
+
+# Tên scheduler -> (tên lớp trong diffusers, tham số bổ sung cho from_config)
+SCHEDULERS = {
+    "default": None,
+    "ddim": ("DDIMScheduler", {}),
+    "pndm": ("PNDMScheduler", {}),
+    "euler": ("EulerDiscreteScheduler", {}),
+    "euler-a": ("EulerAncestralDiscreteScheduler", {}),
+    "dpm++": ("DPMSolverMultistepScheduler", {"algorithm_type": "dpmsolver++"}),
+    "dpm++-karras": ("DPMSolverMultistepScheduler", {"algorithm_type": "dpmsolver++", "use_karras_sigmas": True}),
+    "unipc": ("UniPCMultistepScheduler", {}),
+    # LCM chỉ cho kết quả tốt với mô hình / LoRA đã chưng cất theo LCM (4-8 bước, guidance ~1)
+    "lcm": ("LCMScheduler", {}),
+}
+
+# Preset chất lượng / tốc độ: None = giữ mặc định của mô hình
+PRESETS = {
+    "draft": {"scheduler": "dpm++", "steps": 12, "guidance_scale": 6.0},
+    "standard": {"scheduler": "dpm++", "steps": 25, "guidance_scale": 7.5},
+    "final": {"scheduler": "dpm++-karras", "steps": 40, "guidance_scale": 7.5},
+}
+
+# Scheduler gốc của mỗi pipeline, để có thể quay lại "default"
+_original_schedulers = weakref.WeakKeyDictionary()
+_active_schedulers = weakref.WeakKeyDictionary()
+
+
+def resolve_sampling(preset=None, scheduler=None, steps=None, guidance_scale=None):
+    """
+    Gộp preset với các tham số chỉ định riêng (tham số riêng được ưu tiên)
+
+    Trả về dict {'scheduler', 'steps', 'guidance_scale'}; giá trị None nghĩa là
+    dùng mặc định của mô hình.
+    """
+    if preset is not None and preset not in PRESETS:
+        raise ValueError(f"Preset không hợp lệ: {preset} (chọn một trong {', '.join(PRESETS)})")
+    sampling = dict(PRESETS[preset]) if preset is not None else {"scheduler": None, "steps": None, "guidance_scale": None}
+    if scheduler is not None:
+        sampling["scheduler"] = scheduler
+    if steps is not None:
+        sampling["steps"] = int(steps)
+    if guidance_scale is not None:
+        sampling["guidance_scale"] = float(guidance_scale)
+    if sampling["scheduler"] == "default":
+        sampling["scheduler"] = None
+    if sampling["scheduler"] is not None and sampling["scheduler"] not in SCHEDULERS:
+        raise ValueError(f"Scheduler không hợp lệ: {sampling['scheduler']} (chọn một trong {', '.join(SCHEDULERS)})")
+    return sampling
+
+
+def apply_scheduler(pipeline, name):
+    """
+    Đặt scheduler cho pipeline đã tải; name None hoặc 'default' = scheduler gốc của mô hình
+
+    Gọi trong pipeline_lock vì scheduler được dùng chung giữa các luồng.
+    """
+    name = name or "default"
+    if not hasattr(pipeline, "scheduler") or _active_schedulers.get(pipeline, "default") == name:
+        return
+    original = _original_schedulers.setdefault(pipeline, pipeline.scheduler)
+    if name == "default":
+        pipeline.scheduler = original
+    else:
+        import diffusers
+
+        class_name, options = SCHEDULERS[name]
+        pipeline.scheduler = getattr(diffusers, class_name).from_config(original.config, **options)
+    _active_schedulers[pipeline] = name
+
+
+def share_scheduler_state(pipeline, source):
+    """
+    Ghi nhận pipeline dẫn xuất từ source (from_pipe, dùng chung scheduler hiện tại của source)
+
+    Pipeline dẫn xuất nhận scheduler gốc và tên scheduler đang dùng của source, để
+    'default' trả về đúng scheduler của mô hình thay vì scheduler đã đổi lúc dẫn xuất.
+    """
+    if source in _original_schedulers:
+        _original_schedulers[pipeline] = _original_schedulers[source]
+        _active_schedulers[pipeline] = _active_schedulers.get(source, "default")
+
+
+def add_sampling_arguments(parser):
+    """Thêm các tham số --preset, --scheduler, --steps, --guidance-scale vào argparse parser"""
+    parser.add_argument("--preset", choices=list(PRESETS),
+                        help="Preset chất lượng/tốc độ: draft, standard, final (mặc định: theo mô hình).")
+    parser.add_argument("--scheduler", choices=list(SCHEDULERS),
+                        help="Scheduler khử nhiễu, ví dụ dpm++, euler-a, lcm (mặc định: theo mô hình).")
+    parser.add_argument("--steps", type=int, help="Số bước khử nhiễu (mặc định: theo preset hoặc mô hình).")
+    parser.add_argument("--guidance-scale", type=float, help="Guidance scale (mặc định: theo preset hoặc mô hình).")
@@ -0,0 +1,168 @@
+"""
+Mã hóa video theo đoạn song song trên nhiều tiến trình
+
+Dòng thời gian được chia thành các đoạn độc lập: mỗi đoạn gồm phần giữ hình của
+một keyframe và hiệu ứng chuyển sang keyframe kế tiếp. Các đoạn được mã hóa ở một
+process pool (mỗi tiến trình một bộ ghi của cùng bộ mã hóa, cùng tham số) rồi được
+nối không mã hóa lại bằng concat demuxer của ffmpeg (-c copy); mốc thời gian của
+mỗi đoạn nối tiếp đoạn trước nên video ghép có cùng số frame và thời lượng như khi
+ghi tuần tự.
+"""
+import concurrent.futures
+import copy
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from transitions import TransitionRenderer
+from video_writers import FFmpegEncoder, find_ffmpeg, get_encoder
+
+# Process pool dùng chung giữa các lần ghi video: tạo tiến trình bằng spawn tốn thời gian
+# (mỗi tiến trình import lại module chính), nên chỉ trả một lần cho cả phiên làm việc
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def segment_frame_counts(duration_per_image, transition_duration, fps, has_next):
+    """Số frame (giữ hình, chuyển cảnh) của đoạn một hình; has_next = False với hình cuối cùng"""
+    display_frames = int(duration_per_image * fps)
+    if transition_duration > 0 and has_next:
+        transition_frames = int(transition_duration * fps)
+        return max(display_frames - transition_frames, 0), transition_frames
+    return display_frames, 0
+
+
+def write_image_segment(video, img_current, img_next, duration_per_image, transition_duration, fps, renderer,
+                        timed=None):
+    """
+    Ghi đoạn video của một hình: các frame giữ nguyên và hiệu ứng chuyển sang hình kế tiếp
+
+    img_next: Hình ảnh kế tiếp, None nếu là hình cuối cùng (không có chuyển cảnh)
+    renderer: TransitionRenderer dùng để sinh frame chuyển cảnh
+    timed: Hàm bọc iterator frame chuyển cảnh (ví dụ để đo thời gian), None = không bọc
+    """
+    hold_frames, transition_frames = segment_frame_counts(
+        duration_per_image, transition_duration, fps, img_next is not None
+    )
+    video.write_repeated(img_current, hold_frames)
+    if transition_frames:
+        # Thêm frame chuyển cảnh, dùng chung một buffer đầu ra
+        blended_frames = renderer.frames(img_current, img_next, transition_frames)
+        if timed is not None:
+            blended_frames = timed(blended_frames)
+        for blended in blended_frames:
+            video.write(blended)
+
+
+def _init_worker():
+    import cv2
+    # Mỗi tiến trình mã hóa một đoạn; OpenCV đa luồng trong từng tiến trình chỉ làm tranh chấp lõi CPU
+    cv2.setNumThreads(1)
+
+
+def get_pool(workers):
+    """Process pool dùng chung với workers tiến trình (tạo lại nếu số tiến trình thay đổi)"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = concurrent.futures.ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    """Dừng các tiến trình mã hóa của pool dùng chung"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def _encode_segment(path, img_current, img_next, duration_per_image, transition_duration, fps, frame_size,
+                    transition, encoder):
+    """Mã hóa một đoạn ra file riêng (chạy trong tiến trình con)"""
+    video = encoder.open(path, fps, frame_size)
+    try:
+        write_image_segment(video, img_current, img_next, duration_per_image, transition_duration, fps,
+                            TransitionRenderer(transition))
+    finally:
+        video.release()
+    return path
+
+
+def concat_segments(paths, output_path, ffmpeg=None):
+    """Nối các file đoạn (cùng codec, kích thước, fps) thành một video bằng ffmpeg, không mã hóa lại"""
+    ffmpeg = ffmpeg or find_ffmpeg()
+    if ffmpeg is None:
+        raise RuntimeError("Không tìm thấy ffmpeg (cài ffmpeg hoặc đặt biến môi trường FFMPEG_BINARY)")
+    list_path = os.path.join(os.path.dirname(paths[0]), "segments.txt")
+    with open(list_path, "w") as f:
+        f.write("ffconcat version 1.0\n")
+        for path in paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+    command = [ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+               "-c", "copy", str(output_path)]
+    subprocess.run(command, check=True)
+
+
+def available_cpus():
+    """Số lõi CPU tiến trình được phép dùng"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def encode_segments(images, output_path, duration_per_image, transition_duration, fps, frame_size,
+                    transition="linear", workers=None, ffmpeg=None, encoder=None):
+    """
+    Ghi video từ các hình (cùng kích thước frame_size) bằng cách mã hóa song song từng đoạn
+
+    workers: Số tiến trình mã hóa (None = số lõi CPU)
+    ffmpeg: Đường dẫn tới ffmpeg dùng để nối các đoạn (mặc định: find_ffmpeg())
+    encoder: Tên bộ mã hóa hoặc đối tượng từ video_writers.get_encoder (None = 'opencv')
+
+    Tiến trình con được tạo bằng 'spawn' (không fork tiến trình đang giữ torch và các luồng
+    của nó) và được giữ lại cho các lần sau (get_pool). Trả về số đoạn đã mã hóa.
+    """
+    ffmpeg = ffmpeg or find_ffmpeg()
+    if ffmpeg is None:
+        raise RuntimeError("Không tìm thấy ffmpeg (cài ffmpeg hoặc đặt biến môi trường FFMPEG_BINARY)")
+    # Đoạn không có frame nào (thời lượng quá ngắn) không được tạo file
+    segments = [
+        (images[i], images[i + 1] if i < len(images) - 1 else None) for i in range(len(images))
+        if sum(segment_frame_counts(duration_per_image, transition_duration, fps, i < len(images) - 1)) > 0
+    ]
+    if not segments:
+        raise ValueError("Video không có frame nào (thời lượng mỗi hình quá ngắn)")
+    if encoder is None or isinstance(encoder, str):
+        encoder = get_encoder(encoder or "opencv")
+    if isinstance(encoder, FFmpegEncoder) and not encoder.threads:
+        # Như OpenCV ở _init_worker: mỗi ffmpeg một luồng, song song giữa các đoạn
+        encoder = copy.copy(encoder)
+        encoder.threads = 1
+    pool = get_pool(max(1, workers or available_cpus()))
+    temp_dir = tempfile.mkdtemp(prefix="segments_")
+    try:
+        futures = [
+            pool.submit(_encode_segment, os.path.join(temp_dir, f"{i:05d}.mp4"), img_current, img_next,
+                        duration_per_image, transition_duration, fps, tuple(frame_size), transition, encoder)
+            for i, (img_current, img_next) in enumerate(segments)
+        ]
+        paths = [future.result() for future in futures]
+        concat_segments(paths, output_path, ffmpeg)
+    except concurrent.futures.process.BrokenProcessPool:
+        # Tiến trình con chết (ví dụ module chính không import lại được): bỏ pool để lần sau tạo mới
+        shutdown_pool()
+        raise
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return len(segments)
@@ -0,0 +1,307 @@
+"""
+Dịch vụ HTTP cục bộ sinh video, giữ mô hình đã tải giữa các job
+
+Các endpoint (JSON):
+    POST   /jobs               Gửi job mới (các trường giống một dòng manifest batch), trả về ngay id của job
+    GET    /jobs               Danh sách job
+    GET    /jobs/<id>          Trạng thái và tiến độ (số khung hình đã sinh / tổng số)
+    POST   /jobs/<id>/cancel   Hủy job (DELETE /jobs/<id> cũng được)
+    GET    /jobs/<id>/result   Tải file video khi job đã xong
+
+Các job đang chờ có cùng độ phân giải được gộp lại để dùng chung lô khử nhiễu.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from batch_runner import group_key, normalize_job, run_batch
+from schedulers import add_sampling_arguments
+from cpu_optimizations import add_cpu_arguments, cpu_optimizations_from_args
+from instrumentation import add_report_arguments, report_sinks_from_args
+from quantization import add_quantize_arguments
+from video_writers import add_encoder_arguments, encoder_from_args
+
+# Các trạng thái của job
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class Job:
+    """Một yêu cầu sinh video trong hàng đợi của server"""
+    def __init__(self, params, output_dir):
+        self.id = uuid.uuid4().hex[:12]
+        self.params = normalize_job(dict(params, id=self.id, output=os.path.join(output_dir, f"{self.id}.mp4")))
+        self.status = QUEUED
+        self.frames_done = 0
+        self.error = None
+        self.cancel_requested = False
+        self.created = time.time()
+        self.finished = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "text": self.params["text"],
+            "frames_done": self.frames_done,
+            "frames_total": self.params["frames"],
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+
+class GenerationServer:
+    """
+    Hàng đợi job sinh video quanh một VideoGenerator dùng chung
+    
+    generator: VideoGenerator đã tải mô hình (có thể dùng pipeline giả lập để chạy offline)
+    output_dir: Thư mục lưu video kết quả
+    max_concurrency: Số nhóm job được xử lý cùng lúc. Các worker dùng chung generator, mỗi worker có
+                     trạng thái lượt chạy riêng (video_generator.RunContext); khử nhiễu vẫn tuần tự
+                     qua pipeline_lock, chỉ phần ghi video của một nhóm chạy song song với khử nhiễu
+                     của nhóm khác
+    batch_size: Số khung hình tối đa trong một lần khử nhiễu
+    max_merge: Số job đang chờ tối đa được gộp vào một nhóm
+    vfr: Ghi video tốc độ khung hình thay đổi (cần ffmpeg)
+    fps: Số khung hình mỗi giây của video khi job không có trường fps
+    encoder: Bộ mã hóa video: tên hoặc đối tượng từ video_writers.get_encoder (None = 'opencv')
+    """
+    def __init__(self, generator, output_dir="server_output", max_concurrency=1, batch_size=4, max_merge=4, vfr=False,
+                 fps=24, encoder=None):
+        self.generator = generator
+        self.output_dir = output_dir
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.batch_size = batch_size
+        self.max_merge = max(1, int(max_merge))
+        self.vfr = vfr
+        self.fps = fps
+        self.encoder = encoder
+        self.jobs = {}
+        self._pending = []
+        self._wakeup = None
+        self._workers = []
+        os.makedirs(output_dir, exist_ok=True)
+
+    # ----- Hàng đợi -----
+
+    def submit(self, params):
+        """Thêm job vào hàng đợi và trả về ngay (không chờ sinh video)"""
+        job = Job(params, self.output_dir)
+        self.jobs[job.id] = job
+        self._pending.append(job)
+        self._wakeup.set()
+        return job
+
+    def cancel(self, job_id):
+        """Hủy job: job đang chờ bị bỏ khỏi hàng đợi, job đang chạy dừng sau lô khung hình hiện tại"""
+        job = self.jobs[job_id]
+        if job.status == QUEUED:
+            self._pending.remove(job)
+            job.status = CANCELLED
+            job.finished = time.time()
+        elif job.status == RUNNING:
+            job.cancel_requested = True
+        return job
+
+    def _take_group(self):
+        """Lấy job đầu hàng đợi cùng các job đang chờ tương thích để chạy chung"""
+        first = self._pending.pop(0)
+        group = [first]
+        for job in list(self._pending):
+            if len(group) >= self.max_merge:
+                break
+            if group_key(job.params) == group_key(first.params):
+                self._pending.remove(job)
+                group.append(job)
+        return group
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            group = self._take_group()
+            for job in group:
+                job.status = RUNNING
+            await loop.run_in_executor(None, self._run_group, group)
+
+    def _run_group(self, group):
+        """Chạy một nhóm job trong luồng riêng (không chặn vòng lặp asyncio)"""
+        by_id = {job.id: job for job in group}
+
+        def on_progress(params, frames_done):
+            by_id[params["id"]].frames_done = frames_done
+
+        try:
+            results = run_batch(
+                self.generator,
+                [job.params for job in group],
+                batch_size=self.batch_size,
+                vfr=self.vfr,
+                fps=self.fps,
+                encoder=self.encoder,
+                on_progress=on_progress,
+                is_cancelled=lambda params: by_id[params["id"]].cancel_requested
+            )
+        except Exception as e:
+            results = [{"id": job.id, "status": f"failed: {e}"} for job in group]
+
+        for result in results:
+            job = by_id[result["id"]]
+            if result["status"] == "done":
+                job.status = DONE
+            elif result["status"] == "cancelled":
+                job.status = CANCELLED
+            else:
+                job.status = FAILED
+                job.error = result["status"]
+            job.finished = time.time()
+
+    async def start(self):
+        """Khởi động các worker xử lý hàng đợi"""
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrency)]
+
+    # ----- HTTP -----
+
+    async def handle(self, reader, writer):
+        """Xử lý một kết nối HTTP/1.1 (mỗi kết nối một request)"""
+        try:
+            request_line = (await reader.readline()).decode("latin-1").strip()
+            if not request_line:
+                return
+            method, path, _ = request_line.split(" ", 2)
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0))
+            body = await reader.readexactly(length) if length else b""
+            await self._route(method, path.split("?", 1)[0], body, writer)
+        except Exception as e:
+            await self._send_json(writer, 500, {"error": str(e)})
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body, writer):
+        parts = [part for part in path.split("/") if part]
+        if parts[:1] != ["jobs"]:
+            return await self._send_json(writer, 404, {"error": "Không tìm thấy"})
+
+        if len(parts) == 1:
+            if method == "POST":
+                try:
+                    job = self.submit(json.loads(body or b"{}"))
+                except (ValueError, TypeError) as e:
+                    return await self._send_json(writer, 400, {"error": str(e)})
+                return await self._send_json(writer, 202, job.to_dict())
+            if method == "GET":
+                return await self._send_json(writer, 200, [job.to_dict() for job in self.jobs.values()])
+            return await self._send_json(writer, 405, {"error": "Phương thức không được hỗ trợ"})
+
+        job = self.jobs.get(parts[1])
+        if job is None:
+            return await self._send_json(writer, 404, {"error": "Không tìm thấy job"})
+
+        if len(parts) == 2 and method == "GET":
+            return await self._send_json(writer, 200, job.to_dict())
+        if (len(parts) == 2 and method == "DELETE") or (parts[2:] == ["cancel"] and method == "POST"):
+            return await self._send_json(writer, 200, self.cancel(job.id).to_dict())
+        if parts[2:] == ["result"] and method == "GET":
+            if job.status != DONE:
+                return await self._send_json(writer, 409, {"error": f"Job chưa xong (trạng thái: {job.status})"})
+            return await self._send_file(writer, job.params["output"])
+        return await self._send_json(writer, 404, {"error": "Không tìm thấy"})
+
+    async def _send(self, writer, status, content_type, length):
+        reason = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+                  405: "Method Not Allowed", 409: "Conflict", 500: "Internal Server Error"}.get(status, "")
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {length}\r\nConnection: close\r\n\r\n".encode("latin-1")
+        )
+
+    async def _send_json(self, writer, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        await self._send(writer, status, "application/json; charset=utf-8", len(data))
+        writer.write(data)
+        await writer.drain()
+
+    async def _send_file(self, writer, path):
+        await self._send(writer, 200, "video/mp4", os.path.getsize(path))
+        with open(path, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                writer.write(chunk)
+                await writer.drain()
+
+
+async def serve(server, host="127.0.0.1", port=8000):
+    """Chạy server HTTP cho tới khi bị dừng"""
+    await server.start()
+    http_server = await asyncio.start_server(server.handle, host, port)
+    print(f"Server đang chạy tại http://{host}:{port}")
+    async with http_server:
+        await http_server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dịch vụ HTTP sinh video từ mô tả văn bản.")
+    parser.add_argument("--host", default="127.0.0.1", help="Địa chỉ lắng nghe (mặc định: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8000, help="Cổng lắng nghe (mặc định: 8000).")
+    parser.add_argument("--output-dir", default="server_output", help="Thư mục lưu video kết quả.")
+    parser.add_argument("--concurrency", type=int, default=1, help="Số nhóm job xử lý cùng lúc; khử nhiễu vẫn tuần tự, chỉ ghi video chạy song song (mặc định: 1).")
+    parser.add_argument("--batch-size", type=int, default=4, help="Số khung hình sinh chung một lần khử nhiễu.")
+    parser.add_argument("--max-merge", type=int, default=4, help="Số job đang chờ tối đa được gộp vào một lô.")
+    parser.add_argument("--device", choices=["cpu", "cuda"], help="Thiết bị xử lý ('cpu' hoặc 'cuda').")
+    parser.add_argument("--model", default="stabilityai/stable-diffusion-2-1-base", help="ID mô hình Stable Diffusion.")
+    parser.add_argument("--vfr", action="store_true", help="Ghi video tốc độ khung hình thay đổi (cần ffmpeg).")
+    parser.add_argument("--fps", type=int, default=24, help="Số khung hình mỗi giây khi job không chỉ định fps (mặc định: 24).")
+    parser.add_argument("--cache-dir", help="Thư mục bộ nhớ đệm keyframe (tùy chọn).")
+    add_sampling_arguments(parser)
+    add_cpu_arguments(parser)
+    add_quantize_arguments(parser)
+    parser.add_argument("--memory-budget-mb", type=float, help="Ngân sách bộ nhớ (MB) cho chế độ độ phân giải cao (tùy chọn).")
+    parser.add_argument("--profile-memory", action="store_true", help="In bộ nhớ đỉnh theo từng giai đoạn.")
+    add_encoder_arguments(parser)
+    add_report_arguments(parser)
+    args = parser.parse_args()
+
+    from video_generator import VideoGenerator
+    from keyframe_cache import KeyframeCache
+
+    cache = KeyframeCache(args.cache_dir) if args.cache_dir else None
+    generator = VideoGenerator(
+        model_id=args.model,
+        device=args.device,
+        keyframe_cache=cache,
+        preset=args.preset,
+        scheduler=args.scheduler,
+        steps=args.steps,
+        guidance_scale=args.guidance_scale,
+        cpu_optimizations=cpu_optimizations_from_args(args),
+        quantize=args.quantize,
+        memory_budget_mb=args.memory_budget_mb,
+        track_memory=args.profile_memory,
+        metrics_sinks=report_sinks_from_args(args)
+    )
+    server = GenerationServer(
+        generator,
+        output_dir=args.output_dir,
+        max_concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        max_merge=args.max_merge,
+        vfr=args.vfr,
+        fps=args.fps,
+        encoder=encoder_from_args(args)
+    )
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nĐã dừng server.")
@@ -0,0 +1,85 @@
+"""
+Sinh các frame chuyển cảnh giữa hai hình ảnh
+
+Hệ số chuyển cảnh (alpha) của cả đoạn được tính một lần bằng NumPy, các frame
+được ghi vào một buffer đầu ra dùng lại thay vì cấp phát mới cho từng frame.
+"""
+import cv2
+import numpy as np
+
+# Các kiểu chuyển cảnh được hỗ trợ
+TRANSITIONS = ("linear", "ease", "wipe", "zoom")
+
+
+def alpha_ramp(num_frames, kind="linear"):
+    """
+    Tính hệ số alpha (từ 0 đến 1) cho toàn bộ đoạn chuyển cảnh
+    
+    num_frames: Số frame chuyển cảnh
+    kind: 'linear' tuyến tính, các kiểu còn lại dùng đường cong ease-in/out
+    """
+    ramp = np.arange(num_frames, dtype=np.float64) / max(num_frames, 1)
+    if kind == "linear":
+        return ramp
+    # Đường cong smoothstep: chậm ở đầu và cuối, nhanh ở giữa
+    return ramp * ramp * (3.0 - 2.0 * ramp)
+
+
+class TransitionRenderer:
+    """
+    Bộ sinh frame chuyển cảnh dùng lại buffer giữa các frame và các đoạn chuyển cảnh
+    
+    kind: Kiểu chuyển cảnh ('linear', 'ease', 'wipe', 'zoom')
+    zoom: Mức phóng to hình hiện tại ở cuối đoạn chuyển cảnh kiểu 'zoom'
+    
+    Frame trả ra từ frames() là cùng một buffer, chỉ hợp lệ tới khi lấy frame
+    tiếp theo - cần ghi ngay vào video hoặc sao chép nếu muốn giữ lại.
+    """
+    def __init__(self, kind="linear", zoom=0.15):
+        if kind not in TRANSITIONS:
+            raise ValueError(f"Kiểu chuyển cảnh không hợp lệ: {kind} (hỗ trợ: {', '.join(TRANSITIONS)})")
+        self.kind = kind
+        self.zoom = zoom
+        self._out = None
+        self._warped = None
+
+    def _buffer(self, name, like):
+        buf = getattr(self, name)
+        if buf is None or buf.shape != like.shape or buf.dtype != like.dtype:
+            buf = np.empty_like(like)
+            setattr(self, name, buf)
+        return buf
+
+    def frames(self, img_a, img_b, num_frames):
+        """Sinh lần lượt num_frames frame chuyển từ img_a sang img_b"""
+        out = self._buffer("_out", img_a)
+        alphas = alpha_ramp(num_frames, self.kind)
+
+        if self.kind == "wipe":
+            # Quét từ trái sang phải: mỗi frame chỉ chép thêm phần cột mới của img_b
+            width = img_a.shape[1]
+            np.copyto(out, img_a)
+            edges = (alphas * width).astype(np.int64)
+            done = 0
+            for edge in edges:
+                if edge > done:
+                    out[:, done:edge] = img_b[:, done:edge]
+                    done = edge
+                yield out
+            return
+
+        if self.kind == "zoom":
+            # Phóng to dần hình hiện tại quanh tâm, đồng thời hòa trộn sang hình kế tiếp
+            warped = self._buffer("_warped", img_a)
+            height, width = img_a.shape[:2]
+            center = (width / 2, height / 2)
+            for alpha in alphas:
+                matrix = cv2.getRotationMatrix2D(center, 0, 1.0 + self.zoom * alpha)
+                cv2.warpAffine(img_a, matrix, (width, height), dst=warped, borderMode=cv2.BORDER_REFLECT)
+                cv2.addWeighted(warped, 1.0 - alpha, img_b, alpha, 0, dst=out)
+                yield out
+            return
+
+        for alpha in alphas:
+            cv2.addWeighted(img_a, 1.0 - alpha, img_b, alpha, 0, dst=out)
+            yield out
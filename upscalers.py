@@ -0,0 +1,190 @@
+"""
+Phóng to khung hình trước khi ghi video
+
+Cho phép khử nhiễu ở độ phân giải nhỏ (ví dụ 512) rồi phóng to keyframe lên độ
+phân giải video đầu ra. Có ba bộ phóng to:
+- lanczos: nội suy Lanczos của OpenCV, nhanh, mặc định
+- edge: Lanczos kèm làm sắc cạnh (unsharp mask chỉ ở vùng có cạnh, không khuếch đại nhiễu ở vùng phẳng)
+- learned: mô hình siêu phân giải cục bộ (TorchScript .pt hoặc OpenCV dnn_superres .pb),
+  chạy theo từng ô chồng lấn để giới hạn bộ nhớ
+"""
+import math
+import os
+import re
+
+import numpy as np
+
+UPSCALERS = ("lanczos", "edge", "learned")
+
+
+def _interpolation(src_size, size):
+    import cv2
+    # Thu nhỏ dùng INTER_AREA để không bị răng cưa, phóng to dùng Lanczos
+    if size[0] < src_size[0] and size[1] < src_size[1]:
+        return cv2.INTER_AREA
+    return cv2.INTER_LANCZOS4
+
+
+class LanczosUpscaler:
+    """Phóng to bằng nội suy Lanczos (thu nhỏ bằng INTER_AREA)"""
+    name = "lanczos"
+
+    def upscale(self, image, size):
+        """Đổi kích thước hình BGR về size (width, height)"""
+        import cv2
+        height, width = image.shape[:2]
+        if (width, height) == tuple(size):
+            return image
+        return cv2.resize(image, tuple(size), interpolation=_interpolation((width, height), size))
+
+
+class EdgeAwareUpscaler(LanczosUpscaler):
+    """
+    Lanczos kèm làm sắc cạnh
+
+    amount: Mức làm sắc (0 = giống lanczos)
+    sigma: Độ rộng Gaussian của unsharp mask (pixel ở độ phân giải đầu ra)
+    edge_threshold: Ngưỡng độ lớn gradient (0-255) từ đó mới làm sắc hoàn toàn
+    """
+    name = "edge"
+
+    def __init__(self, amount=0.6, sigma=1.2, edge_threshold=24):
+        self.amount = amount
+        self.sigma = sigma
+        self.edge_threshold = edge_threshold
+
+    def upscale(self, image, size):
+        import cv2
+        resized = super().upscale(image, size)
+        if resized is image or self.amount <= 0:
+            return resized
+        blurred = cv2.GaussianBlur(resized, (0, 0), self.sigma)
+        detail = resized.astype(np.float32) - blurred
+        # Trọng số làm sắc theo độ lớn gradient: vùng phẳng giữ nguyên, cạnh được làm sắc
+        gray = cv2.cvtColor(blurred, cv2.COLOR_BGR2GRAY)
+        gradient = cv2.magnitude(cv2.Sobel(gray, cv2.CV_32F, 1, 0), cv2.Sobel(gray, cv2.CV_32F, 0, 1))
+        weight = np.clip(gradient / self.edge_threshold, 0, 1)[..., None]
+        sharpened = resized + self.amount * weight * detail
+        return np.clip(sharpened, 0, 255).astype(np.uint8)
+
+
+class LearnedUpscaler(LanczosUpscaler):
+    """
+    Phóng to bằng mô hình siêu phân giải cục bộ, chạy theo từng ô
+
+    model_path: File mô hình. '.pb' dùng OpenCV dnn_superres (cần opencv-contrib-python),
+                tên file phải có dạng <thuật toán>_x<hệ số>.pb (ví dụ ESPCN_x4.pb);
+                file khác được đọc bằng torch.jit.load, nhận tensor RGB NCHW trong [0, 1]
+    scale: Hệ số phóng to của mô hình (None = lấy từ tên file, mặc định 4)
+    tile: Kích thước ô đầu vào (pixel); bộ nhớ đỉnh chỉ phụ thuộc kích thước ô
+    overlap: Số pixel chồng lấn giữa hai ô để không lộ đường nối
+    device: Thiết bị chạy mô hình TorchScript
+
+    Sau khi chạy mô hình, kết quả được đưa về đúng kích thước đầu ra bằng Lanczos.
+    """
+    name = "learned"
+
+    def __init__(self, model_path, scale=None, tile=256, overlap=16, device="cpu"):
+        if not model_path or not os.path.exists(model_path):
+            raise ValueError(f"Không tìm thấy mô hình phóng to: {model_path}")
+        match = re.search(r"([A-Za-z]+)_x(\d+)", os.path.basename(model_path))
+        self.model_path = model_path
+        self.scale = scale or (int(match.group(2)) if match else 4)
+        self.tile = tile
+        self.overlap = overlap
+        self.device = device
+        if model_path.endswith(".pb"):
+            import cv2
+            if not hasattr(cv2, "dnn_superres"):
+                raise ImportError("Mô hình .pb cần opencv-contrib-python (cv2.dnn_superres)")
+            if match is None:
+                raise ValueError("Tên file .pb phải có dạng <thuật toán>_x<hệ số>.pb, ví dụ ESPCN_x4.pb")
+            self._model = cv2.dnn_superres.DnnSuperResImpl_create()
+            self._model.readModel(model_path)
+            self._model.setModel(match.group(1).lower(), self.scale)
+            self._run_tile = self._model.upsample
+        else:
+            import torch
+            self._model = torch.jit.load(model_path, map_location=device).eval()
+            self._run_tile = self._run_torch_tile
+
+    def _run_torch_tile(self, tile):
+        import torch
+        rgb = np.ascontiguousarray(tile[..., ::-1])
+        with torch.inference_mode():
+            x = torch.from_numpy(rgb).to(self.device).permute(2, 0, 1)[None].float() / 255
+            y = self._model(x)[0].clamp(0, 1).mul(255).round().byte()
+        return y.permute(1, 2, 0).cpu().numpy()[..., ::-1]
+
+    def _upscale_tiled(self, image):
+        height, width = image.shape[:2]
+        scale, step = self.scale, max(self.tile - 2 * self.overlap, 1)
+        output = np.empty((height * scale, width * scale, 3), dtype=np.uint8)
+        for y in range(0, height, step):
+            for x in range(0, width, step):
+                # Ô đầu vào mở rộng thêm overlap mỗi phía, chỉ giữ phần lõi của kết quả
+                y0, x0 = max(y - self.overlap, 0), max(x - self.overlap, 0)
+                y1, x1 = min(y + step + self.overlap, height), min(x + step + self.overlap, width)
+                result = self._run_tile(np.ascontiguousarray(image[y0:y1, x0:x1]))
+                core_h, core_w = min(step, height - y), min(step, width - x)
+                top, left = (y - y0) * scale, (x - x0) * scale
+                output[y * scale:(y + core_h) * scale, x * scale:(x + core_w) * scale] = \
+                    result[top:top + core_h * scale, left:left + core_w * scale]
+        return output
+
+    def upscale(self, image, size):
+        height, width = image.shape[:2]
+        if size[0] <= width and size[1] <= height:
+            return super().upscale(image, size)
+        return super().upscale(self._upscale_tiled(image), size)
+
+
+def get_upscaler(name="lanczos", model_path=None, **kwargs):
+    """Tạo bộ phóng to theo tên ('lanczos', 'edge' hoặc 'learned' - cần model_path)"""
+    if name == "lanczos":
+        return LanczosUpscaler()
+    if name == "edge":
+        return EdgeAwareUpscaler(**kwargs)
+    if name == "learned":
+        return LearnedUpscaler(model_path, **kwargs)
+    raise ValueError(f"Bộ phóng to không hợp lệ: {name} (chọn một trong {', '.join(UPSCALERS)})")
+
+
+def fit_frame(image, size, upscaler=None):
+    """
+    Đưa hình BGR về đúng kích thước size (width, height)
+
+    Hình được phóng to / thu nhỏ cho phủ kín khung rồi cắt phần thừa ở giữa, nên
+    khung hình khác tỉ lệ không bị kéo méo.
+    """
+    height, width = image.shape[:2]
+    target_w, target_h = size
+    if (width, height) == (target_w, target_h):
+        return image
+    upscaler = upscaler or LanczosUpscaler()
+    scale = max(target_w / width, target_h / height)
+    scaled_w = max(target_w, math.ceil(round(width * scale, 6)))
+    scaled_h = max(target_h, math.ceil(round(height * scale, 6)))
+    resized = upscaler.upscale(image, (scaled_w, scaled_h))
+    top, left = (scaled_h - target_h) // 2, (scaled_w - target_w) // 2
+    return np.ascontiguousarray(resized[top:top + target_h, left:left + target_w])
+
+
+def add_upscale_arguments(parser):
+    """Thêm các tham số phóng to khung hình vào argparse parser"""
+    parser.add_argument("--output-resolution",
+                        help="Độ phân giải video đầu ra (ví dụ 1920x1080); khung hình sinh ở --resolution rồi được phóng to.")
+    parser.add_argument("--upscaler", choices=UPSCALERS, default="lanczos",
+                        help="Cách phóng to khung hình: lanczos, edge (làm sắc cạnh) hoặc learned (mặc định: lanczos).")
+    parser.add_argument("--upscaler-model", help="File mô hình siêu phân giải cục bộ cho --upscaler learned.")
+
+
+def upscale_options_from_args(args):
+    """Lấy (độ phân giải đầu ra, bộ phóng to) từ tham số đã thêm bởi add_upscale_arguments"""
+    output_resolution = None
+    if args.output_resolution:
+        try:
+            output_resolution = tuple(map(int, args.output_resolution.split('x')))
+        except ValueError:
+            print("Lỗi định dạng độ phân giải đầu ra. Giữ nguyên độ phân giải sinh hình.")
+    return output_resolution, get_upscaler(args.upscaler, model_path=args.upscaler_model)
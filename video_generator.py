@@ -1,156 +1,819 @@
+import contextlib
 import os
-import torch
 import numpy as np
 import argparse
+import queue
+import threading
+import time
 from PIL import Image
-from diffusers import StableDiffusionPipeline
-from transformers import pipeline
 from pathlib import Path
+from model_registry import derive_img2img_pipeline, get_registry, pipeline_lock
+from transitions import TRANSITIONS, TransitionRenderer
+from video_writers import add_encoder_arguments, encoder_from_args, find_ffmpeg, open_video_writer
+from segment_encoding import encode_segments, write_image_segment
+from keyframe_cache import KeyframeCache
+from prompt_cache import get_prompt_cache
+from schedulers import PRESETS, add_sampling_arguments, apply_scheduler, resolve_sampling
+from cpu_optimizations import add_cpu_arguments, cpu_optimizations_from_args
+from quantization import add_quantize_arguments, quantize_pipeline
+from memory_budget import apply_memory_savings, plan_memory_savings
+from instrumentation import (GenerationResult, PeakMemoryTracker, RunRecorder, add_report_arguments,
+                             current_rss_bytes, report_sinks_from_args)
+from upscalers import add_upscale_arguments, fit_frame, get_upscaler, upscale_options_from_args
+
+DEFAULT_MODEL_ID = "stabilityai/stable-diffusion-2-1-base"
+
+
+class GenerationCancelled(Exception):
+    """Lần sinh video bị hủy qua is_cancelled của generate_video"""
+
+
+class RunContext:
+    """
+    Trạng thái của một lượt chạy (generate_video hoặc run_batch) trên một VideoGenerator
+    
+    Mỗi luồng gọi có một RunContext riêng (VideoGenerator._run) nên nhiều lượt chạy song song
+    trên cùng generator (server, batch) không dùng chung bộ ghi số liệu hay hàm theo dõi tiến độ.
+    
+    recorder: RunRecorder của lượt chạy (None = không ghi số liệu)
+    on_progress, is_cancelled: Hàm theo dõi tiến độ / hủy của generate_video
+    num_frames, frames_done: Tổng số khung hình và số khung hình đã xong của lượt hiện tại
+    sampling: Cấu hình khử nhiễu dùng thay cho VideoGenerator.sampling (bản nháp), None = không thay
+    noise_resolution: Độ phân giải đầy đủ khi đang sinh bản nháp (nhiễu khởi tạo lấy từ nhiễu ở độ phân giải này)
+    use_keyframe_cache: False khi đang sinh bản nháp (bản nháp không được lưu vào bộ nhớ đệm keyframe)
+    """
+    def __init__(self):
+        self.recorder = None
+        self.on_progress = None
+        self.is_cancelled = None
+        self.num_frames = 0
+        self.frames_done = 0
+        self.sampling = None
+        self.noise_resolution = None
+        self.use_keyframe_cache = True
+
+
+def draft_resolution(resolution, scale=0.5):
+    """Độ phân giải của bản nháp: resolution nhân scale, làm tròn tới bội số của 8 (tối thiểu 64)"""
+    return tuple(max(64, int(round(value * scale / 8)) * 8) for value in resolution)
+
+
+def draft_output_path(output_path):
+    """Đường dẫn video nháp đặt cạnh video đầu ra, ví dụ output.mp4 -> output_draft.mp4"""
+    root, ext = os.path.splitext(output_path)
+    return f"{root}_draft{ext or '.mp4'}"
+
+def slerp(t, v0, v1, dot_threshold=0.9995):
+    """
+    Nội suy cầu (spherical linear interpolation) giữa hai tensor latent
+    
+    t: Vị trí nội suy từ 0 (v0) đến 1 (v1)
+    Khi hai vector gần như cùng hướng thì dùng nội suy tuyến tính để tránh chia cho 0.
+    """
+    import torch
+
+    a, b = v0.float(), v1.float()
+    dot = torch.sum(a * b) / (a.norm() * b.norm())
+    if dot.abs() > dot_threshold:
+        result = (1 - t) * a + t * b
+    else:
+        theta = torch.acos(dot.clamp(-1, 1))
+        result = (torch.sin((1 - t) * theta) * a + torch.sin(t * theta) * b) / torch.sin(theta)
+    return result.to(v0.dtype)
+
+def default_device(device=None):
+    """Thiết bị sẽ dùng: device nếu được chỉ định, nếu không thì 'cuda' khi có GPU, ngược lại 'cpu'"""
+    if device is not None:
+        return device
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def default_dtype(device):
+    """Kiểu dữ liệu của pipeline trên thiết bị: float16 trên CUDA, float32 trên CPU"""
+    import torch
+    return torch.float16 if device == "cuda" else torch.float32
+
+
+def preload_model(model_id=DEFAULT_MODEL_ID, device=None, quantize=None, registry=None):
+    """
+    Bắt đầu tải mô hình vào sổ đăng ký chung ở luồng nền, trả về luồng đó
+    
+    Gọi ngay khi ứng dụng khởi động (trong lúc người dùng còn nhập mô tả); VideoGenerator
+    tạo sau đó với cùng mô hình / thiết bị sẽ dùng lại pipeline đã tải, hoặc chờ lần tải
+    đang chạy kết thúc thay vì tải lại. torch và diffusers cũng được import trong luồng này.
+    """
+    def load():
+        try:
+            target = default_device(device)
+            (registry if registry is not None else get_registry()).get(
+                model_id, target, default_dtype(target), quantize=quantize if target == "cpu" else None
+            )
+        except Exception as e:
+            print(f"Không tải trước được mô hình {model_id}: {e}")
+
+    thread = threading.Thread(target=load, name="preload-model", daemon=True)
+    thread.start()
+    return thread
+
 
 class VideoGenerator:
     """
     Lớp tạo video từ mô tả văn bản sử dụng AI
     """
-    def __init__(self, model_id="stabilityai/stable-diffusion-2-1-base", device=None):
+    def __init__(self, model_id=DEFAULT_MODEL_ID, device=None, pipeline=None,
+                 registry=None, keyframe_cache=None, img2img_pipeline=None, prompt_cache=None,
+                 preset=None, scheduler=None, steps=None, guidance_scale=None, cpu_optimizations=None,
+                 quantize=None, memory_budget_mb=None, track_memory=False, metrics_sinks=None):
         """
         Khởi tạo VideoGenerator
         
         model_id: ID của mô hình Stable Diffusion để sinh hình ảnh
         device: Thiết bị chạy mô hình ('cpu' hoặc 'cuda')
+        pipeline: Pipeline đã được tải sẵn (bỏ qua bước tải mô hình, dùng cho benchmark)
+        registry: ModelRegistry dùng để lấy pipeline (mặc định: sổ đăng ký chung của tiến trình)
+        keyframe_cache: KeyframeCache để dùng lại các hình đã sinh với cùng tham số (None = không dùng)
+        img2img_pipeline: Pipeline img2img cho chế độ nối tiếp khung hình (mặc định: tạo từ pipeline
+                          chính khi cần, dùng chung các thành phần đã tải)
+        prompt_cache: PromptEmbeddingCache lưu embedding của prompt (mặc định: bộ nhớ đệm chung của tiến trình)
+        preset, scheduler, steps, guidance_scale: Cấu hình khử nhiễu, xem set_sampling
+        cpu_optimizations: CPUOptimizations áp dụng lên pipeline khi chạy trên CPU (None = float32,
+                           cấu hình mặc định của torch)
+        quantize: 'int8' để lượng tử hóa động UNet và text encoder (chỉ trên CPU, None = float32).
+                  Module đã lượng tử hóa được lưu lại để các lần khởi động sau dùng luôn
+        memory_budget_mb: Ngân sách bộ nhớ (MB); khi sinh hình lớn sẽ bật dần chia nhỏ attention,
+                          giải mã VAE từng hình / theo ô và offload tuần tự (CUDA) để không vượt quá
+        track_memory: In bộ nhớ đỉnh theo giai đoạn sau mỗi lần sinh (luôn bật khi có memory_budget_mb)
+        metrics_sinks: Danh sách sink nhận báo cáo số liệu sau mỗi lần sinh video, ví dụ
+                       instrumentation.JSONReportSink, LoggingSink, PrometheusSink
         """
-        self.temp_dir = Path("temp_frames")
-        self.temp_dir.mkdir(exist_ok=True)
-        
         # Xác định thiết bị phù hợp
-        if device is None:
-            self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        else:
-            self.device = device
-            
+        self.device = default_device(device)
+        
         print(f"Đang sử dụng thiết bị: {self.device}")
         
-        # Tải mô hình Stable Diffusion để tạo hình ảnh từ văn bản
-        print("Đang tải mô hình Stable Diffusion...")
-        self.image_generator = StableDiffusionPipeline.from_pretrained(
-            model_id, 
-            torch_dtype=torch.float16 if self.device == "cuda" else torch.float32
+        self.model_id = model_id
+        self.dtype = default_dtype(self.device)
+        self.registry = registry if registry is not None else get_registry()
+        self.keyframe_cache = keyframe_cache
+        self.img2img_generator = img2img_pipeline
+        self.prompt_cache = prompt_cache if prompt_cache is not None else get_prompt_cache()
+        self.set_sampling(preset, scheduler, steps, guidance_scale)
+        self.cpu_optimizations = cpu_optimizations if self.device == "cpu" else None
+        if quantize is not None and self.device != "cpu":
+            print(f"Lượng tử hóa {quantize} chỉ hỗ trợ CPU, bỏ qua trên {self.device}")
+            quantize = None
+        self.quantize = quantize
+        self.memory_budget_mb = memory_budget_mb
+        self.track_memory = bool(track_memory or memory_budget_mb)
+        self.memory_peaks = {}
+        self.metrics_sinks = list(metrics_sinks or [])
+        self._memory_savings = None
+        # Trạng thái lượt chạy riêng cho từng luồng gọi, xem RunContext
+        self._local = threading.local()
+        
+        load_start, load_cpu = time.perf_counter(), time.process_time()
+        if pipeline is not None:
+            self.image_generator = pipeline
+            if quantize is not None:
+                quantize_pipeline(pipeline, mode=quantize)
+        else:
+            # Lấy mô hình Stable Diffusion từ sổ đăng ký chung, chỉ tải ở lần dùng đầu tiên
+            self.image_generator = self.registry.get(model_id, self.device, self.dtype, quantize=quantize)
+        
+        if self.cpu_optimizations is not None:
+            print(f"Tối ưu CPU: {self.cpu_optimizations.describe()}")
+            with pipeline_lock(self.image_generator):
+                self.cpu_optimizations.apply(self.image_generator)
+        # Thời gian tải mô hình được đưa vào báo cáo của lần sinh video đầu tiên
+        self._load_metrics = (time.perf_counter() - load_start, time.process_time() - load_cpu, current_rss_bytes())
+
+    def unload(self):
+        """Giải phóng pipeline của generator khỏi sổ đăng ký chung"""
+        self.registry.unload(self.model_id, self.device, self.dtype)
+        self.image_generator = None
+        self.img2img_generator = None
+
+    def _autocast(self):
+        """Autocast float16 trên CUDA; trên CPU chỉ dùng bfloat16 khi bật trong cpu_optimizations"""
+        if self.cpu_optimizations is not None:
+            return self.cpu_optimizations.autocast(self.device)
+        import torch
+        return torch.autocast("cuda") if self.device == "cuda" else contextlib.nullcontext()
+
+    def _autocast_dtype(self):
+        """dtype của ngữ cảnh _autocast (None nếu không autocast)"""
+        if self.device == "cuda":
+            return "float16"
+        if self.cpu_optimizations is not None and self.cpu_optimizations.bf16:
+            return "bfloat16"
+        return None
+
+    def _run(self):
+        """RunContext của luồng gọi (tạo mới ở lần dùng đầu tiên của luồng)"""
+        run = getattr(self._local, "run", None)
+        if run is None:
+            run = self._local.run = RunContext()
+        return run
+
+    def _current_sampling(self):
+        """Cấu hình khử nhiễu của lượt chạy hiện tại (bản nháp có cấu hình riêng)"""
+        return self._run().sampling or self.sampling
+
+    def _current_keyframe_cache(self):
+        """Bộ nhớ đệm keyframe dùng cho lượt chạy hiện tại (None khi không dùng)"""
+        return self.keyframe_cache if self._run().use_keyframe_cache else None
+
+    def _set_stage(self, stage):
+        """Đánh dấu giai đoạn hiện tại của luồng gọi để ghi thời gian và bộ nhớ đỉnh"""
+        recorder = self._run().recorder
+        if recorder is not None:
+            recorder.set_stage(stage)
+
+    def _measure(self, stage):
+        """Ngữ cảnh đo một khối mã như một giai đoạn riêng"""
+        recorder = self._run().recorder
+        return recorder.measure(stage) if recorder is not None else contextlib.nullcontext()
+
+    def _prepare_memory(self, resolution, batch_size):
+        """Bật các cách tiết kiệm bộ nhớ cần thiết để lần sinh hình sắp tới nằm trong ngân sách"""
+        if self.memory_budget_mb is None:
+            return
+        sampling = self._current_sampling()
+        guidance = sampling["guidance_scale"] is None or sampling["guidance_scale"] > 1
+        savings, estimate = plan_memory_savings(
+            self.image_generator, self.memory_budget_mb, resolution, batch_size, self.device, guidance
         )
-        self.image_generator = self.image_generator.to(self.device)
-        print("Đã tải xong mô hình Stable Diffusion")
+        if savings != self._memory_savings:
+            print(f"Ngân sách bộ nhớ {self.memory_budget_mb:.0f} MB: ước lượng {estimate / 2**20:.0f} MB "
+                  f"cho {batch_size} hình {resolution[0]}x{resolution[1]}, "
+                  f"tiết kiệm: {', '.join(savings) or 'không cần'}")
+            self._memory_savings = savings
+        apply_memory_savings(self.image_generator, savings, self.device)
 
-    def _generate_images_from_text(self, text, num_frames=5, resolution=(512, 512), seed=None):
+    @contextlib.contextmanager
+    def _draft_pass(self, resolution, steps=None):
         """
-        Sinh các hình ảnh từ mô tả văn bản
+        Ngữ cảnh sinh bản nháp cho video ở độ phân giải resolution
         
-        text: Mô tả văn bản
-        num_frames: Số lượng khung hình (hình ảnh) cần sinh
+        Dùng ít bước khử nhiễu (steps, mặc định theo preset draft), scheduler của preset draft
+        nếu chưa chọn scheduler, giữ nguyên guidance scale. Nhiễu khởi tạo của mỗi hình được
+        thu nhỏ từ nhiễu của cùng seed ở độ phân giải đầy đủ (_draft_latents) nên bản nháp có
+        cùng bố cục với bản đầy đủ. Bản nháp không được lưu vào bộ nhớ đệm keyframe.
+        
+        Chỉ thay đổi RunContext của luồng gọi, không đổi cấu hình của generator.
+        """
+        run = self._run()
+        saved = run.sampling, run.noise_resolution, run.use_keyframe_cache
+        if steps is None:
+            steps = min(PRESETS["draft"]["steps"], self.sampling["steps"] or PRESETS["draft"]["steps"])
+        run.sampling = dict(self.sampling, steps=int(steps),
+                            scheduler=self.sampling["scheduler"] or PRESETS["draft"]["scheduler"])
+        run.noise_resolution = tuple(resolution)
+        run.use_keyframe_cache = False
+        try:
+            yield
+        finally:
+            run.sampling, run.noise_resolution, run.use_keyframe_cache = saved
+
+    def _draft_latents(self, seeds, resolution):
+        """
+        Nhiễu khởi tạo của các hình nháp ở độ phân giải resolution
+        
+        Nhiễu của mỗi seed được tạo đúng như pipeline tạo cho hình ở độ phân giải đầy đủ
+        (cùng torch.Generator, thiết bị, kiểu dữ liệu), thu nhỏ bằng trung bình theo vùng rồi
+        chuẩn hóa lại độ lệch chuẩn về 1: các chi tiết lớn của nhiễu (quyết định bố cục) được giữ lại.
+        """
+        import torch
+
+        full_width, full_height = self._run().noise_resolution
+        config = getattr(getattr(self.image_generator, "unet", None), "config", None)
+        channels = config.in_channels if config is not None else 4
+        latents = []
+        for seed in seeds:
+            generator = torch.Generator(device=self.device).manual_seed(seed)
+            noise = torch.randn((1, channels, full_height // 8, full_width // 8), generator=generator,
+                                device=self.device, dtype=self.dtype).float()
+            noise = torch.nn.functional.interpolate(noise, size=(resolution[1] // 8, resolution[0] // 8), mode="area")
+            latents.append(noise / noise.std())
+        return torch.cat(latents).to(self.dtype)
+
+    def _check_cancelled(self):
+        """Dừng lần sinh video nếu is_cancelled của generate_video trả về True"""
+        is_cancelled = self._run().is_cancelled
+        if is_cancelled is not None and is_cancelled():
+            raise GenerationCancelled("Đã hủy tạo video")
+
+    def _report_progress(self, frames_done, image=None):
+        """Gọi on_progress của generate_video (nếu có) với số khung hình đã xong"""
+        run = self._run()
+        if run.on_progress is not None:
+            run.on_progress(frames_done, run.num_frames, image)
+
+    def _step_callback(self):
+        """
+        Tham số callback của pipeline: ghi thời gian từng bước, chuyển sang giải mã VAE sau bước cuối,
+        báo tiến độ và kiểm tra yêu cầu hủy sau mỗi bước khử nhiễu
+        """
+        run = self._run()
+        recorder = run.recorder
+        if recorder is None and run.on_progress is None and run.is_cancelled is None:
+            return {}
+
+        def on_step_end(pipe, step, timestep, callback_kwargs):
+            if recorder is not None:
+                recorder.step()
+            self._check_cancelled()
+            self._report_progress(run.frames_done + (step + 1) / max(pipe.num_timesteps, 1))
+            if step + 1 >= pipe.num_timesteps:
+                self._set_stage("vae_decode")
+            return callback_kwargs
+
+        return {"callback_on_step_end": on_step_end}
+
+    def set_sampling(self, preset=None, scheduler=None, steps=None, guidance_scale=None):
+        """
+        Chọn scheduler, số bước khử nhiễu và guidance scale cho các lần sinh hình sau
+        
+        preset: 'draft', 'standard' hoặc 'final' (None = mặc định của mô hình)
+        scheduler: Tên scheduler trong schedulers.SCHEDULERS, ví dụ 'dpm++', 'euler-a', 'lcm'
+        steps: Số bước khử nhiễu
+        guidance_scale: Mức bám theo mô tả văn bản
+        
+        Tham số chỉ định riêng được ưu tiên hơn giá trị của preset. Scheduler được
+        thay trên pipeline đã tải, không cần tải lại mô hình.
+        """
+        self.sampling = resolve_sampling(preset, scheduler, steps, guidance_scale)
+
+    def _sampling_kwargs(self, pipeline):
+        """Đặt scheduler đã chọn cho pipeline và trả về tham số khử nhiễu cần truyền khi gọi"""
+        sampling = self._current_sampling()
+        apply_scheduler(pipeline, sampling["scheduler"])
+        kwargs = {}
+        if sampling["steps"] is not None:
+            kwargs["num_inference_steps"] = sampling["steps"]
+        if sampling["guidance_scale"] is not None:
+            kwargs["guidance_scale"] = sampling["guidance_scale"]
+        return kwargs
+
+    def _sample_batch(self, prompts, seeds, resolution, output_type="pil"):
+        """
+        Sinh một lô hình ảnh trong cùng một vòng khử nhiễu
+        
+        prompts: Danh sách mô tả văn bản, mỗi phần tử ứng với một hình
+        seeds: Danh sách seed tương ứng với từng hình
         resolution: Độ phân giải hình ảnh (width, height)
-        seed: Giá trị khởi tạo ngẫu nhiên (để sinh kết quả nhất quán)
+        output_type: 'pil' trả về ảnh PIL, 'latent' trả về latent đã khử nhiễu (chưa giải mã VAE)
+        
+        Mỗi hình dùng một torch.Generator riêng nên nhiễu khởi tạo của hình
+        thứ k giống hệt khi sinh riêng lẻ với cùng seed.
+        """
+        import torch
+
+        generators = [torch.Generator(device=self.device).manual_seed(s) for s in seeds]
+        # Bản nháp: nhiễu khởi tạo lấy từ nhiễu ở độ phân giải đầy đủ để giữ bố cục
+        noise = {"latents": self._draft_latents(seeds, resolution)} if self._run().noise_resolution is not None else {}
+        with pipeline_lock(self.image_generator), self._autocast():
+            self._prepare_memory(resolution, len(prompts))
+            prompt_embeds, negative_prompt_embeds = self._prompt_embeds(prompts)
+            self._set_stage("denoise")
+            return self.image_generator(
+                prompt_embeds=prompt_embeds,
+                negative_prompt_embeds=negative_prompt_embeds,
+                generator=generators,
+                height=resolution[1],
+                width=resolution[0],
+                output_type=output_type,
+                **noise,
+                **self._sampling_kwargs(self.image_generator),
+                **self._step_callback()
+            ).images
+
+    def _prompt_embeds(self, prompts):
+        """
+        Embedding của một danh sách prompt, mỗi prompt chỉ chạy text encoder một lần
+        
+        Trả về (prompt_embeds, negative_prompt_embeds) đã ghép theo thứ tự prompts.
         """
+        import torch
+
+        self._set_stage("text_encoder")
+        autocast_dtype = self._autocast_dtype()
+        embeds = {
+            prompt: self.prompt_cache.get(self.image_generator, self.model_id, prompt, self.device, self.dtype,
+                                          quantize=self.quantize, autocast_dtype=autocast_dtype)
+            for prompt in dict.fromkeys(prompts)
+        }
+        return (
+            torch.cat([embeds[prompt][0] for prompt in prompts]),
+            torch.cat([embeds[prompt][1] for prompt in prompts])
+        )
+
+    def _decode_latents(self, latents):
+        """Giải mã latent đã khử nhiễu bằng VAE của pipeline, trả về danh sách hình BGR"""
+        import torch
+
+        pipe = self.image_generator
+        with pipeline_lock(pipe), torch.no_grad(), self._autocast():
+            self._set_stage("vae_decode")
+            image = pipe.vae.decode(latents / pipe.vae.config.scaling_factor, return_dict=False)[0]
+            if getattr(pipe, "safety_checker", None) is not None:
+                image, _ = pipe.run_safety_checker(image, latents.device, latents.dtype)
+            images = pipe.image_processor.postprocess(image, output_type="pil")
+        return [np.ascontiguousarray(np.asarray(img)[:, :, ::-1]) for img in images]
+
+    def _refine_frame(self, prompt, frame, seed, strength):
+        """
+        Sinh khung hình mới bằng img2img từ khung hình BGR trước đó
+        
+        strength: Mức thay đổi so với khung hình trước (0-1); pipeline chỉ chạy
+                  khoảng strength × số bước khử nhiễu
+        """
+        if self.img2img_generator is None:
+            self.img2img_generator = derive_img2img_pipeline(self.image_generator)
+        import torch
+
+        generator = torch.Generator(device=self.device).manual_seed(seed)
+        image = Image.fromarray(np.ascontiguousarray(frame[:, :, ::-1]))
+        # Pipeline img2img dùng chung UNet/scheduler với pipeline chính nên dùng chung khóa
+        with pipeline_lock(self.image_generator), self._autocast():
+            self._prepare_memory(image.size, 1)
+            prompt_embeds, negative_prompt_embeds = self._prompt_embeds([prompt])
+            self._set_stage("denoise")
+            result = self.img2img_generator(
+                prompt_embeds=prompt_embeds,
+                negative_prompt_embeds=negative_prompt_embeds,
+                image=image,
+                strength=strength,
+                generator=generator,
+                **self._sampling_kwargs(self.img2img_generator),
+                **self._step_callback()
+            ).images[0]
+        return np.ascontiguousarray(np.asarray(result)[:, :, ::-1])
+
+    def _keyframe_params(self, prompt, seed, resolution):
+        """Các tham số quyết định nội dung của một keyframe, dùng làm khóa bộ nhớ đệm"""
+        autocast_dtype = self._autocast_dtype()
+        return {
+            "model": self.model_id,
+            "device": self.device,
+            "dtype": str(self.dtype) if self.quantize is None else self.quantize,
+            "prompt": prompt,
+            "seed": int(seed),
+            "width": int(resolution[0]),
+            "height": int(resolution[1]),
+            # Chỉ thêm khi khác mặc định để khóa cũ vẫn dùng được
+            **({"autocast": autocast_dtype} if autocast_dtype is not None else {}),
+            **{name: value for name, value in self._current_sampling().items() if value is not None},
+        }
+
+    def _sample_frames(self, prompts, seeds, resolution):
+        """
+        Sinh một lô hình ảnh dạng mảng NumPy BGR
+        
+        Hình đã có trong bộ nhớ đệm keyframe được lấy ra trực tiếp; chỉ các hình
+        còn thiếu mới được đưa vào _sample_batch và được lưu lại sau khi sinh.
+        """
+        frames = [None] * len(prompts)
+        keys = [None] * len(prompts)
+        cache = self._current_keyframe_cache()
+        if cache is not None:
+            for k, (prompt, seed) in enumerate(zip(prompts, seeds)):
+                keys[k] = KeyframeCache.make_key(**self._keyframe_params(prompt, seed, resolution))
+                frames[k] = cache.get(keys[k])
+        
+        missing = [k for k, frame in enumerate(frames) if frame is None]
+        if missing:
+            images = self._sample_batch([prompts[k] for k in missing], [seeds[k] for k in missing], resolution)
+            for k, image in zip(missing, images):
+                # Chuyển PIL (RGB) sang mảng BGR cho OpenCV, không qua file tạm
+                frames[k] = np.ascontiguousarray(np.asarray(image)[:, :, ::-1])
+                if cache is not None:
+                    cache.put(keys[k], frames[k])
+        return frames
+
+    def _iter_sampled_frames(self, text, num_frames, resolution, seed, batch_size):
+        """Sinh từng lô khung hình độc lập (mỗi khung hình một lần khử nhiễu đầy đủ)"""
+        # Sinh hình ảnh với seed khác nhau để có sự khác biệt, mỗi lô tối đa batch_size hình
+        for start in range(0, num_frames, batch_size):
+            frame_ids = range(start, min(start + batch_size, num_frames))
+            yield from self._sample_frames(
+                [text] * len(frame_ids),
+                [seed + i for i in frame_ids],
+                resolution
+            )
+
+    def _iter_chained_frames(self, text, num_frames, resolution, seed, chain_strength):
+        """
+        Sinh khung hình đầu bằng txt2img, các khung hình sau bằng img2img từ khung hình trước
+        
+        Khung hình i dùng seed + i cho nhiễu thêm vào. Các khung hình phụ thuộc nhau
+        nên được sinh tuần tự (không theo lô).
+        """
+        previous = None
+        cache = self._current_keyframe_cache()
+        for i in range(num_frames):
+            if previous is None:
+                frame = self._sample_frames([text], [seed], resolution)[0]
+            else:
+                key = frame = None
+                if cache is not None:
+                    # Khung hình nối tiếp phụ thuộc vào seed gốc và strength của cả chuỗi
+                    params = self._keyframe_params(text, seed + i, resolution)
+                    params.update(chain_seed=int(seed), chain_strength=float(chain_strength))
+                    key = KeyframeCache.make_key(**params)
+                    frame = cache.get(key)
+                if frame is None:
+                    frame = self._refine_frame(text, previous, seed + i, chain_strength)
+                    if key is not None:
+                        cache.put(key, frame)
+            previous = frame
+            yield frame
+
+    def _iter_interpolated_frames(self, text, num_frames, resolution, seed, batch_size, interpolation_steps):
+        """
+        Sinh khung hình neo bằng khử nhiễu đầy đủ, khung hình ở giữa bằng nội suy latent
+        
+        Cứ interpolation_steps + 1 khung hình có một khung hình neo (khung hình cuối luôn
+        là neo). Khung hình ở giữa hai neo được giải mã VAE từ latent nội suy cầu (slerp)
+        giữa latent đã khử nhiễu của hai neo, không cần chạy lại UNet. Khung hình neo ở
+        vị trí i dùng seed + i nên giống hệt khung hình i khi không nội suy.
+        
+        Chế độ này không dùng bộ nhớ đệm keyframe vì cần latent của các khung hình neo.
+        """
+        import torch
+
+        anchors = list(range(0, num_frames, interpolation_steps + 1))
+        if anchors[-1] != num_frames - 1:
+            anchors.append(num_frames - 1)
+        print(f"Nội suy latent: {len(anchors)} khung hình neo, {num_frames - len(anchors)} khung hình nội suy")
+        
+        previous = None
+        for start in range(0, len(anchors), batch_size):
+            positions = anchors[start:start + batch_size]
+            latents = self._sample_batch(
+                [text] * len(positions),
+                [seed + p for p in positions],
+                resolution,
+                output_type="latent"
+            )
+            for position, latent in zip(positions, latents):
+                latent = latent.unsqueeze(0)
+                if previous is None:
+                    pending = [latent]
+                else:
+                    prev_position, prev_latent = previous
+                    pending = [
+                        slerp((p - prev_position) / (position - prev_position), prev_latent, latent)
+                        for p in range(prev_position + 1, position)
+                    ] + [latent]
+                # Giải mã theo lô tối đa batch_size latent để giới hạn bộ nhớ
+                for k in range(0, len(pending), batch_size):
+                    yield from self._decode_latents(torch.cat(pending[k:k + batch_size]))
+                previous = (position, latent)
+
+    def _iter_images_from_text(self, text, num_frames=5, resolution=(512, 512), seed=None, batch_size=1,
+                               debug_frames_dir=None, interpolation_steps=0, chain_strength=None):
+        """
+        Sinh lần lượt các hình ảnh từ mô tả văn bản
+        
+        Tham số giống _generate_images_from_text. Mỗi hình dạng mảng NumPy BGR
+        được trả ra (yield) ngay khi lô chứa nó sinh xong.
+        """
+        import cv2
+        
+        if chain_strength is not None:
+            if not 0 < chain_strength <= 1:
+                raise ValueError(f"chain_strength phải nằm trong khoảng (0, 1], nhận được {chain_strength}")
+            if interpolation_steps > 0:
+                raise ValueError("Không thể dùng đồng thời nối tiếp img2img và nội suy latent")
+        
         print(f"Đang sinh {num_frames} hình ảnh từ văn bản: '{text}'")
         
-        images = []
         # Tạo giá trị seed ngẫu nhiên nếu không được cung cấp
         if seed is None:
             seed = np.random.randint(1, 1000000)
+        batch_size = max(1, int(batch_size))
+        if debug_frames_dir is not None:
+            debug_frames_dir = Path(debug_frames_dir)
+            debug_frames_dir.mkdir(parents=True, exist_ok=True)
+        
+        if chain_strength is not None:
+            frames = self._iter_chained_frames(text, num_frames, resolution, seed, chain_strength)
+        elif interpolation_steps > 0:
+            frames = self._iter_interpolated_frames(text, num_frames, resolution, seed, batch_size, interpolation_steps)
+        else:
+            frames = self._iter_sampled_frames(text, num_frames, resolution, seed, batch_size)
 
-        # Sinh hình ảnh với seed khác nhau để có sự khác biệt
-        for i in range(num_frames):
-            frame_seed = seed + i
-            generator = torch.Generator(device=self.device).manual_seed(frame_seed)
-            
-            # Sinh hình ảnh từ văn bản
-            with torch.autocast(self.device):
-                image = self.image_generator(
-                    text, 
-                    generator=generator,
-                    height=resolution[1],
-                    width=resolution[0]
-                ).images[0]
-                
-            # Lưu hình ảnh tạm thời
-            frame_path = self.temp_dir / f"frame_{i:03d}.png"
-            image.save(frame_path)
-            images.append(str(frame_path))
+        run = self._run()
+        for i, frame in enumerate(frames):
+            self._check_cancelled()
+            if debug_frames_dir is not None:
+                with self._measure("frame_save"):
+                    cv2.imwrite(str(debug_frames_dir / f"frame_{i:03d}.png"), frame)
             
+            if run.recorder is not None:
+                run.recorder.frame()
             print(f"Đã sinh hình {i+1}/{num_frames}")
-            
-        return images
+            run.frames_done = i + 1
+            self._report_progress(i + 1, frame)
+            yield frame
 
-    def _create_video_from_images(self, image_paths, output_path, duration_per_image=2.0, 
-                                transition_duration=1.0, fps=24, add_text=True):
+    def _generate_images_from_text(self, text, num_frames=5, resolution=(512, 512), seed=None, batch_size=1,
+                                   debug_frames_dir=None, interpolation_steps=0, chain_strength=None):
         """
-        Tạo video từ danh sách đường dẫn hình ảnh
+        Sinh các hình ảnh từ mô tả văn bản
         
-        image_paths: Danh sách đường dẫn đến các hình ảnh
+        text: Mô tả văn bản
+        num_frames: Số lượng khung hình (hình ảnh) cần sinh
+        resolution: Độ phân giải hình ảnh (width, height)
+        seed: Giá trị khởi tạo ngẫu nhiên (để sinh kết quả nhất quán)
+        batch_size: Số hình tối đa sinh trong một lần gọi pipeline (1 = tuần tự)
+        debug_frames_dir: Thư mục lưu thêm từng hình dưới dạng PNG để gỡ lỗi (None = không lưu)
+        interpolation_steps: Số khung hình nội suy latent giữa hai khung hình neo (0 = không nội suy)
+        chain_strength: Sinh khung hình sau bằng img2img từ khung hình trước với strength này (None = tắt)
+        
+        Trả về danh sách hình ảnh dạng mảng NumPy BGR, sẵn sàng để ghi video.
+        """
+        return list(self._iter_images_from_text(
+            text, num_frames, resolution, seed, batch_size, debug_frames_dir, interpolation_steps,
+            chain_strength
+        ))
+
+    def _write_image_segment(self, video, img_current, img_next, duration_per_image, transition_duration, fps,
+                             renderer):
+        """
+        Ghi đoạn video của một hình: các frame giữ nguyên và hiệu ứng chuyển sang hình kế tiếp
+        
+        img_next: Hình ảnh kế tiếp, None nếu là hình cuối cùng (không có chuyển cảnh)
+        renderer: TransitionRenderer dùng để sinh frame chuyển cảnh
+        """
+        timed = None
+        recorder = self._run().recorder
+        if recorder is not None:
+            timed = lambda frames: recorder.timed(frames, "transition")
+        write_image_segment(video, img_current, img_next, duration_per_image, transition_duration, fps, renderer,
+                            timed)
+
+    def _create_video_from_images(self, images, output_path, duration_per_image=2.0, 
+                                transition_duration=1.0, fps=24, add_text=True, transition="linear", vfr=False,
+                                frame_size=None, upscaler=None, encode_workers=1, encoder=None):
+        """
+        Tạo video từ danh sách hình ảnh
+        
+        images: Danh sách hình ảnh dạng mảng NumPy BGR (hoặc đường dẫn đến file hình ảnh)
         output_path: Đường dẫn file video đầu ra
         duration_per_image: Thời gian hiển thị mỗi hình ảnh (giây)
         transition_duration: Thời gian chuyển cảnh (giây)
         fps: Số khung hình mỗi giây
         add_text: Thêm văn bản gốc vào video hay không
+        transition: Kiểu chuyển cảnh ('linear', 'ease', 'wipe', 'zoom')
+        vfr: Ghi video tốc độ khung hình thay đổi, mỗi đoạn giữ hình chỉ mã hóa một lần (cần ffmpeg)
+        frame_size: Kích thước video (width, height); None = kích thước hình đầu tiên.
+                    Hình có kích thước khác được phóng to / thu nhỏ về đúng kích thước này
+        upscaler: Bộ phóng to dùng cho các hình khác kích thước (None = Lanczos)
+        encode_workers: Số tiến trình mã hóa song song (mỗi hình một đoạn, nối lại bằng ffmpeg không mã
+                        hóa lại, xem segment_encoding); 1 = ghi tuần tự, None hoặc 0 = số lõi CPU.
+                        Không áp dụng khi vfr hoặc không có ffmpeg
+        encoder: Tên bộ mã hóa ('opencv', 'x264', 'x265', 'vp9') hoặc đối tượng từ
+                 video_writers.get_encoder (None = 'opencv')
         """
-        print(f"Đang tạo video từ {len(image_paths)} hình ảnh...")
+        print(f"Đang tạo video từ {len(images)} hình ảnh...")
         
         import cv2
         
-        # Đọc hình ảnh đầu tiên để lấy kích thước
-        img = cv2.imread(image_paths[0])
-        height, width = img.shape[:2]
+        # Đọc file (nếu được truyền đường dẫn) đúng một lần cho mỗi hình
+        images = [cv2.imread(str(img)) if isinstance(img, (str, Path)) else img for img in images]
         
-        # Tạo VideoWriter để ghi video
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # Định dạng MPEG-4
-        video = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        if frame_size is None:
+            height, width = images[0].shape[:2]
+            frame_size = (width, height)
         
-        # Biến đổi hình ảnh và thêm vào video với hiệu ứng chuyển cảnh
-        for i in range(len(image_paths)):
-            # Đọc hình ảnh hiện tại
-            img_current = cv2.imread(image_paths[i])
-            
-            # Thời gian hiển thị hình ảnh (số frame)
-            display_frames = int(duration_per_image * fps)
-            
-            # Nếu có chuyển cảnh và không phải hình cuối cùng
-            if transition_duration > 0 and i < len(image_paths) - 1:
-                # Đọc hình ảnh tiếp theo cho hiệu ứng chuyển cảnh
-                img_next = cv2.imread(image_paths[i + 1])
-                
-                # Số frame cho hiệu ứng chuyển cảnh
-                transition_frames = int(transition_duration * fps)
-                
-                # Thêm frame hiển thị thông thường (không có hiệu ứng)
-                normal_frames = display_frames - transition_frames
-                for _ in range(normal_frames):
-                    video.write(img_current)
-                
-                # Thêm frame chuyển cảnh
-                for j in range(transition_frames):
-                    # Tính alpha cho hiệu ứng (từ 0 đến 1)
-                    alpha = j / transition_frames
-                    
-                    # Tạo hiệu ứng chuyển cảnh
-                    blended = cv2.addWeighted(img_current, 1 - alpha, img_next, alpha, 0)
-                    
-                    # Thêm vào video
-                    video.write(blended)
+        # Đưa mọi hình về cùng kích thước video trước khi ghi
+        self._set_stage("upscale")
+        images = [fit_frame(img, frame_size, upscaler) for img in images]
+        
+        self._set_stage("encode_video")
+        if encode_workers != 1 and not vfr and len(images) > 1:
+            if find_ffmpeg() is None:
+                print("Cảnh báo: không tìm thấy ffmpeg để nối các đoạn, mã hóa tuần tự")
             else:
-                # Không có hiệu ứng chuyển cảnh
-                for _ in range(display_frames):
-                    video.write(img_current)
-                    
-        # Đóng VideoWriter
-        video.release()
-        
-        # Xóa files tạm
-        for img_path in image_paths:
+                try:
+                    # Mỗi tiến trình mã hóa một đoạn; thời gian sinh chuyển cảnh nằm trong encode_video
+                    segments = encode_segments(images, output_path, duration_per_image, transition_duration, fps,
+                                               frame_size, transition, workers=encode_workers or None,
+                                               encoder=encoder)
+                    print(f"Video đã được lưu tại '{output_path}' ({segments} đoạn mã hóa song song)")
+                    return
+                except Exception as e:
+                    print(f"Cảnh báo: mã hóa song song thất bại ({e}), mã hóa tuần tự")
+        
+        # Tạo bộ ghi video
+        video = open_video_writer(output_path, fps, frame_size, vfr=vfr, encoder=encoder)
+        renderer = TransitionRenderer(transition)
+        
+        try:
+            # Biến đổi hình ảnh và thêm vào video với hiệu ứng chuyển cảnh
+            for i in range(len(images)):
+                img_next = images[i + 1] if i < len(images) - 1 else None
+                self._write_image_segment(
+                    video, images[i], img_next, duration_per_image, transition_duration, fps, renderer
+                )
+        finally:
+            # Đóng bộ ghi (kể cả khi lỗi, để tiến trình ffmpeg không bị treo)
+            video.release()
+                
+        print(f"Video đã được lưu tại '{output_path}'")
+
+    def _stream_video_from_images(self, images, output_path, duration_per_image=2.0,
+                                  transition_duration=1.0, fps=24, transition="linear", vfr=False,
+                                  frame_size=None, upscaler=None, encoder=None):
+        """
+        Ghi video song song với quá trình sinh hình
+        
+        images: Iterator trả ra từng hình ảnh BGR (ví dụ _iter_images_from_text)
+        transition: Kiểu chuyển cảnh ('linear', 'ease', 'wipe', 'zoom')
+        vfr: Ghi video tốc độ khung hình thay đổi (cần ffmpeg)
+        frame_size: Kích thước video (width, height); None = kích thước hình đầu tiên
+        upscaler: Bộ phóng to dùng cho các hình khác kích thước (None = Lanczos)
+        encoder: Tên bộ mã hóa hoặc đối tượng từ video_writers.get_encoder (None = 'opencv')
+        
+        Luồng ghi video nhận hình qua hàng đợi; khi hình i+1 tới thì ghi ngay
+        đoạn giữ hình và chuyển cảnh của hình i. Nếu việc sinh hình bị lỗi giữa
+        chừng, các hình đã sinh vẫn được ghi và file video vẫn được đóng đúng cách.
+        """
+        frame_queue = queue.Queue(maxsize=4)
+        renderer = TransitionRenderer(transition)
+        done = object()
+        writer_error = []
+        run = self._run()
+        
+        def writer():
+            # Luồng ghi thuộc cùng lượt chạy với luồng gọi (ghi số liệu vào cùng RunRecorder)
+            self._local.run = run
+            video = None
+            img_current = None
+            count = 0
             try:
-                os.remove(img_path)
-            except:
-                pass
+                while True:
+                    # Thời gian chờ hình kế tiếp không tính vào giai đoạn ghi video
+                    self._set_stage(None)
+                    img = frame_queue.get()
+                    if img is done:
+                        break
+                    self._set_stage("encode_video")
+                    if video is None:
+                        # Kích thước video cố định theo frame_size, hoặc theo hình đầu tiên nếu không có
+                        size = frame_size or (img.shape[1], img.shape[0])
+                        video = open_video_writer(output_path, fps, size, vfr=vfr, encoder=encoder)
+                    # Phóng to ở luồng ghi để chạy song song với việc sinh hình kế tiếp
+                    with self._measure("upscale"):
+                        img = fit_frame(img, size, upscaler)
+                    if img_current is not None:
+                        self._write_image_segment(
+                            video, img_current, img, duration_per_image, transition_duration, fps, renderer
+                        )
+                    img_current = img
+                    count += 1
                 
+                # Hình cuối cùng không có chuyển cảnh
+                if img_current is not None:
+                    self._set_stage("encode_video")
+                    self._write_image_segment(
+                        video, img_current, None, duration_per_image, transition_duration, fps, renderer
+                    )
+            except Exception as e:
+                writer_error.append(e)
+                # Tiếp tục rút hàng đợi để luồng sinh hình không bị chặn
+                while frame_queue.get() is not done:
+                    pass
+            finally:
+                if video is not None:
+                    video.release()
+                    print(f"Đã ghi {count} hình vào video '{output_path}'")
+                self._set_stage(None)
+        
+        thread = threading.Thread(target=writer, daemon=True)
+        thread.start()
+        try:
+            for img in images:
+                if writer_error:
+                    break
+                frame_queue.put(img)
+        finally:
+            frame_queue.put(done)
+            thread.join()
+        
+        if writer_error:
+            raise writer_error[0]
         print(f"Video đã được lưu tại '{output_path}'")
         
     def generate_video(self, text_description, output_path="output_ai.mp4", num_frames=5, 
-                       frame_duration=2.0, transition_duration=1.0, resolution=(512, 512), seed=None):
+                       frame_duration=2.0, transition_duration=1.0, resolution=(512, 512), seed=None,
+                       batch_size=1, debug_frames_dir=None, streaming=False, transition="linear", vfr=False,
+                       interpolation_steps=0, chain_strength=None, output_resolution=None, upscaler="lanczos",
+                       on_progress=None, is_cancelled=None, draft=False, draft_scale=0.5, draft_steps=None,
+                       on_draft=None, encode_workers=1, fps=24, encoder=None):
         """
         Tạo video từ mô tả văn bản
         
@@ -161,28 +824,208 @@ class VideoGenerator:
         transition_duration: Thời gian chuyển cảnh (giây)
         resolution: Độ phân giải hình ảnh (width, height)
         seed: Giá trị khởi tạo ngẫu nhiên (để sinh kết quả nhất quán)
+        batch_size: Số hình tối đa sinh chung trong một vòng khử nhiễu
+        debug_frames_dir: Thư mục lưu các hình đã sinh dạng PNG để gỡ lỗi (None = không lưu)
+        streaming: Ghi video song song với quá trình sinh hình thay vì đợi sinh xong tất cả
+        transition: Kiểu chuyển cảnh ('linear', 'ease', 'wipe', 'zoom')
+        vfr: Ghi video tốc độ khung hình thay đổi để đoạn giữ hình chỉ mã hóa một lần (cần ffmpeg)
+        interpolation_steps: Số khung hình nội suy latent giữa hai khung hình neo (0 = mọi khung hình
+                             đều khử nhiễu đầy đủ). Ví dụ 10 khung hình với interpolation_steps=4 chỉ
+                             cần 3 lần khử nhiễu (khung hình 0, 5, 9)
+        chain_strength: Nối tiếp khung hình bằng img2img: khung hình đầu sinh từ văn bản, mỗi khung hình
+                        sau sinh từ khung hình trước với strength này, chỉ chạy khoảng strength × số bước
+                        khử nhiễu (None = các khung hình sinh độc lập)
+        output_resolution: Độ phân giải video đầu ra (width, height). Khung hình được khử nhiễu ở
+                           resolution rồi phóng to lên output_resolution trước khi ghi, ví dụ sinh ở
+                           512x288 và ghi video 1920x1080 (None = video có độ phân giải sinh hình)
+        upscaler: Tên bộ phóng to ('lanczos', 'edge', 'learned') hoặc đối tượng từ upscalers.get_upscaler
+        on_progress: Hàm on_progress(frames_done, num_frames, image) gọi ở luồng sinh hình sau mỗi khung
+                     hình (image là hình BGR vừa sinh) và sau mỗi bước khử nhiễu (frames_done là số thực
+                     gồm cả phần đã khử nhiễu của lượt hiện tại, image là None)
+        is_cancelled: Hàm is_cancelled() trả về True để hủy; được kiểm tra sau mỗi bước khử nhiễu và
+                      mỗi khung hình. Khi bị hủy, kết quả là False với error "Đã hủy tạo video"
+        draft: Sinh hai lượt. Lượt đầu ghi nhanh video nháp (draft_output_path(output_path)) ở độ phân
+               giải resolution × draft_scale với draft_steps bước khử nhiễu (mặc định theo preset draft),
+               cùng seed và nhiễu khởi tạo thu nhỏ từ nhiễu của bản đầy đủ nên cùng bố cục; lượt sau
+               sinh lại ở chất lượng đầy đủ và ghi video đầu ra. on_progress được gọi cho cả hai lượt
+        on_draft: Hàm on_draft(draft_path) gọi ngay khi video nháp đã ghi xong, trước lượt đầy đủ
+        encode_workers: Số tiến trình mã hóa video song song theo đoạn (1 = tuần tự, None hoặc 0 = số lõi
+                        CPU); chỉ dùng khi ghi sau khi sinh xong, không dùng với streaming hoặc vfr
+        fps: Số khung hình mỗi giây của video
+        encoder: Bộ mã hóa video: 'opencv' (mp4v), 'x264', 'x265', 'vp9' (qua ffmpeg) hoặc đối tượng từ
+                 video_writers.get_encoder (None = 'opencv')
+        
+        Trả về GenerationResult: bool(result) cho biết có thành công hay không, result.metrics chứa
+        thời gian thực, thời gian CPU, RSS đỉnh của từng giai đoạn (model_load, text_encoder, denoise,
+        vae_decode, frame_save, upscale, transition, encode_video), thời gian từng bước khử nhiễu và
+        khoảng cách giữa các khung hình. Báo cáo cũng được gửi tới các metrics_sinks.
         """
+        cache_before = self._cache_stats()
+        # Chọn seed trước để lượt nháp và lượt đầy đủ dùng cùng seed
+        if seed is None:
+            seed = np.random.randint(1, 1000000)
+        draft_size = draft_resolution(resolution, draft_scale) if draft else None
+        params = {
+            "text": text_description, "model": self.model_id, "device": self.device, "num_frames": num_frames,
+            "resolution": list(resolution), "output_resolution": list(output_resolution) if output_resolution else None,
+            "seed": seed, "batch_size": batch_size, "streaming": streaming, "fps": fps,
+            "encoder": getattr(encoder, "name", encoder) or "opencv",
+            "interpolation_steps": interpolation_steps, "chain_strength": chain_strength,
+            "draft": list(draft_size) if draft else None,
+            **{name: value for name, value in self.sampling.items() if value is not None},
+        }
+        run = self._run()
+        started = self._start_run_metrics()
+        saved_hooks = run.on_progress, run.is_cancelled, run.num_frames, run.frames_done
+        run.on_progress, run.is_cancelled, run.num_frames = on_progress, is_cancelled, num_frames
+        run_start = time.perf_counter()
+        draft_s = None
+        error = None
         try:
-            # Sinh hình ảnh từ văn bản
-            image_paths = self._generate_images_from_text(
-                text_description,
-                num_frames=num_frames,
-                resolution=resolution,
-                seed=seed
-            )
+            # Kích thước video độc lập với độ phân giải khử nhiễu
+            frame_size = tuple(output_resolution) if output_resolution else tuple(resolution)
+            if isinstance(upscaler, str):
+                upscaler = get_upscaler(upscaler)
             
-            # Tạo video từ các hình ảnh
-            self._create_video_from_images(
-                image_paths,
-                output_path,
-                duration_per_image=frame_duration,
-                transition_duration=transition_duration
-            )
+            # Lượt nháp (nếu có) ghi video nhỏ không phóng to, không lưu hình gỡ lỗi
+            passes = [(draft_size, draft_output_path(output_path), draft_size, None)] if draft else []
+            passes.append((resolution, output_path, frame_size, debug_frames_dir))
+            for pass_resolution, pass_output, pass_frame_size, frames_dir in passes:
+                is_draft = pass_output != output_path
+                run.frames_done = 0
+                if is_draft:
+                    print(f"Đang sinh bản nháp {pass_resolution[0]}x{pass_resolution[1]}...")
+                with self._draft_pass(resolution, draft_steps) if is_draft else contextlib.nullcontext():
+                    if streaming:
+                        # Sinh hình và ghi video cùng lúc
+                        self._stream_video_from_images(
+                            self._iter_images_from_text(
+                                text_description,
+                                num_frames=num_frames,
+                                resolution=pass_resolution,
+                                seed=seed,
+                                batch_size=batch_size,
+                                debug_frames_dir=frames_dir,
+                                interpolation_steps=interpolation_steps,
+                                chain_strength=chain_strength
+                            ),
+                            pass_output,
+                            duration_per_image=frame_duration,
+                            transition_duration=transition_duration,
+                            fps=fps,
+                            transition=transition,
+                            vfr=vfr,
+                            frame_size=pass_frame_size,
+                            upscaler=upscaler,
+                            encoder=encoder
+                        )
+                    else:
+                        # Sinh hình ảnh từ văn bản
+                        images = self._generate_images_from_text(
+                            text_description,
+                            num_frames=num_frames,
+                            resolution=pass_resolution,
+                            seed=seed,
+                            batch_size=batch_size,
+                            debug_frames_dir=frames_dir,
+                            interpolation_steps=interpolation_steps,
+                            chain_strength=chain_strength
+                        )
+                        
+                        # Tạo video trực tiếp từ các hình ảnh trong bộ nhớ
+                        self._create_video_from_images(
+                            images,
+                            pass_output,
+                            duration_per_image=frame_duration,
+                            transition_duration=transition_duration,
+                            fps=fps,
+                            transition=transition,
+                            vfr=vfr,
+                            frame_size=pass_frame_size,
+                            upscaler=upscaler,
+                            encode_workers=encode_workers,
+                            encoder=encoder
+                        )
+                if is_draft:
+                    draft_s = time.perf_counter() - run_start
+                    print(f"Bản nháp đã sẵn sàng sau {draft_s:.1f}s: '{pass_output}'")
+                    if on_draft is not None:
+                        on_draft(pass_output)
             
-            return True
+            self._print_cache_summary(cache_before)
+        except GenerationCancelled as e:
+            print(e)
+            error = str(e)
         except Exception as e:
             print(f"Lỗi khi tạo video: {e}")
+            error = str(e)
+        finally:
+            run.on_progress, run.is_cancelled, run.num_frames, run.frames_done = saved_hooks
+        
+        metrics = self._finish_run_metrics() if started else {}
+        if draft_s is not None:
+            metrics["draft_s"] = draft_s
+        result = GenerationResult(error is None, output_path, metrics, error, params)
+        if started:
+            self._publish_report(result.to_dict())
+        return result
+
+    def _start_run_metrics(self):
+        """
+        Bắt đầu ghi số liệu (thời gian, CPU, bộ nhớ đỉnh theo giai đoạn) cho một lượt chạy
+        
+        Trả về False nếu luồng gọi đã có lượt ghi đang chạy (ví dụ generate_video được gọi trong một
+        batch). Lượt chạy ở luồng khác có RunRecorder riêng.
+        """
+        run = self._run()
+        if run.recorder is not None:
             return False
+        run.recorder = RunRecorder(PeakMemoryTracker(cuda=self.device == "cuda").start())
+        # Thời gian tải mô hình chỉ được tính cho một lượt chạy
+        load_metrics, self._load_metrics = self._load_metrics, None
+        if load_metrics is not None:
+            run.recorder.add_stage("model_load", *load_metrics)
+        return True
+
+    def _finish_run_metrics(self):
+        """Kết thúc lượt ghi, lưu bộ nhớ đỉnh vào memory_peaks, in tóm tắt và trả về báo cáo dạng dict"""
+        run = self._run()
+        recorder, run.recorder = run.recorder, None
+        if recorder is None:
+            return {}
+        report = recorder.finish()
+        self.memory_peaks = dict(recorder.memory_tracker.peaks)
+        if report["stages"]:
+            print("Thời gian theo giai đoạn: " + ", ".join(
+                f"{name} {stats['wall_s']:.2f}s" for name, stats in report["stages"].items()
+            ))
+        if self.track_memory:
+            print(f"Bộ nhớ đỉnh theo giai đoạn: {recorder.memory_tracker.summary()}")
+        return report
+
+    def _publish_report(self, report):
+        """Gửi báo cáo tới các sink; sink lỗi không làm hỏng lần sinh video"""
+        for sink in self.metrics_sinks:
+            try:
+                sink.emit(report)
+            except Exception as e:
+                print(f"Không ghi được báo cáo số liệu qua {type(sink).__name__}: {e}")
+
+    def _print_cache_summary(self, before):
+        """In số lần trúng / trượt bộ nhớ đệm keyframe và embedding prompt kể từ thời điểm before"""
+        for name, cache in (("keyframe", self.keyframe_cache), ("embedding prompt", self.prompt_cache)):
+            if cache is None or name not in before:
+                continue
+            after = cache.stats()
+            print(f"Bộ nhớ đệm {name}: {after['hits'] - before[name]['hits']} trúng, "
+                  f"{after['misses'] - before[name]['misses']} trượt")
+
+    def _cache_stats(self):
+        """Ảnh chụp số liệu các bộ nhớ đệm, dùng làm mốc cho _print_cache_summary"""
+        stats = {"embedding prompt": self.prompt_cache.stats()}
+        if self.keyframe_cache is not None:
+            stats["keyframe"] = self.keyframe_cache.stats()
+        return stats
 
 if __name__ == "__main__":
     # Xử lý tham số dòng lệnh
@@ -192,9 +1035,31 @@ if __name__ == "__main__":
     parser.add_argument("--frames", type=int, default=5, help="Số lượng khung hình sinh từ AI.")
     parser.add_argument("--duration", type=float, default=2.0, help="Thời lượng mỗi hình ảnh (giây).")
     parser.add_argument("--transition", type=float, default=1.0, help="Thời gian chuyển cảnh (giây).")
+    parser.add_argument("--transition-type", choices=TRANSITIONS, default="linear", help="Kiểu chuyển cảnh (mặc định: linear).")
     parser.add_argument("--resolution", default="512x512", help="Độ phân giải hình ảnh: chiều rộng x chiều cao.")
     parser.add_argument("--seed", type=int, help="Giá trị khởi tạo ngẫu nhiên (không bắt buộc).")
     parser.add_argument("--device", choices=["cpu", "cuda"], help="Thiết bị xử lý ('cpu' hoặc 'cuda').")
+    parser.add_argument("--batch-size", type=int, default=1, help="Số hình sinh chung trong một lần khử nhiễu (mặc định: 1).")
+    parser.add_argument("--save-frames", help="Thư mục lưu các hình đã sinh dạng PNG để gỡ lỗi (không bắt buộc).")
+    parser.add_argument("--stream", action="store_true", help="Ghi video song song với quá trình sinh hình.")
+    parser.add_argument("--vfr", action="store_true", help="Ghi video tốc độ khung hình thay đổi, mỗi đoạn giữ hình chỉ mã hóa một lần (cần ffmpeg).")
+    parser.add_argument("--encode-workers", type=int, default=1, help="Số tiến trình mã hóa video song song theo đoạn (mặc định: 1 - tuần tự, 0 = số lõi CPU; cần ffmpeg).")
+    parser.add_argument("--fps", type=int, default=24, help="Số khung hình mỗi giây của video (mặc định: 24).")
+    parser.add_argument("--cache-dir", help="Thư mục bộ nhớ đệm keyframe để dùng lại hình đã sinh (không bắt buộc).")
+    parser.add_argument("--draft", action="store_true", help="Ghi nhanh video nháp ở độ phân giải nhỏ, ít bước, cùng bố cục, rồi mới sinh bản đầy đủ.")
+    parser.add_argument("--draft-scale", type=float, default=0.5, help="Tỉ lệ độ phân giải của bản nháp (mặc định: 0.5).")
+    parser.add_argument("--draft-steps", type=int, help="Số bước khử nhiễu của bản nháp (mặc định: theo preset draft).")
+    add_sampling_arguments(parser)
+    add_cpu_arguments(parser)
+    add_quantize_arguments(parser)
+    parser.add_argument("--memory-budget-mb", type=float, help="Ngân sách bộ nhớ (MB): tự bật chia nhỏ attention, VAE tiling/slicing, offload khi cần.")
+    parser.add_argument("--profile-memory", action="store_true", help="In bộ nhớ đỉnh theo từng giai đoạn.")
+    parser.add_argument("--interpolate", type=int, default=0, help="Số khung hình nội suy latent giữa hai khung hình neo (mặc định: 0 - không nội suy).")
+    parser.add_argument("--chain-strength", type=float, help="Sinh khung hình sau bằng img2img từ khung hình trước với strength này, ví dụ 0.3 (không bắt buộc).")
+    parser.add_argument("--cache-size-mb", type=float, default=2048, help="Dung lượng tối đa của bộ nhớ đệm keyframe (MB).")
+    add_upscale_arguments(parser)
+    add_encoder_arguments(parser)
+    add_report_arguments(parser)
     
     args = parser.parse_args()
     
@@ -204,9 +1069,23 @@ if __name__ == "__main__":
     except:
         print("Lỗi định dạng độ phân giải. Sử dụng mặc định 512x512.")
         resolution = (512, 512)
+    output_resolution, upscaler = upscale_options_from_args(args)
     
     # Khởi tạo VideoGenerator và tạo video
-    generator = VideoGenerator(device=args.device)
+    cache = KeyframeCache(args.cache_dir, args.cache_size_mb) if args.cache_dir else None
+    generator = VideoGenerator(
+        device=args.device,
+        keyframe_cache=cache,
+        preset=args.preset,
+        scheduler=args.scheduler,
+        steps=args.steps,
+        guidance_scale=args.guidance_scale,
+        cpu_optimizations=cpu_optimizations_from_args(args),
+        quantize=args.quantize,
+        memory_budget_mb=args.memory_budget_mb,
+        track_memory=args.profile_memory,
+        metrics_sinks=report_sinks_from_args(args)
+    )
     generator.generate_video(
         args.text, 
         output_path=args.output, 
@@ -214,5 +1093,20 @@ if __name__ == "__main__":
         frame_duration=args.duration,
         transition_duration=args.transition,
         resolution=resolution,
-        seed=args.seed
+        seed=args.seed,
+        batch_size=args.batch_size,
+        debug_frames_dir=args.save_frames,
+        streaming=args.stream,
+        transition=args.transition_type,
+        vfr=args.vfr,
+        interpolation_steps=args.interpolate,
+        chain_strength=args.chain_strength,
+        output_resolution=output_resolution,
+        upscaler=upscaler,
+        draft=args.draft,
+        draft_scale=args.draft_scale,
+        draft_steps=args.draft_steps,
+        encode_workers=args.encode_workers,
+        fps=args.fps,
+        encoder=encoder_from_args(args)
     )
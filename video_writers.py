@@ -0,0 +1,297 @@
+"""
+Các bộ ghi video dùng cho VideoGenerator và app_simple
+
+Mọi bộ ghi có cùng giao diện: write(frame), write_repeated(frame, count) và
+release(). write_repeated cho phép bộ ghi tận dụng các đoạn hình đứng yên
+(ví dụ chỉ lưu frame một lần kèm thời lượng) thay vì mã hóa lại từng frame.
+
+Bộ mã hóa (get_encoder) chọn cách ghi video tốc độ khung hình cố định:
+- opencv: cv2.VideoWriter với codec MPEG-4 Part 2 ('mp4v'), không cần ffmpeg
+- x264, x265, vp9: gửi frame thô (bgr24) qua pipe vào tiến trình ffmpeg, có preset,
+  CRF và số luồng; H.264 là lựa chọn xem được trên mọi trình duyệt
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+
+ENCODERS = ("opencv", "x264", "x265", "vp9")
+
+# Codec của ffmpeg và CRF mặc định (chất lượng tương đương nhau) của từng bộ mã hóa
+FFMPEG_CODECS = {
+    "x264": ("libx264", 23),
+    "x265": ("libx265", 28),
+    "vp9": ("libvpx-vp9", 32),
+}
+
+# libvpx-vp9 không có preset kiểu x264: quy đổi sang -cpu-used (càng lớn càng nhanh)
+VP9_CPU_USED = {
+    "ultrafast": 8, "superfast": 7, "veryfast": 6, "faster": 5, "fast": 4,
+    "medium": 3, "slow": 2, "slower": 1, "veryslow": 0,
+}
+
+
+def find_ffmpeg():
+    """Đường dẫn tới ffmpeg (biến môi trường FFMPEG_BINARY hoặc trong PATH), None nếu không có"""
+    binary = os.environ.get("FFMPEG_BINARY")
+    if binary and os.path.exists(binary):
+        return binary
+    return shutil.which("ffmpeg")
+
+
+class OpenCVVideoWriter:
+    """
+    Ghi video tốc độ khung hình cố định bằng cv2.VideoWriter
+    
+    output_path: Đường dẫn file video đầu ra
+    fps: Số khung hình mỗi giây
+    frame_size: Kích thước frame (width, height)
+    fourcc: Mã codec của OpenCV (mặc định 'mp4v' - MPEG-4)
+    """
+    def __init__(self, output_path, fps, frame_size, fourcc="mp4v"):
+        import cv2
+        self.output_path = str(output_path)
+        self._video = cv2.VideoWriter(self.output_path, cv2.VideoWriter_fourcc(*fourcc), fps, tuple(frame_size))
+
+    def write(self, frame):
+        self._video.write(frame)
+
+    def write_repeated(self, frame, count):
+        # OpenCV không hỗ trợ thời lượng theo frame: phải ghi lặp lại
+        for _ in range(count):
+            self._video.write(frame)
+
+    def release(self):
+        self._video.release()
+
+
+class FFmpegPipeWriter:
+    """
+    Ghi video tốc độ khung hình cố định bằng cách gửi frame thô qua pipe vào ffmpeg
+    
+    Frame BGR được ghi thẳng vào stdin của ffmpeg (không qua file tạm); ffmpeg
+    mã hóa song song với việc sinh frame ở tiến trình riêng.
+    
+    output_path: Đường dẫn file video đầu ra
+    fps: Số khung hình mỗi giây
+    frame_size: Kích thước frame (width, height)
+    encoder: FFmpegEncoder (codec, preset, CRF, số luồng); mặc định x264
+    """
+    def __init__(self, output_path, fps, frame_size, encoder=None):
+        self.output_path = str(output_path)
+        self.frame_size = tuple(frame_size)
+        encoder = encoder or FFmpegEncoder()
+        ffmpeg = encoder.ffmpeg or find_ffmpeg()
+        if ffmpeg is None:
+            raise RuntimeError("Không tìm thấy ffmpeg (cài ffmpeg hoặc đặt biến môi trường FFMPEG_BINARY)")
+        width, height = self.frame_size
+        command = [
+            ffmpeg, "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+            *encoder.output_args(), self.output_path,
+        ]
+        # Lỗi của ffmpeg ghi ra file tạm: đọc pipe stderr trong lúc đang ghi stdin có thể bị treo
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=self._stderr)
+
+    def write(self, frame):
+        self.write_repeated(frame, 1)
+
+    def write_repeated(self, frame, count):
+        if count <= 0:
+            return
+        if frame.shape[1::-1] != self.frame_size:
+            raise ValueError(f"Frame {frame.shape[1]}x{frame.shape[0]} khác kích thước video "
+                             f"{self.frame_size[0]}x{self.frame_size[1]}")
+        data = np.ascontiguousarray(frame, dtype=np.uint8)
+        try:
+            for _ in range(count):
+                self._process.stdin.write(data)
+        except BrokenPipeError:
+            self._process.wait()
+            raise RuntimeError(f"ffmpeg dừng giữa chừng: {self._error_output()}")
+
+    def _error_output(self):
+        self._stderr.seek(0)
+        return self._stderr.read().decode(errors="replace").strip()
+
+    def release(self):
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        try:
+            if process.wait() != 0:
+                raise RuntimeError(f"ffmpeg lỗi khi mã hóa '{self.output_path}': {self._error_output()}")
+        finally:
+            self._stderr.close()
+
+
+class FFmpegVFRWriter:
+    """
+    Ghi video tốc độ khung hình thay đổi (VFR) bằng concat demuxer của ffmpeg
+    
+    Mỗi frame khác nhau chỉ được lưu một lần (BMP, không nén) kèm thời lượng;
+    các đoạn giữ hình dài trở thành một frame duy nhất trong file đầu ra.
+    
+    output_path: Đường dẫn file video đầu ra
+    fps: Số khung hình mỗi giây dùng để quy đổi số frame ra thời lượng
+    frame_size: Kích thước frame (width, height)
+    encoder: FFmpegEncoder (codec, preset, CRF, số luồng); mặc định x264
+    """
+    def __init__(self, output_path, fps, frame_size, encoder=None):
+        self.output_path = str(output_path)
+        self.fps = fps
+        self.frame_size = tuple(frame_size)
+        self.encoder = encoder or FFmpegEncoder()
+        self.ffmpeg = self.encoder.ffmpeg or find_ffmpeg()
+        if self.ffmpeg is None:
+            raise RuntimeError("Không tìm thấy ffmpeg (cài ffmpeg hoặc đặt biến môi trường FFMPEG_BINARY)")
+        self._temp_dir = tempfile.mkdtemp(prefix="vfr_frames_")
+        self._entries = []
+
+    def write(self, frame):
+        self.write_repeated(frame, 1)
+
+    def write_repeated(self, frame, count):
+        if count <= 0:
+            return
+        import cv2
+        name = f"{len(self._entries):06d}.bmp"
+        cv2.imwrite(os.path.join(self._temp_dir, name), frame)
+        self._entries.append((name, count))
+
+    def release(self):
+        try:
+            if not self._entries:
+                return
+            list_path = os.path.join(self._temp_dir, "frames.txt")
+            with open(list_path, "w") as f:
+                f.write("ffconcat version 1.0\n")
+                # framerate của từng hình đặt bằng fps để mốc thời gian không bị làm tròn theo 1/25 giây
+                for name, count in self._entries:
+                    f.write(f"file '{name}'\noption framerate {self.fps}\nduration {count / self.fps:.6f}\n")
+                # Concat demuxer bỏ qua thời lượng của file cuối nên phải lặp lại file cuối
+                f.write(f"file '{self._entries[-1][0]}'\noption framerate {self.fps}\n")
+
+            command = [
+                self.ffmpeg, "-y", "-loglevel", "error",
+                "-f", "concat", "-safe", "0", "-i", list_path,
+                # Tắt B-frame: với mốc thời gian không đều, B-frame làm sai thời lượng ghi trong file MP4
+                "-fps_mode", "vfr", "-bf", "0",
+                *self.encoder.output_args(), self.output_path,
+            ]
+            subprocess.run(command, check=True)
+        finally:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._entries = []
+
+
+class OpenCVEncoder:
+    """
+    Bộ mã hóa cv2.VideoWriter (không cần ffmpeg)
+    
+    fourcc: Mã codec của OpenCV (mặc định 'mp4v' - MPEG-4 Part 2)
+    """
+    name = "opencv"
+
+    def __init__(self, fourcc="mp4v"):
+        self.fourcc = fourcc
+
+    def open(self, output_path, fps, frame_size):
+        """Tạo bộ ghi video tốc độ khung hình cố định"""
+        return OpenCVVideoWriter(output_path, fps, frame_size, fourcc=self.fourcc)
+
+
+class FFmpegEncoder:
+    """
+    Bộ mã hóa ffmpeg (frame thô qua pipe, xem FFmpegPipeWriter)
+    
+    name: 'x264', 'x265' hoặc 'vp9'
+    preset: Preset tốc độ kiểu x264 ('ultrafast' ... 'veryslow'); với vp9 được quy đổi sang -cpu-used
+    crf: Chất lượng (càng nhỏ càng đẹp, file càng lớn); None = mặc định của codec
+    threads: Số luồng mã hóa của ffmpeg (0 = tự chọn theo số lõi CPU)
+    ffmpeg: Đường dẫn tới ffmpeg (mặc định: find_ffmpeg())
+    """
+    def __init__(self, name="x264", preset="veryfast", crf=None, threads=0, ffmpeg=None):
+        if name not in FFMPEG_CODECS:
+            raise ValueError(f"Bộ mã hóa ffmpeg không hợp lệ: {name} (chọn một trong {', '.join(FFMPEG_CODECS)})")
+        self.name = name
+        self.codec, default_crf = FFMPEG_CODECS[name]
+        self.preset = preset
+        self.crf = default_crf if crf is None else crf
+        self.threads = threads
+        self.ffmpeg = ffmpeg
+
+    def output_args(self):
+        """Tham số codec của ffmpeg cho file đầu ra"""
+        args = ["-c:v", self.codec, "-crf", str(self.crf), "-pix_fmt", "yuv420p", "-threads", str(self.threads)]
+        if self.name == "vp9":
+            # -b:v 0: chế độ chất lượng cố định theo CRF; row-mt cho phép chia luồng theo hàng
+            args += ["-b:v", "0", "-deadline", "good", "-cpu-used", str(VP9_CPU_USED.get(self.preset, 4)),
+                     "-row-mt", "1"]
+        else:
+            args += ["-preset", self.preset]
+        if self.name == "x265":
+            # x265 không dùng -threads của ffmpeg; hvc1 để trình phát của Apple nhận file MP4
+            args += ["-x265-params", f"log-level=error:pools={self.threads or '*'}", "-tag:v", "hvc1"]
+        if self.name == "x264":
+            # Đưa moov atom lên đầu để trình duyệt phát được trước khi tải hết file
+            args += ["-movflags", "+faststart"]
+        return args
+
+    def open(self, output_path, fps, frame_size):
+        """Tạo bộ ghi video tốc độ khung hình cố định"""
+        return FFmpegPipeWriter(output_path, fps, frame_size, encoder=self)
+
+
+def get_encoder(name="opencv", preset=None, crf=None, threads=0):
+    """Tạo bộ mã hóa theo tên ('opencv', 'x264', 'x265' hoặc 'vp9')"""
+    if name == "opencv":
+        return OpenCVEncoder()
+    if name in FFMPEG_CODECS:
+        return FFmpegEncoder(name, preset=preset or "veryfast", crf=crf, threads=threads)
+    raise ValueError(f"Bộ mã hóa không hợp lệ: {name} (chọn một trong {', '.join(ENCODERS)})")
+
+
+def open_video_writer(output_path, fps, frame_size, vfr=False, encoder=None):
+    """
+    Tạo bộ ghi video phù hợp
+    
+    vfr: Dùng FFmpegVFRWriter để các đoạn giữ hình chỉ được mã hóa một lần
+         (với codec của encoder nếu là bộ mã hóa ffmpeg, mặc định x264)
+    encoder: Tên bộ mã hóa hoặc đối tượng từ get_encoder (None = 'opencv')
+    
+    Nếu không có ffmpeg thì quay về OpenCVVideoWriter tốc độ khung hình cố định.
+    """
+    if encoder is None or isinstance(encoder, str):
+        encoder = get_encoder(encoder or "opencv")
+    ffmpeg_encoder = encoder if isinstance(encoder, FFmpegEncoder) else None
+    if (vfr or ffmpeg_encoder) and ((ffmpeg_encoder and ffmpeg_encoder.ffmpeg) or find_ffmpeg()) is None:
+        print("Cảnh báo: không tìm thấy ffmpeg, ghi video tốc độ khung hình cố định bằng OpenCV")
+        return OpenCVVideoWriter(output_path, fps, frame_size)
+    if vfr:
+        return FFmpegVFRWriter(output_path, fps, frame_size, encoder=ffmpeg_encoder)
+    return encoder.open(output_path, fps, frame_size)
+
+
+def add_encoder_arguments(parser):
+    """Thêm các tham số bộ mã hóa video vào argparse parser"""
+    parser.add_argument("--encoder", choices=ENCODERS, default="opencv",
+                        help="Bộ mã hóa video: opencv (mp4v) hoặc x264, x265, vp9 qua ffmpeg (mặc định: opencv).")
+    parser.add_argument("--crf", type=int,
+                        help="Chất lượng của bộ mã hóa ffmpeg, càng nhỏ càng đẹp (mặc định: x264 23, x265 28, vp9 32).")
+    parser.add_argument("--encoder-preset", default="veryfast",
+                        help="Preset tốc độ của bộ mã hóa ffmpeg, ultrafast ... veryslow (mặc định: veryfast).")
+    parser.add_argument("--encoder-threads", type=int, default=0,
+                        help="Số luồng mã hóa của ffmpeg (mặc định: 0 - tự chọn).")
+
+
+def encoder_from_args(args):
+    """Lấy bộ mã hóa từ tham số đã thêm bởi add_encoder_arguments"""
+    return get_encoder(args.encoder, preset=args.encoder_preset, crf=args.crf, threads=args.encoder_threads)